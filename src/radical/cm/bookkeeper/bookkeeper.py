@@ -11,8 +11,9 @@ from copy import deepcopy
 from time import sleep
 from simpy import Environment
 
-from ..planner import HeftPlanner, RandomPlanner
+from ..planner import HeftPlanner, RandomPlanner, DeadlinePlanner
 from ..utils import states as st
+from ..utils import dag
 from ..enactor import SimulatedEnactor
 
 
@@ -27,10 +28,16 @@ class Bookkeeper(object):
     *campaign:* The campaign that needs to be executed.
     *resources:* A set of resources.
     *objective:* The campaign's objective
+    *planner:* 'random', 'heft' or 'deadline'. The deadline planner searches
+               for a plan whose makespan meets the objective.
+    *admission:* When `True` and the plan does not meet the objective, only
+                 the workflows that complete the most work within it are
+                 executed, and the rest are deferred, see `_admit`. Otherwise
+                 the campaign fails.
     '''
 
     def __init__(self, campaign, resources, objective=None, planner='random',
-                 sid=None):
+                 sid=None, admission=False):
 
         self._campaign = {'campaign': campaign,
                           'state': st.NEW
@@ -46,6 +53,7 @@ class Bookkeeper(object):
         self._checkpoints = None
         self._plan = None
         self._objective = objective
+        self._admission = admission
         self._unavail_resources = []
         self._workflows_state = dict()
 
@@ -54,6 +62,12 @@ class Bookkeeper(object):
         self._time = 0  # The time in the campaign's world.
         self._workflows_to_monitor = list()
         self._est_end_times = dict()
+        # Workflows whose start time has come, but some of their predecessors
+        # have not finished yet.
+        self._waiting = set()
+        # The planned start times at which the simulation pauses, see
+        # `_wake_up`.
+        self._wake_ups = set()
         self._env = Environment()
         self._enactor = SimulatedEnactor(env=self._env, sid=self._sid)
         self._enactor.register_state_cb(self.state_update_cb)
@@ -81,6 +95,12 @@ class Bookkeeper(object):
             self._planner = HeftPlanner(campaign=self._campaign['campaign'],
                                           resources=self._resources,
                                           num_oper=num_oper, sid=self._sid)
+        elif planner.lower() == 'deadline':
+            # The planner searches for a plan that meets the objective.
+            self._planner = DeadlinePlanner(campaign=self._campaign['campaign'],
+                                            resources=self._resources,
+                                            num_oper=num_oper, sid=self._sid,
+                                            deadline=self._objective)
         else:
             self._logger.warning('Planner %s is not implemented. Rolling to a \
                                   random planner')
@@ -124,6 +144,95 @@ class Bookkeeper(object):
         else:
             return True
 
+    def _admit(self, campaign=None, start_time=None):
+        '''
+        Admission control. When the plan does not meet the objective, the
+        workflows that are executed are selected so that their plan meets it
+        and their total weight is as large as possible, see
+        `DeadlinePlanner.admit`. The weight of a workflow is its `weight` key,
+        or its number of operations, so by default the completed work is
+        maximized. The workflows that are not admitted, or that depend on a
+        workflow that is not admitted, are marked as deferred.
+
+        The deadline planner that admits the workflows becomes the planner of
+        the campaign, so that replanning keeps meeting the objective.
+
+        *Parameters:*
+
+        *campaign:* The workflows to select from. Defaults to the campaign.
+        *start_time:* The time each resource becomes available, as in
+                      `Planner.plan`.
+        '''
+
+        campaign = campaign if campaign else self._campaign['campaign']
+        if not isinstance(self._planner, DeadlinePlanner):
+            self._logger.info('Planning with a deadline planner from now on')
+            all_workflows = self._campaign['campaign']
+            self._planner = DeadlinePlanner(campaign=all_workflows,
+                                            resources=self._resources,
+                                            num_oper=[workflow['num_oper']
+                                                      for workflow in
+                                                      all_workflows],
+                                            sid=self._sid,
+                                            deadline=self._objective)
+
+        plan = self._planner.admit(campaign=campaign,
+                                   resources=self._resources,
+                                   num_oper=[workflow['num_oper']
+                                             for workflow in campaign],
+                                   start_time=start_time,
+                                   weights=[workflow.get('weight',
+                                                         workflow['num_oper'])
+                                            for workflow in campaign],
+                                   deadline=self._objective)
+
+        # Workflows whose predecessors are deferred would never start.
+        candidates = set(workflow['id'] for workflow in campaign)
+        admitted = set(entry[0]['id'] for entry in plan)
+
+        def _deferred(dep_id):
+            if dep_id in candidates:
+                return dep_id not in admitted
+            return self._workflows_state.get(dep_id) == st.DEFERRED
+
+        changed = True
+        while changed:
+            changed = False
+            for entry in plan:
+                if entry[0]['id'] in admitted and \
+                   any(_deferred(dep_id)
+                       for dep_id in dag.get_dependencies(entry[0])):
+                    admitted.discard(entry[0]['id'])
+                    changed = True
+
+        deferred = list()
+        with self._exec_state_lock:
+            for workflow in campaign:
+                if workflow['id'] not in admitted:
+                    self._workflows_state[workflow['id']] = st.DEFERRED
+                    deferred.append(workflow['id'])
+        self._logger.info('Objective %s is met by deferring workflows %s',
+                          self._objective, deferred)
+
+        self._plan = sorted([place for place in plan
+                             if place[0]['id'] in admitted],
+                            key=lambda place: place[-1])
+        self._update_checkpoints()
+
+    def _dependencies_done(self, workflow):
+        '''
+        Returns `True` if all the workflows a workflow depends on are done.
+        Dependencies to workflows that are not part of the campaign are
+        ignored.
+        '''
+
+        with self._exec_state_lock:
+            for dep_id in dag.get_dependencies(workflow):
+                if self._workflows_state.get(dep_id, st.DONE) != st.DONE:
+                    return False
+
+        return True
+
     def state_update_cb(self, workflow_ids, new_state):
         '''
         This is a state update callback. This callback is passed to the enactor.
@@ -151,6 +260,10 @@ class Bookkeeper(object):
         self._prof.prof('planning_ended', uid=self._uid)
 
         self._update_checkpoints()
+        if self._admission and not self._verify_objective():
+            self._prof.prof('admission_start', uid=self._uid)
+            self._admit()
+            self._prof.prof('admission_ended', uid=self._uid)
 
         with self._exec_state_lock:
             self._campaign['state'] = st.EXECUTING
@@ -171,17 +284,43 @@ class Bookkeeper(object):
                 while (not self._cont) or self._hold:
                     continue
                 
+                next_start = None
                 for (wf, rc, start_time, est_end_time) in self._plan:
-                    # Do not enact to workflows that sould have been executed
+                    # Do not enact to workflows that have been executed
                     # already.
-                    if start_time == self._time and est_end_time > self._time \
-                        and rc not in self._unavail_resources and self._cont:
+                    if self._workflows_state[wf['id']] != st.NEW:
+                        continue
+                    # A workflow that waits for its predecessors, or whose start
+                    # time has passed without an event, starts now and is
+                    # expected to end as much later.
+                    if wf['id'] in self._waiting or start_time < self._time:
+                        est_end_time += self._time - start_time
+                        start_time = self._time
+                    if start_time > self._time:
+                        if next_start is None or start_time < next_start:
+                            next_start = start_time
+                        continue
+                    if rc not in self._unavail_resources and \
+                       rc not in resources and self._cont:
+                        if not self._dependencies_done(wf):
+                            self._logger.debug('Workflow %s waits for its ' +
+                                               'dependencies', wf['id'])
+                            self._waiting.add(wf['id'])
+                            continue
+                        self._waiting.discard(wf['id'])
                         workflows.append(wf)
                         resources.append(rc)
                         self._est_end_times[rc['id']] = est_end_time
                         self._logger.debug('Time: %s: Enacting %s workflow on %s resource. Will end %f',
                                            self._env.now, wf, rc, est_end_time)
 
+                # Nothing may end when the next workflow is planned to start,
+                # e.g. after the communication cost of its dependencies.
+                if next_start is not None and next_start not in self._wake_ups:
+                    self._wake_ups.add(next_start)
+                    self._env.process(self._wake_up(next_start -
+                                                    self._env.now))
+
                 # There is no need to call the enactor when no new things
                 # should happen.
                 #self._logger.debug('Adding items: %s, %s', workflows, resources)
@@ -217,6 +356,16 @@ class Bookkeeper(object):
                     self._logger.debug('Still running on its own')
                 self._prof.prof('work_submitted', uid=self._uid)
 
+    def _wake_up(self, delay):
+        '''
+        A simulation process that ends after `delay`. The simulation pauses
+        when a process ends, so the workflows planned to start then are enacted
+        even when no workflow ends at that time.
+        '''
+
+        yield self._env.timeout(delay)
+        self._hold = False
+
     def monitor(self):
         '''
         This method monitors the state of the workflows. If the state is one of
@@ -228,7 +377,7 @@ class Bookkeeper(object):
                 self._prof.prof('workflow_monitor', uid=self._uid)
                 workflows = deepcopy(self._workflows_to_monitor)
                 finished = list()
-                tmp_start_times = list()
+                deviated = list()
                 for i in range(len(workflows)):
                     if self._workflows_state[workflows[i]['id']] in st.CFINAL:
                         resource = self._unavail_resources[i]
@@ -242,15 +391,20 @@ class Bookkeeper(object):
                                                 workflows[i]['id'],
                                                 self._env.now,
                                                 self._est_end_times[resource['id']])
+                            deviated.append(resource)
 
-                            # Creates an array with the expected free time of each
-                            # resource. The resource that was just freed will
-                            # use the time now.
-                            for res in self._resources:
-                                if res == resource:
-                                    tmp_start_times.append(self._env.now)
-                                else:
-                                    tmp_start_times.append(self._est_end_times[res['id']])
+                # Creates an array with the expected free time of each
+                # resource, once for all the workflows that finished. The
+                # resources that were just freed will use the time now.
+                tmp_start_times = list()
+                if deviated:
+                    for res in self._resources:
+                        if res in deviated:
+                            tmp_start_times.append(self._env.now)
+                        else:
+                            tmp_start_times.append(
+                                self._est_end_times.get(res['id'],
+                                                        self._env.now))
 
                 if finished:
                     with self._monitor_lock:
@@ -283,8 +437,17 @@ class Bookkeeper(object):
                     # workflows are executing, so nothing to plan for and
                     # the enactor should continue running.
                     self._plan = tmp_plan
+                    # The new plan already places waiting workflows after
+                    # their predecessors.
+                    self._waiting = set()
 
                     self._update_checkpoints()
+                    if self._admission and tmp_campaign and \
+                       not self._verify_objective():
+                        self._prof.prof('admission_start', uid=self._uid)
+                        self._admit(campaign=tmp_campaign,
+                                    start_time=tmp_start_times)
+                        self._prof.prof('admission_ended', uid=self._uid)
 
                 if finished:
                     self._hold = False
@@ -370,7 +533,8 @@ class Bookkeeper(object):
                     if self._workflows_state[workflow['id']] is st.FAILED:
                         self._campaign['state'] = st.FAILED
                         break
-                    elif self._workflows_state[workflow['id']] not in st.CFINAL:
+                    elif self._workflows_state[workflow['id']] not in st.CFINAL \
+                         and self._workflows_state[workflow['id']] != st.DEFERRED:
                         cont = True
 
                 if not cont:
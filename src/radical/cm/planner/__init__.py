@@ -5,7 +5,14 @@ Copyright: 2018-2019
 """
 
 from .base import Planner  # noqa: F401
+from .est_tx import EstTxMatrix  # noqa: F401
 from .heft_planner import HeftPlanner  # noqa: F401
 from .random_planner import RandomPlanner  # noqa: F401
 from .l2ff_planner import L2FFPlanner  # noqa: F401
 from .ga_planner import GAPlanner  # noqa: F401
+from .nsga_planner import NSGAPlanner  # noqa: F401
+from .minmin_planner import MinMinPlanner  # noqa: F401
+from .maxmin_planner import MaxMinPlanner  # noqa: F401
+from .sufferage_planner import SufferagePlanner  # noqa: F401
+from .local_search_planner import LocalSearchPlanner  # noqa: F401
+from .deadline_planner import DeadlinePlanner  # noqa: F401
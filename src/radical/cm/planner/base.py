@@ -4,8 +4,14 @@ License: MIT
 Copyright: 2018-2019
 """
 import os
+import numpy as np
 import radical.utils as ru
 
+from . import bounds
+from .est_tx import EstTxMatrix
+from .load_tracker import LoadTracker
+from ..utils import dag
+
 
 class Planner(object):
     '''
@@ -19,33 +25,139 @@ class Planner(object):
     should calculate and return the execution plan. Each class can overleoad the
     basic tuple with additional information based on what the planner is supposed
     to do.
+
+    Planners that make random choices draw them from a random number generator
+    owned by the planner instance, see `_get_rng`. The `seed` constructor
+    parameter makes these choices reproducible.
+
+    The plan of any planner can be improved with `rebalance`, which moves
+    workflows away from the most loaded resource, and `gap` reports how far
+    its makespan is from a lower bound of the optimal makespan.
     '''
 
-    def __init__(self, campaign, resources, num_oper, sid=None):
+    def __init__(self, campaign, resources, num_oper, sid=None, seed=None):
         self._campaign = campaign
         self._resources = resources
         self._num_oper = num_oper
         self._plan = list()
+        self._seed = seed
+        self._rng = None
         self._uid = ru.generate_id('planner.%(counter)04d', mode=ru.ID_CUSTOM,
                                     ns=sid)
         path = os.getcwd() + '/' + sid
         self._logger = ru.Logger(name=self._uid, level='DEBUG', path=path)
 
+        # The estimated execution time table is cached between calls of
+        # `plan`, see `_calc_est_tx`.
+        self._est_tx_cache = None
+        self._est_tx_key = None
+        self._est_tx_table = None
 
-    def _calc_est_tx(self, cmp_oper, resources):
+    def _get_rng(self):
         '''
-        Calculate the execution time of each workflow on all resources.
+        Return the random number generator of the planner. It is created on
+        first use from the planner's seed. When no seed is given and the
+        `PLANNER_TEST` environment variable is set, the seed is 0, so that
+        plans are reproducible in tests. Every planner has its own generator,
+        so planners in different threads do not affect each other.
         '''
 
-        est_tx = list()
-        for wf_oper in cmp_oper:
-            tmp_est_tx = list()
-            for resource in resources:
-                tmp_est_tx.append(float(wf_oper / resource))
+        if self._rng is None:
+            seed = self._seed
+            if seed is None and \
+               os.environ.get('PLANNER_TEST', 'FALSE').lower() == 'true':
+                self._logger.debug('Setting seed')
+                seed = 0
+            self._rng = np.random.default_rng(seed)
 
-            est_tx.append(tmp_est_tx)
+        return self._rng
+
+    def _calc_est_tx(self, cmp_oper, resources, wf_ids=None, res_ids=None):
+        '''
+        Calculate the execution time of each workflow on all resources. The
+        table is returned as a 2-D float64 ndarray, whose index is
+        <workflow_idx, resource_idx>.
 
-        return est_tx
+        When the workflow and resource IDs are given, the table is served from
+        an EstTxMatrix kept by the planner. Only the rows and columns of the
+        workflows and resources that changed since the last call are
+        recalculated, and if nothing changed the last table is returned as is.
+        Workflows that are not part of the call are evicted from the cache.
+        The returned table is read-only and never a view of the cache, so a
+        later update does not change a table a planner kept.
+        '''
+
+        if wf_ids is None or res_ids is None:
+            return EstTxMatrix(num_oper=cmp_oper, performance=resources).matrix
+
+        if self._est_tx_cache is None:
+            self._est_tx_cache = EstTxMatrix(num_oper=cmp_oper,
+                                             performance=resources,
+                                             wf_ids=wf_ids, res_ids=res_ids)
+            self._est_tx_key = None
+        else:
+            self._est_tx_cache.update(wf_ids=wf_ids, num_oper=cmp_oper,
+                                      res_ids=res_ids, performance=resources,
+                                      evict=True)
+
+        key = (self._est_tx_cache.version, wf_ids, res_ids)
+        if key != self._est_tx_key:
+            self._logger.debug('Est. execution time table version %d',
+                               self._est_tx_cache.version)
+            table = self._est_tx_cache.take(wf_ids=wf_ids, res_ids=res_ids)
+            if np.shares_memory(table, self._est_tx_cache.matrix):
+                table = table.copy()
+            table.flags.writeable = False
+            self._est_tx_table = table
+            self._est_tx_key = key
+
+        return self._est_tx_table
+
+    def _get_est_tx(self, num_oper, resources, campaign=None):
+        '''
+        Return the estimated execution time table of a set of workflows, given
+        by their number of operations, on a set of resources. All planners use
+        this method so the table is built in one place. When the campaign is
+        given, the table is cached by workflow and resource ID.
+        '''
+
+        res_perf = [resource['performance'] for resource in resources]
+        wf_ids = None
+        res_ids = None
+        if campaign is not None:
+            try:
+                wf_ids = tuple(_get_uid(workflow) for workflow in campaign)
+                res_ids = tuple(_get_uid(resource) for resource in resources)
+                if len(set(wf_ids)) != len(wf_ids) or \
+                   len(set(res_ids)) != len(res_ids):
+                    wf_ids = res_ids = None
+            except (KeyError, TypeError):
+                # Entities without a unique, hashable ID cannot be cached.
+                wf_ids = res_ids = None
+
+        return np.asarray(self._calc_est_tx(cmp_oper=num_oper,
+                                            resources=res_perf,
+                                            wf_ids=wf_ids, res_ids=res_ids),
+                          dtype=np.float64)
+
+    def _get_resource_free(self, start_time, num_resources):
+        '''
+        Return a float64 array with the time each resource becomes available.
+        `start_time` can be a list with a time per resource, a single time for
+        all resources or `None`, in which case all resources are available at
+        time 0. A list is copied, so the caller's list is not changed. It must
+        have a time per resource.
+        '''
+
+        if isinstance(start_time, (list, tuple, np.ndarray)):
+            if len(start_time) != num_resources:
+                raise ValueError('Expected %d start times, one per resource, '
+                                 'got %d' % (num_resources, len(start_time)))
+            return np.array(start_time, dtype=np.float64)
+        elif isinstance(start_time, (float, int)):
+            return np.full(num_resources, start_time, dtype=np.float64)
+        else:
+            return np.zeros(num_resources, dtype=np.float64)
 
     def plan(self, campaign=None, resources=None, num_oper=None, start_time=0,
              **kargs):
@@ -67,3 +179,188 @@ class Planner(object):
             self._logger.debug('Nothing to plan for')
 
         return self._plan
+
+    def rebalance(self, plan=None, resources=None, start_time=None,
+                  max_steps=None, swaps=False):
+        '''
+        This method implements the rebalancing procedure of Page and Naughton.
+        Workflows are moved from the most loaded resource to the resource with
+        which the makespan is the smallest, as long as the makespan improves,
+        see `LoadTracker.hill_climb`. It can run on the plan of any planner,
+        and the rebalanced plan becomes the planner's plan.
+
+        The execution time of a workflow on every resource is derived from its
+        duration in the plan and the performance of the resources. In the
+        rebalanced plan, the workflows of a resource execute one after the
+        other, in the order they have in the plan. Plans of workflows with
+        dependencies are returned as they are, since moving a workflow would
+        delay its successors.
+
+        *Parameters:*
+            plan: The plan to rebalance. Defaults to the planner's plan.
+            resources: The resources workflows can move to. Defaults to the
+                       planner's resources.
+            start_time: The time each resource becomes available, as in `plan`.
+                        By default, it is the earliest start time of the plan
+                        on the resource, or of the whole plan for resources
+                        without workflows.
+
+        *Keyword arguments:*
+            max_steps: The maximum number of applied moves. Defaults to
+                       `None`, i.e. until no move improves the plan.
+            swaps: When `True`, workflows of the most loaded resource are also
+                   swapped with workflows of other resources. Defaults to
+                   `False`.
+
+        *Returns:*
+            list(tuples)
+        '''
+
+        tmp_plan = list(plan if plan is not None else self._plan)
+        tmp_res = resources if resources else self._resources
+        if not tmp_plan:
+            return tmp_plan
+
+        if any(dag.get_predecessors([entry[0] for entry in tmp_plan])):
+            self._logger.warning('Workflows have dependencies, the plan is ' +
+                                 'not rebalanced')
+            return tmp_plan
+
+        assignment, durations, performance = self._plan_arrays(tmp_plan,
+                                                               tmp_res)
+
+        # Durations on the workflow's own resource are kept as they are.
+        num_oper = durations * performance[assignment]
+        est_tx = np.divide.outer(num_oper, performance)
+        est_tx[np.arange(len(tmp_plan)), assignment] = durations
+
+        if start_time is None:
+            str_times = np.array([entry[2] for entry in tmp_plan],
+                                 dtype=np.float64)
+            resource_free = np.full(len(tmp_res), np.inf)
+            np.minimum.at(resource_free, assignment, str_times)
+            resource_free[np.isinf(resource_free)] = str_times.min()
+        else:
+            resource_free = self._get_resource_free(start_time, len(tmp_res))
+
+        tracker = LoadTracker(est_tx, assignment, resource_free=resource_free)
+        makespan = tracker.makespan
+        steps = tracker.hill_climb(max_steps=max_steps, swaps=swaps)
+        self._logger.debug('Rebalanced plan with %d steps, makespan %f -> %f',
+                           steps, makespan, tracker.makespan)
+
+        new_plan = self._build_plan([entry[0] for entry in tmp_plan], tmp_res,
+                                    tracker.assignment, resource_free, est_tx)
+        self._plan = [new_entry + tuple(entry[4:])
+                      for new_entry, entry in zip(new_plan, tmp_plan)]
+
+        return self._plan
+
+    def gap(self, plan=None, resources=None, start_time=None):
+        '''
+        This method returns the optimality gap of a plan, i.e. how much larger
+        than a lower bound of the optimal makespan its makespan is, relative to
+        the bound, see `bounds.lower_bound`. Both are measured from the time
+        the first resource becomes available. It can be used with the plan of
+        any planner.
+
+        *Parameters:*
+            plan: The plan. Defaults to the planner's plan.
+            resources: The resources of the plan. Defaults to the planner's
+                       resources.
+            start_time: The time each resource becomes available, as in `plan`.
+                        By default, all resources are available when the first
+                        workflow of the plan starts.
+
+        *Returns:*
+            float
+        '''
+
+        tmp_plan = plan if plan is not None else self._plan
+        tmp_res = resources if resources else self._resources
+        if not tmp_plan:
+            return 0.0
+
+        assignment, durations, performance = self._plan_arrays(tmp_plan,
+                                                               tmp_res)
+        if start_time is None:
+            resource_free = np.full(len(tmp_res),
+                                    min(entry[2] for entry in tmp_plan),
+                                    dtype=np.float64)
+        else:
+            resource_free = self._get_resource_free(start_time, len(tmp_res))
+
+        bound = bounds.lower_bound(durations * performance[assignment],
+                                   performance, resource_free)
+        makespan = max(entry[3] for entry in tmp_plan)
+        plan_gap = bounds.gap(makespan, bound, float(resource_free.min()))
+        self._logger.info('Makespan %f, lower bound %f, gap %f', makespan,
+                          bound, plan_gap)
+
+        return plan_gap
+
+    def _plan_arrays(self, plan, resources):
+        '''
+        Return the index of the resource of each workflow of a plan, the
+        duration of each workflow and the performance of the resources. The
+        operations of a workflow are its duration times the performance of its
+        resource.
+        '''
+
+        res_idx = {_get_uid(resource): idx
+                   for idx, resource in enumerate(resources)}
+        assignment = np.array([res_idx[_get_uid(entry[1])] for entry in plan],
+                              dtype=np.int64)
+        durations = np.array([entry[3] - entry[2] for entry in plan],
+                             dtype=np.float64)
+        performance = np.array([resource['performance']
+                                for resource in resources], dtype=np.float64)
+
+        return assignment, durations, performance
+
+    def _build_plan(self, workflows, resources, assignment, resource_free,
+                    est_tx):
+        '''
+        Return the plan of an assignment, given as the index of the resource
+        of every workflow. The workflows of a resource execute one after the
+        other, in the order of `workflows`, from the time the resource becomes
+        available.
+
+        *Parameters:*
+            workflows: The workflows of the plan.
+            resources: The resources the indices of `assignment` refer to.
+            assignment: The index of the resource of every workflow.
+            resource_free: The time each resource becomes available.
+            est_tx: The execution time of every workflow on every resource.
+
+        *Returns:*
+            list(tuples)
+        '''
+
+        assignment = np.asarray(assignment, dtype=np.int64)
+        est_tx = np.asarray(est_tx, dtype=np.float64)
+        wf_est_tx = est_tx[np.arange(len(workflows)), assignment].tolist()
+        resource_free = np.asarray(resource_free, dtype=np.float64).tolist()
+
+        plan = list()
+        for workflow, res_idx, tmp_est_tx in zip(workflows,
+                                                 assignment.tolist(),
+                                                 wf_est_tx):
+            tmp_str_time = resource_free[res_idx]
+            tmp_end_time = tmp_str_time + tmp_est_tx
+            plan.append((workflow, resources[res_idx], tmp_str_time,
+                         tmp_end_time))
+            resource_free[res_idx] = tmp_end_time
+
+        return plan
+
+
+def _get_uid(entity):
+    '''
+    Return the ID of a workflow or a resource. Entities that are not
+    dictionaries are their own ID.
+    '''
+
+    if isinstance(entity, dict):
+        return entity['id']
+    return entity
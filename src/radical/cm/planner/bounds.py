@@ -0,0 +1,155 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+
+Lower bounds of the makespan of a campaign on uniformly related resources,
+i.e. resources whose execution time of a workflow is the workflow's operations
+divided by the resource's performance. All bounds are times at which the last
+workflow ends, and they take into account the time each resource becomes
+available. Without it, all resources are available at time 0.
+"""
+import numpy as np
+
+
+def _as_arrays(num_oper, performance, resource_free):
+
+    num_oper = np.asarray(num_oper, dtype=np.float64)
+    performance = np.asarray(performance, dtype=np.float64)
+    if resource_free is None:
+        resource_free = np.zeros(performance.shape[0], dtype=np.float64)
+    else:
+        resource_free = np.asarray(resource_free, dtype=np.float64)
+
+    return num_oper, performance, resource_free
+
+
+def ratio_bound(num_oper, performance, resource_free=None):
+    '''
+    Returns the time at which all resources together execute all operations,
+    when operations can be split freely between resources. Without start
+    times, it is the total operations divided by the total performance.
+    '''
+
+    num_oper, performance, resource_free = _as_arrays(num_oper, performance,
+                                                      resource_free)
+    if not num_oper.shape[0]:
+        return float(resource_free.min()) if resource_free.shape[0] else 0.0
+
+    # Resources join in the order they become available. Between two
+    # consecutive start times, the available resources execute operations at
+    # the sum of their performance.
+    order = np.argsort(resource_free, kind='stable')
+    free = resource_free[order]
+    rate = np.cumsum(performance[order])
+    done = np.r_[0, np.cumsum(rate[:-1] * np.diff(free))]
+    total = num_oper.sum()
+    last = int(np.searchsorted(done, total, side='right')) - 1
+
+    return float(free[last] + (total - done[last]) / rate[last])
+
+
+def largest_bound(num_oper, performance, resource_free=None):
+    '''
+    Returns the time the last workflow ends when every workflow executes alone
+    on the resource where it ends first. Without start times, it is the time
+    of the largest workflow on the fastest resource.
+    '''
+
+    num_oper, performance, resource_free = _as_arrays(num_oper, performance,
+                                                      resource_free)
+    if not num_oper.shape[0]:
+        return float(resource_free.min()) if resource_free.shape[0] else 0.0
+
+    # The largest workflow ends last on every resource.
+    return float((resource_free + num_oper.max() / performance).min())
+
+
+def preemptive_bound(num_oper, performance, resource_free=None):
+    '''
+    Returns a lower bound of the makespan of a preemptive plan, in which a
+    workflow can move between resources but never executes on two at once.
+    This is the relaxation of the linear program of the plan that keeps this
+    constraint. It is at least as large as `ratio_bound` and `largest_bound`.
+
+    The k largest workflows need at least as much time as the k fastest
+    resources take to execute them, for every k. Without start times, the
+    bound is the largest of these times, see Gonzalez and Sahni, "Preemptive
+    scheduling of uniform processor systems," Journal of the ACM, 1978.
+    Otherwise, resources join in the order they become available, and the
+    bound is found in the first interval between two start times that holds
+    it, after sorting the resources once.
+    '''
+
+    num_oper, performance, resource_free = _as_arrays(num_oper, performance,
+                                                      resource_free)
+    if not num_oper.shape[0]:
+        return float(resource_free.min()) if resource_free.shape[0] else 0.0
+
+    prefix_oper = np.cumsum(np.sort(num_oper)[::-1])
+    if (resource_free == resource_free[0]).all():
+        prefix_perf = np.cumsum(np.sort(performance)[::-1])
+        num_k = min(prefix_oper.shape[0], prefix_perf.shape[0])
+        return float(resource_free[0] +
+                     max((prefix_oper[:num_k] / prefix_perf[:num_k]).max(),
+                         prefix_oper[-1] / prefix_perf[-1]))
+
+    # Within an interval, the k fastest available resources execute
+    # operations at the sum of their performance, so the time at which they
+    # execute the k largest workflows is linear. `capacity` holds the
+    # operations the k fastest resources executed by the start of the
+    # interval, for every k smaller than the number of available resources,
+    # and `total` those of all of them, which is the capacity of every larger
+    # k. Larger k never bind before the last workflow, so every interval
+    # takes time linear in the number of available resources.
+    order = np.argsort(resource_free, kind='stable')
+    free = np.r_[resource_free[order], np.inf]
+    num_k = min(prefix_oper.shape[0], performance.shape[0])
+    capacity = np.zeros(num_k, dtype=np.float64)
+    total = 0.0
+    speeds = np.empty(0, dtype=np.float64)
+    for idx, res_idx in enumerate(order):
+        speed = performance[res_idx]
+        speeds = np.insert(speeds,
+                           np.searchsorted(-speeds, -speed, side='right'),
+                           speed)
+        if idx < num_k:
+            capacity[idx] = total
+        num_av = min(idx + 1, num_k)
+        rate = np.cumsum(speeds[:num_av])
+        rate_total = rate[-1] if num_av == idx + 1 else speeds.sum()
+        needed = max(((prefix_oper[:num_av] - capacity[:num_av]) /
+                      rate).max(),
+                     (prefix_oper[-1] - total) / rate_total, 0.0)
+        if free[idx] + needed <= free[idx + 1]:
+            break
+        length = free[idx + 1] - free[idx]
+        capacity[:num_av] += length * rate
+        total += length * rate_total
+
+    return float(max(free[idx] + needed,
+                     ratio_bound(num_oper, performance, resource_free),
+                     largest_bound(num_oper, performance, resource_free)))
+
+
+def lower_bound(num_oper, performance, resource_free=None):
+    '''
+    Returns the largest of the lower bounds of the makespan.
+    '''
+
+    return max(ratio_bound(num_oper, performance, resource_free),
+               largest_bound(num_oper, performance, resource_free),
+               preemptive_bound(num_oper, performance, resource_free))
+
+
+def gap(makespan, bound, start=0.0):
+    '''
+    Returns the optimality gap of a makespan, i.e. how much larger than the
+    lower bound it is, relative to the bound. Both are measured from `start`,
+    the time the first resource becomes available.
+    '''
+
+    if bound <= start:
+        return 0.0 if makespan <= start else np.inf
+
+    return float((makespan - bound) / (bound - start))
@@ -0,0 +1,367 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import numpy as np
+
+from . import bounds
+from .base import Planner
+from .load_tracker import LoadTracker
+
+
+class DeadlinePlanner(Planner):
+    '''
+    This class implements a campaign planner that searches for a plan whose
+    makespan meets a deadline, with the dual approximation approach for
+    uniformly related resources.
+
+    For reference:
+    D. S. Hochbaum and D. B. Shmoys, "A polynomial approximation scheme for
+    scheduling on uniform processors: using the dual approximation approach,"
+    SIAM Journal on Computing, vol. 17, no. 3, pp. 539-551, 1988.
+
+    For a target makespan T, workflows are taken in decreasing number of
+    operations, and each is placed on the slowest resource on which it ends
+    by T, among the resources whose load is still smaller than T. When a
+    workflow cannot be placed, the resources on which it ends by T are loaded
+    with workflows at least as large, which cannot execute anywhere else by T,
+    so no plan ends by T. Otherwise, every workflow ends by 2T. The decision
+    takes O(nm) time, see `_relaxed_assignment`.
+
+    A binary search on T, between a lower bound of the makespan and the
+    makespan of a greedy plan, finds the smallest T that is not refuted. The
+    plan of every T that is not refuted is improved with hill climbing, see
+    `LoadTracker.hill_climb`, and the search stops as soon as a plan meets
+    the deadline. Whether the deadline is met, cannot be met, or neither could
+    be shown is reported by `feasible`.
+
+    When the deadline cannot be met, `admit` selects the workflows that are
+    planned, so that the plan meets the deadline and completes as much work
+    as possible.
+
+    Constractor parameters:
+    campaign: A list of workflows
+    resources: A list of resources, whose performance is given in operations per second
+    num_oper: The number of operations each workflow will execute
+    deadline: The makespan the plan should meet. Without it, the makespan is
+              minimized.
+    rtol: The relative tolerance of the binary search. Defaults to 1e-3.
+
+    The class implements a plan method that return a plan, a list of tuples.
+
+    Each tuple will have the workflow, selected resource, starting time and
+    estimated finish time.
+    '''
+
+    def __init__(self, campaign, resources, num_oper, sid=None, deadline=None,
+                 rtol=1e-3):
+
+        super(DeadlinePlanner, self).__init__(campaign=campaign,
+                                              resources=resources,
+                                              num_oper=num_oper,
+                                              sid=sid)
+        self._deadline = deadline
+        self._rtol = rtol
+
+        # The outcome of the last call of `plan`, see `feasible`, and the
+        # largest makespan that was shown to be smaller than the optimal.
+        self._feasible = None
+        self._refuted = None
+
+    @property
+    def feasible(self):
+        '''
+        `True` when the last plan meets the deadline, `False` when no plan can
+        meet it, and `None` when neither could be shown, or when no deadline
+        was given.
+        '''
+
+        return self._feasible
+
+    def _relaxed_assignment(self, target, wf_order, res_order, resource_free):
+        '''
+        Return the index of the resource of every workflow in a plan whose
+        makespan is at most twice the target, or `None` when no plan has a
+        makespan of at most the target. `wf_order` gives the workflows in
+        decreasing number of operations and `res_order` the resources in
+        increasing performance.
+        '''
+
+        est_tx = self._est_tx[:, res_order]
+        fits = resource_free[res_order] + est_tx <= target
+        loads = resource_free[res_order].copy()
+        assignment = np.empty(est_tx.shape[0], dtype=np.int64)
+        for wf_idx in wf_order:
+            eligible = fits[wf_idx] & (loads < target)
+            pos = int(np.argmax(eligible))
+            if not eligible[pos]:
+                return None
+            assignment[wf_idx] = res_order[pos]
+            loads[pos] += est_tx[wf_idx, pos]
+
+        return assignment
+
+    def _greedy_assignment(self, wf_order, resource_free):
+        '''
+        Return the index of the resource of every workflow when workflows are
+        placed, in decreasing number of operations, on the resource where they
+        end first.
+        '''
+
+        loads = resource_free.copy()
+        assignment = np.empty(self._est_tx.shape[0], dtype=np.int64)
+        for wf_idx in wf_order:
+            res_idx = int(np.argmin(loads + self._est_tx[wf_idx]))
+            assignment[wf_idx] = res_idx
+            loads[res_idx] += self._est_tx[wf_idx, res_idx]
+
+        return assignment
+
+    def _improve(self, assignment, resource_free):
+        '''
+        Return a hill climbed assignment and its makespan.
+        '''
+
+        tracker = LoadTracker(self._est_tx, assignment,
+                              resource_free=resource_free)
+        tracker.hill_climb()
+
+        return tracker.assignment, tracker.makespan
+
+    def plan(self, campaign=None, resources=None, num_oper=None, start_time=None,
+             **kargs):
+        '''
+        This method implements the binary search. It returns a list of tuples
+        Each tuple contains: Workflow ID, Resource ID, Start Time, End Time.
+
+        The plan method takes as input a campaign, resources and num_oper in case
+        any of these has changed. They default to `None`
+
+        When the deadline cannot be met, the plan with the smallest makespan
+        that was found is returned, and `feasible` is `False` or `None`.
+
+        *Keyword arguments:*
+            deadline: The makespan the plan should meet. Defaults to the
+                      deadline of the constructor.
+
+        *Returns:*
+            list(tuples)
+        '''
+
+        tmp_cmp = campaign if campaign else self._campaign
+        tmp_res = resources if resources else self._resources
+        tmp_nop = num_oper if num_oper else self._num_oper
+        deadline = kargs.get('deadline', self._deadline)
+
+        # Reset the plan in case of a recall
+        self._plan = list()
+        self._feasible = None
+        self._refuted = None
+        if not tmp_cmp:
+            self._feasible = True if deadline is not None else None
+            return self._plan
+
+        resource_free = self._get_resource_free(start_time, len(tmp_res))
+        self._est_tx = self._get_est_tx(num_oper=tmp_nop, resources=tmp_res,
+                                        campaign=tmp_cmp)
+        performance = [res['performance'] for res in tmp_res]
+        wf_order = np.argsort(-np.asarray(tmp_nop, dtype=np.float64),
+                              kind='stable')
+        res_order = np.argsort(performance, kind='stable')
+
+        best, makespan = self._improve(
+                            self._greedy_assignment(wf_order, resource_free),
+                            resource_free)
+        high = makespan
+
+        def _met():
+            return deadline is not None and makespan <= deadline
+
+        if _met():
+            # The greedy plan meets the deadline, there is nothing to search.
+            self._feasible = True
+            self._logger.debug('Makespan %f meets the deadline', makespan)
+            self._plan = self._build_plan(tmp_cmp, tmp_res, best,
+                                          resource_free, self._est_tx)
+            self._logger.info('Derived plan %s', self._plan)
+            return self._plan
+
+        low = bounds.lower_bound(tmp_nop, performance, resource_free)
+        if deadline is not None:
+            if deadline < low:
+                self._refuted = deadline
+            else:
+                # The decision of the deadline itself.
+                assignment = self._relaxed_assignment(deadline, wf_order,
+                                                      res_order, resource_free)
+                if assignment is None:
+                    self._refuted = deadline
+                else:
+                    assignment, tmp_makespan = self._improve(assignment,
+                                                             resource_free)
+                    if tmp_makespan < makespan:
+                        best, makespan = assignment, tmp_makespan
+                    high = min(high, deadline)
+            if self._refuted is not None:
+                self._logger.info('Deadline %f cannot be met', deadline)
+                low = max(low, deadline)
+
+        while not _met() and high - low > self._rtol * high:
+            target = (low + high) / 2
+            assignment = self._relaxed_assignment(target, wf_order, res_order,
+                                                  resource_free)
+            if assignment is None:
+                low = target
+                self._refuted = target
+                continue
+            high = target
+            assignment, tmp_makespan = self._improve(assignment,
+                                                     resource_free)
+            if tmp_makespan < makespan:
+                best, makespan = assignment, tmp_makespan
+
+        if _met():
+            self._feasible = True
+        elif deadline is not None and self._refuted is not None and \
+             self._refuted >= deadline:
+            self._feasible = False
+        self._logger.debug('Makespan %f, optimal makespan in [%f, %f]',
+                           makespan, low, makespan)
+
+        self._plan = self._build_plan(tmp_cmp, tmp_res, best, resource_free,
+                                      self._est_tx)
+        self._logger.info('Derived plan %s', self._plan)
+        return self._plan
+
+    def _loads(self, plan, resources, resource_free):
+        '''
+        Return the time each resource ends the workflows of a plan.
+        '''
+
+        loads = resource_free.copy()
+        if plan:
+            assignment, _, _ = self._plan_arrays(plan, resources)
+            np.maximum.at(loads, assignment, [entry[3] for entry in plan])
+
+        return loads
+
+    def admit(self, campaign=None, resources=None, num_oper=None,
+              start_time=None, weights=None, deadline=None):
+        '''
+        This method implements admission control. It selects a subset of the
+        workflows whose plan meets the deadline, and whose total weight is as
+        large as possible, a knapsack problem with a plan per candidate subset.
+
+        Workflows are taken in decreasing weight per operation. The longest
+        prefix of them that meets the deadline is found by binary search, and
+        every other workflow is added when the plan still meets the deadline.
+        As in the greedy algorithm of the knapsack problem, the workflow with
+        the largest weight is admitted alone when it weighs more than the
+        greedy subset. A subset is planned only when its operations fit in
+        the capacity of the resources until the deadline, see
+        `bounds.ratio_bound`, and it is admitted only when its plan meets the
+        deadline, see `plan`.
+
+        A workflow that is added after the prefix is first placed after the
+        admitted plan, on the resource where it ends first. The admitted
+        workflows are planned again with it only when it does not end by the
+        deadline there, and workflows that do not fit in the capacity left
+        are skipped without planning.
+
+        *Parameters:*
+            campaign, resources, num_oper, start_time: As in `plan`.
+            weights: The weight of every workflow. Defaults to the number of
+                     operations, i.e. the completed work is maximized.
+            deadline: The makespan the plan should meet. Defaults to the
+                      deadline of the constructor.
+
+        *Returns:*
+            list(tuples): the plan of the admitted workflows.
+        '''
+
+        tmp_cmp = campaign if campaign else self._campaign
+        tmp_res = resources if resources else self._resources
+        tmp_nop = num_oper if num_oper else self._num_oper
+        deadline = deadline if deadline is not None else self._deadline
+        if deadline is None:
+            raise ValueError('Admission control needs a deadline')
+
+        ops = np.asarray(tmp_nop, dtype=np.float64)
+        weights = ops if weights is None else np.asarray(weights,
+                                                         dtype=np.float64)
+        performance = np.array([res['performance'] for res in tmp_res],
+                               dtype=np.float64)
+        resource_free = self._get_resource_free(start_time, len(tmp_res))
+
+        # Workflows that do not end by the deadline on any resource are never
+        # admitted.
+        fits = (resource_free + np.divide.outer(ops, performance) <=
+                deadline).any(axis=1)
+        density = np.full(ops.shape[0], np.inf)
+        np.divide(weights, ops, out=density, where=ops > 0)
+        order = [int(idx) for idx in np.argsort(-density, kind='stable')
+                 if fits[idx]]
+
+        def _admitted(indices):
+            # Return the plan of the workflows when it meets the deadline.
+            if not indices:
+                return list()
+            elif bounds.ratio_bound(ops[indices], performance,
+                                    resource_free) > deadline:
+                return None
+            tmp_plan = self.plan(campaign=[tmp_cmp[idx] for idx in indices],
+                                 resources=tmp_res,
+                                 num_oper=[tmp_nop[idx] for idx in indices],
+                                 start_time=start_time, deadline=deadline)
+            return tmp_plan if self._feasible else None
+
+        low, high = 0, len(order)
+        admitted_plan = list()
+        while low < high:
+            mid = (low + high + 1) // 2
+            tmp_plan = _admitted(order[:mid])
+            if tmp_plan is None:
+                high = mid - 1
+            else:
+                low = mid
+                admitted_plan = tmp_plan
+        admitted = order[:low]
+        slack = (performance * np.maximum(deadline - resource_free, 0)).sum() \
+            - ops[admitted].sum()
+        loads = self._loads(admitted_plan, tmp_res, resource_free)
+        for idx in order[low + 1:]:
+            if ops[idx] > slack:
+                continue
+            ends = loads + ops[idx] / performance
+            res_idx = int(np.argmin(ends))
+            if ends[res_idx] <= deadline:
+                admitted_plan.append((tmp_cmp[idx], tmp_res[res_idx],
+                                      float(loads[res_idx]),
+                                      float(ends[res_idx])))
+                loads[res_idx] = ends[res_idx]
+            else:
+                tmp_plan = _admitted(admitted + [idx])
+                if tmp_plan is None:
+                    continue
+                admitted_plan = tmp_plan
+                loads = self._loads(admitted_plan, tmp_res, resource_free)
+            admitted.append(idx)
+            slack -= ops[idx]
+
+        if order:
+            heaviest = max(order, key=lambda idx: weights[idx])
+            if weights[heaviest] > weights[admitted].sum():
+                # The greedy subset is kept when no plan of the heaviest
+                # workflow alone is found.
+                tmp_plan = _admitted([heaviest])
+                if tmp_plan is not None:
+                    admitted = [heaviest]
+                    admitted_plan = tmp_plan
+
+        self._logger.info('Admitted %d of %d workflows, weight %f of %f',
+                          len(admitted), len(tmp_cmp),
+                          weights[admitted].sum(), weights.sum())
+        self._plan = admitted_plan
+        self._feasible = True
+        return self._plan
@@ -0,0 +1,288 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import numpy as np
+
+
+class EstTxMatrix(object):
+    '''
+    This class holds the estimated execution time of each workflow on each
+    resource. The table is a 2-D float64 ndarray, whose index is
+    <workflow_idx, resource_idx>. It is calculated with a single outer division
+    of the workflows' operations and the resources' performance, so no Python
+    level loop or boxed float is involved.
+
+    Rows are keyed by workflow ID and columns by resource ID. When a resource's
+    performance or a workflow's operations change, or workflows and resources
+    are added or removed, only the affected rows or columns are recalculated.
+    Every change increases `version`, so users of the table can tell whether
+    anything changed since they last read it.
+
+    Constractor parameters:
+    num_oper: The number of operations each workflow will execute
+    performance: The performance of each resource in operations per second
+    wf_ids: The IDs of the workflows. Defaults to their index.
+    res_ids: The IDs of the resources. Defaults to their index.
+    '''
+
+    def __init__(self, num_oper, performance, wf_ids=None, res_ids=None):
+
+        self._num_oper = np.asarray(num_oper, dtype=np.float64)
+        self._performance = np.asarray(performance, dtype=np.float64)
+
+        if wf_ids is None:
+            wf_ids = range(self._num_oper.shape[0])
+        if res_ids is None:
+            res_ids = range(self._performance.shape[0])
+
+        self._wf_ids = list(wf_ids)
+        self._res_ids = list(res_ids)
+        self._wf_idx = {wf_id: idx for idx, wf_id in enumerate(self._wf_ids)}
+        self._res_idx = {res_id: idx for idx, res_id in enumerate(self._res_ids)}
+
+        if len(self._wf_idx) != len(self._wf_ids) or \
+           len(self._res_idx) != len(self._res_ids):
+            raise ValueError('Workflow and resource IDs should be unique')
+
+        # Rows are kept in a buffer that grows geometrically, so that adding
+        # workflows one at a time does not copy the whole table every time.
+        self._buffer = np.divide.outer(self._num_oper, self._performance)
+        self._rows = self._buffer.shape[0]
+        self._version = 0
+
+    @property
+    def matrix(self):
+        '''
+        The estimated execution time table as a 2-D float64 ndarray.
+        '''
+
+        return self._buffer[:self._rows]
+
+    @property
+    def version(self):
+        '''
+        A counter that increases every time the table changes.
+        '''
+
+        return self._version
+
+    @property
+    def workflow_ids(self):
+
+        return list(self._wf_ids)
+
+    @property
+    def resource_ids(self):
+
+        return list(self._res_ids)
+
+    @property
+    def shape(self):
+
+        return (self._rows, len(self._res_ids))
+
+    def __len__(self):
+
+        return self._rows
+
+    def __getitem__(self, key):
+
+        return self.matrix[key]
+
+    def __array__(self, dtype=None, copy=None):
+
+        if dtype is None:
+            return self.matrix
+        return self.matrix.astype(dtype)
+
+    def set_performance(self, res_id, performance):
+        '''
+        Change the performance of a resource and recalculate its column.
+        '''
+
+        col = self._res_idx[res_id]
+        if self._performance[col] == performance:
+            return
+
+        self._performance[col] = performance
+        self._buffer[:self._rows, col] = self._num_oper / self._performance[col]
+        self._version += 1
+
+    def set_num_oper(self, wf_id, num_oper):
+        '''
+        Change the number of operations of a workflow and recalculate its row.
+        '''
+
+        row = self._wf_idx[wf_id]
+        if self._num_oper[row] == num_oper:
+            return
+
+        self._num_oper[row] = num_oper
+        self._buffer[row] = self._num_oper[row] / self._performance
+        self._version += 1
+
+    def add_workflows(self, wf_ids, num_oper):
+        '''
+        Add a set of workflows and calculate only their rows.
+        '''
+
+        wf_ids = list(wf_ids)
+        if not wf_ids:
+            return
+
+        for wf_id in wf_ids:
+            if wf_id in self._wf_idx:
+                raise ValueError('Workflow %s is already in the table' % wf_id)
+
+        num_oper = np.asarray(num_oper, dtype=np.float64)
+        new_rows = self._rows + len(wf_ids)
+        if new_rows > self._buffer.shape[0]:
+            capacity = max(new_rows, 2 * self._buffer.shape[0])
+            buffer = np.empty((capacity, len(self._res_ids)), dtype=np.float64)
+            buffer[:self._rows] = self._buffer[:self._rows]
+            self._buffer = buffer
+
+        self._buffer[self._rows:new_rows] = np.divide.outer(num_oper,
+                                                            self._performance)
+        self._num_oper = np.concatenate((self._num_oper, num_oper))
+        for wf_id in wf_ids:
+            self._wf_idx[wf_id] = len(self._wf_ids)
+            self._wf_ids.append(wf_id)
+        self._rows = new_rows
+        self._version += 1
+
+    def add_workflow(self, wf_id, num_oper):
+        '''
+        Add a workflow and calculate only its row.
+        '''
+
+        self.add_workflows([wf_id], [num_oper])
+
+    def remove_workflow(self, wf_id):
+        '''
+        Remove a workflow. The last row takes its place, so nothing is
+        recalculated.
+        '''
+
+        row = self._wf_idx.pop(wf_id)
+        last = self._rows - 1
+        if row != last:
+            last_id = self._wf_ids[last]
+            self._buffer[row] = self._buffer[last]
+            self._num_oper[row] = self._num_oper[last]
+            self._wf_ids[row] = last_id
+            self._wf_idx[last_id] = row
+
+        self._wf_ids.pop()
+        self._num_oper = self._num_oper[:last]
+        self._rows = last
+        self._version += 1
+
+        # Give memory back once most of the buffer is unused.
+        if self._rows < self._buffer.shape[0] // 4:
+            self._buffer = self._buffer[:2 * self._rows].copy()
+
+    def add_resource(self, res_id, performance):
+        '''
+        Add a resource and calculate only its column.
+        '''
+
+        if res_id in self._res_idx:
+            raise ValueError('Resource %s is already in the table' % res_id)
+
+        column = self._num_oper / np.float64(performance)
+        buffer = np.empty((self._buffer.shape[0], len(self._res_ids) + 1),
+                          dtype=np.float64)
+        buffer[:self._rows, :-1] = self._buffer[:self._rows]
+        buffer[:self._rows, -1] = column
+        self._buffer = buffer
+        self._performance = np.append(self._performance, performance)
+        self._res_idx[res_id] = len(self._res_ids)
+        self._res_ids.append(res_id)
+        self._version += 1
+
+    def remove_resource(self, res_id):
+        '''
+        Remove a resource and its column.
+        '''
+
+        col = self._res_idx.pop(res_id)
+        self._buffer = np.delete(self._buffer, col, axis=1)
+        self._performance = np.delete(self._performance, col)
+        self._res_ids.pop(col)
+        for idx in range(col, len(self._res_ids)):
+            self._res_idx[self._res_ids[idx]] = idx
+        self._version += 1
+
+    def update(self, wf_ids, num_oper, res_ids, performance, evict=False):
+        '''
+        Bring the table in line with a set of workflows and resources. Unknown
+        workflows and resources are added, and rows or columns whose operations
+        or performance changed are recalculated. Known workflows and resources
+        that are not part of the call are kept, unless `evict` is `True`, in
+        which case the rows of the workflows that are not part of the call are
+        removed. Replans ask for the workflows that have not started yet, so
+        evicting keeps the table from growing over a long campaign.
+        '''
+
+        if evict:
+            keep = set(wf_ids)
+            for wf_id in [wf_id for wf_id in self._wf_ids if wf_id not in keep]:
+                self.remove_workflow(wf_id)
+
+        for res_id, perf in zip(res_ids, performance):
+            if res_id in self._res_idx:
+                self.set_performance(res_id, perf)
+            else:
+                self.add_resource(res_id, perf)
+
+        new_ids = list()
+        new_oper = list()
+        old_rows = list()
+        old_oper = list()
+        for wf_id, wf_oper in zip(wf_ids, num_oper):
+            row = self._wf_idx.get(wf_id)
+            if row is None:
+                new_ids.append(wf_id)
+                new_oper.append(wf_oper)
+            else:
+                old_rows.append(row)
+                old_oper.append(wf_oper)
+
+        if old_rows:
+            old_rows = np.asarray(old_rows, dtype=np.intp)
+            old_oper = np.asarray(old_oper, dtype=np.float64)
+            changed = self._num_oper[old_rows] != old_oper
+            if changed.any():
+                rows = old_rows[changed]
+                self._num_oper[rows] = old_oper[changed]
+                self._buffer[rows] = np.divide.outer(old_oper[changed],
+                                                     self._performance)
+                self._version += 1
+
+        self.add_workflows(new_ids, new_oper)
+
+    def take(self, wf_ids, res_ids):
+        '''
+        Return the table of a set of workflows on a set of resources in the
+        given order. When the order is the one of the table, a view is returned
+        without copying.
+        '''
+
+        rows = np.fromiter((self._wf_idx[wf_id] for wf_id in wf_ids),
+                           dtype=np.intp, count=len(wf_ids))
+        cols = np.fromiter((self._res_idx[res_id] for res_id in res_ids),
+                           dtype=np.intp, count=len(res_ids))
+
+        same_rows = rows.shape[0] == self._rows and \
+                    np.array_equal(rows, np.arange(self._rows))
+        same_cols = cols.shape[0] == len(self._res_ids) and \
+                    np.array_equal(cols, np.arange(len(self._res_ids)))
+
+        if same_rows and same_cols:
+            return self.matrix
+        elif same_cols:
+            return self._buffer[rows]
+        return self._buffer[np.ix_(rows, cols)]
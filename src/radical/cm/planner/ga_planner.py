@@ -3,12 +3,164 @@ Author: Ioannis Paraskevakos
 License: MIT
 Copyright: 2018-2019
 """
-import math
-import os
-from copy import deepcopy
+import hashlib
+import multiprocessing as mp
+import threading as mt
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-from .base import Planner
-from random import random, randint, seed
+import numpy as np
+import radical.utils as ru
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from . import bounds
+from .base import Planner, _get_uid
+from .load_tracker import LoadTracker
+
+
+# ------------------------------------------------------------------------------
+#
+def _calc_loads(assignments, est_tx, num_resources):
+    '''
+    Return the total execution time of the workflows assigned to each resource,
+    for every individual. `assignments` has a row per individual and the loads
+    of all of them are summed with a single bincount.
+    '''
+
+    num_ind, num_wfs = assignments.shape
+    wf_est_tx = est_tx[np.arange(num_wfs), assignments]
+    bins = assignments + (np.arange(num_ind) * num_resources)[:, np.newaxis]
+    loads = np.bincount(bins.ravel(), weights=wf_est_tx.ravel(),
+                        minlength=num_ind * num_resources)
+
+    return loads.reshape(num_ind, num_resources)
+
+
+# ------------------------------------------------------------------------------
+#
+def _calc_scores(assignments, est_tx, abs_fitness_term, num_resources):
+    '''
+    Return the fitness and the makespan of each individual, given as rows of
+    resource indices. The fitness is the inverse of the distance of the
+    resource loads from the ideal load.
+    '''
+
+    loads = _calc_loads(assignments, est_tx, num_resources)
+    error = np.sqrt(np.square(abs_fitness_term - loads).sum(axis=1))
+
+    fitness = np.ones(error.shape[0], dtype=np.float64)
+    np.divide(1, error, out=fitness, where=error != 0)
+
+    return fitness, loads.max(axis=1)
+
+
+# The estimated execution time table of a worker process, and the shared
+# memory block it lives in. They are set by `_worker_table`.
+_worker_est_tx = None
+_worker_shm = None
+
+
+# ------------------------------------------------------------------------------
+#
+def _pool_context():
+    '''
+    Return the multiprocessing context of the process pool. Workers are not
+    forked from the planner's process, which may run other threads, e.g. the
+    ones of the Bookkeeper, but started by a fork server, or spawned where
+    there is none. As with any spawned process, the main module of a program
+    that uses workers should guard its entry point with
+    `if __name__ == '__main__':`.
+    '''
+
+    if 'forkserver' in mp.get_all_start_methods():
+        return mp.get_context('forkserver')
+    return mp.get_context('spawn')
+
+
+# ------------------------------------------------------------------------------
+#
+def _worker_table(table):
+    '''
+    Return the estimated execution time table of a task. `table` is either the
+    table itself, or the name and shape of the shared memory block the
+    planner published it in. A worker stays attached to the block of the last
+    table, and attaches to a new block only when the planner publishes a new
+    table, once per `plan`.
+    '''
+
+    global _worker_est_tx, _worker_shm
+
+    if isinstance(table, np.ndarray):
+        return table
+
+    shm_name, shape = table
+    if _worker_shm is not None and _worker_shm.name == shm_name:
+        return _worker_est_tx
+
+    if _worker_shm is not None:
+        _worker_est_tx = None
+        try:
+            _worker_shm.close()
+        except BufferError:
+            pass
+
+    # Workers share the resource tracker of the planner's process, which
+    # already tracks the block, and the planner removes it.
+    try:
+        _worker_shm = shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:
+        _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_est_tx = np.ndarray(shape, dtype=np.float64, buffer=_worker_shm.buf)
+
+    return _worker_est_tx
+
+
+# ------------------------------------------------------------------------------
+#
+def _score_chunk(assignments, abs_fitness_term, num_resources, table):
+    '''
+    Score a chunk of the population in a worker process.
+    '''
+
+    return _calc_scores(assignments, _worker_table(table), abs_fitness_term,
+                        num_resources)
+
+
+# ------------------------------------------------------------------------------
+#
+def _island_epoch(state, generations, table):
+    '''
+    Evolve the population of an island for a number of generations. The
+    island is a GAPlanner whose attributes are given by `state`, and its
+    estimated execution time table is given by `table`, see `_worker_table`.
+    Returns the attributes of the island that changed.
+    '''
+
+    island = GAPlanner.__new__(GAPlanner)
+    island.__dict__.update(state)
+    island._est_txs = _worker_table(table)
+    island._logger = ru.Logger(name='%s.island' % state['_uid'],
+                               targets='null')
+    # Islands evolve in a single process, until the epoch ends.
+    island._executor = None
+    island._pool_table = None
+    island._stall_generations = None
+    island._best = None
+    island._best_makespan = None
+    island._best_lock = mt.Lock()
+    island._reset_fitness_cache()
+    stop = island._evolve(generations, early_stop=False)
+
+    return {'_population': island._population,
+            '_fitness': island._fitness,
+            '_rng': island._rng,
+            '_best': island._best,
+            '_best_makespan': island._best_makespan}, stop
 
 
 class GAPlanner(Planner):
@@ -25,14 +177,62 @@ class GAPlanner(Planner):
     resources: A list of resources, whose performance is given in operations per second
     num_oper: The number of operations each workflow will execute
     population_size: The size of the population
+    random_init: The fraction of the workflows that are assigned at random in
+                 the initial population. The rest are assigned greedily.
+    crossover: The crossover operator, one of `cycle` (default), `order`,
+               `pmx` or `uniform`. The first three recombine the encoding of
+               the individuals, while `uniform` selects the resource of each
+               workflow from either parent with equal probability.
+    selection: The selection method, `roulette` (default) or `tournament`.
+    tournament_size: The number of individuals that compete in a tournament.
+    elitism: When set, every generation replaces all the individuals except
+             the `elitism` ones with the best fitness. By default, half of the
+             population is replaced.
+    cache_size: The number of individuals whose fitness and makespan are
+                remembered. Set it to 0 to disable the cache.
+    workers: The number of processes that calculate the fitness of the
+             population. The estimated execution time table is shared with
+             them through shared memory. By default, the fitness is calculated
+             in the planner's process.
+    islands: When set, the planner evolves this number of populations, the
+             islands, in separate processes. The islands exchange their best
+             individuals every `migration_interval` generations. At most
+             `workers` processes are used, by default one per island.
+    topology: The islands each island sends individuals to. `ring` (default)
+              sends to the next island, `random` to a random island and
+              `fully_connected` to all other islands.
+    migration_rate: The fraction of the population that migrates.
+    migration_interval: The number of generations between migrations.
+    island_seeds: The seed of each island. By default, they are drawn from
+                  the planner's random number generator.
+    local_search: The number of individuals with the best fitness that are
+                  improved by hill climbing every generation, see
+                  `_improve_elite`. Defaults to 0, i.e. no local search.
+    local_search_steps: The maximum number of moves and swaps applied to each
+                        individual every generation.
+    rebalancing: The maximum number of moves of the rebalancing operator, see
+                 `_rebalancing`, applied to every child. Defaults to 0, i.e.
+                 no rebalancing.
+
+    The population is an integer array with a row per individual and a column
+    per workflow, in campaign order. Each entry is the index of the resource
+    the workflow is assigned to, so the fitness and the makespan of the whole
+    population are calculated with array operations. Crossover works on the
+    encoding of the paper, see `_encode_schedule`, and individuals are
+    converted to and from it with `_to_encoding` and `_to_assignment`.
 
     The class implements a plan method that return a plan, a list of tuples. 
 
     Each tuple will have the workflow, selected resource, starting time and
     estimated finish time.
     '''
+
     def __init__(self, campaign, resources, num_oper, population_size=20,
-                 random_init=0.5, sid=None):
+                 random_init=0.5, sid=None, crossover='cycle',
+                 selection='roulette', tournament_size=2, elitism=None,
+                 cache_size=4096, workers=None, islands=None, topology='ring',
+                 migration_rate=0.1, migration_interval=10, island_seeds=None,
+                 local_search=0, local_search_steps=10, rebalancing=0):
 
         super(GAPlanner, self).__init__(campaign=campaign,
                                         resources=resources,
@@ -63,6 +263,68 @@ class GAPlanner(Planner):
         self._est_txs = self._calc_est_tx(tmp_oper, res_perf)
         self._deadline = None
         self._max_gen = 100
+        self._wf_ids = list()
+        self._wf_index = dict()
+
+        # The fitness cache, see `_calc_fitness`. It is created by `plan`.
+        self._fitness_cache = None
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        # The process pool that calculates the fitness, see `_start_pool`.
+        self._executor = None
+        self._pool_size = None
+        self._pool_table = None
+        self._shm = None
+
+        # The workflows and the IDs of the resources of the last call of
+        # `plan`, which a warm start maps to the workflows of the next call,
+        # the resources the individuals of that call index, see
+        # `_planned_resources`, and the time each resource becomes available.
+        self._workflows = None
+        self._res_ids = None
+        self._planned_res = None
+        self._resource_free = None
+
+        # The individual with the smallest makespan found by the last
+        # evolution, see `_evolve`, and the lock that protects it.
+        self._best = None
+        self._best_makespan = None
+        self._best_lock = mt.Lock()
+
+        # The stopping conditions of the anytime mode, see `plan`.
+        self._time_budget = None
+        self._stall_generations = None
+        self._end_time = None
+
+        # The optimality gap under which evolution stops, and the lower bound
+        # of the makespan it is measured against, see `_gap_reached`.
+        self._gap_epsilon = None
+        self._lower_bound = None
+        self._bound_start = 0.0
+
+        if crossover not in ('cycle', 'order', 'pmx', 'uniform'):
+            raise ValueError('Unknown crossover operator %s' % crossover)
+        self._crossover_method = crossover
+
+        if selection not in ('roulette', 'tournament'):
+            raise ValueError('Unknown selection method %s' % selection)
+        self._selection_method = selection
+        self._tournament_size = tournament_size
+        self._elitism = elitism
+        self._cache_size = cache_size
+        self._workers = workers
+
+        if topology not in ('ring', 'random', 'fully_connected'):
+            raise ValueError('Unknown island topology %s' % topology)
+        self._islands = islands
+        self._topology = topology
+        self._migration_rate = migration_rate
+        self._migration_interval = migration_interval
+        self._island_seeds = island_seeds
+        self._local_search = local_search
+        self._local_search_steps = local_search_steps
+        self._rebalance_steps = rebalancing
 
     def _encode_schedule(self, schedule):
         '''
@@ -109,26 +371,67 @@ class GAPlanner(Planner):
         schedule.append(proc_sched)
         return schedule
 
+    def _set_workflows(self, workflows):
+        '''
+        Keep the workflows and their IDs in campaign order, and the index of
+        each ID, to convert individuals to and from the encoding.
+        '''
+
+        self._workflows = list(workflows)
+        self._wf_ids = [workflow['id'] for workflow in workflows]
+        self._wf_index = {wf_id: idx for idx, wf_id in enumerate(self._wf_ids)}
+
+    def _planned_resources(self):
+        '''
+        Return the resources of the last call of `plan`, which the resource
+        indices of the individuals refer to, or the resources of the
+        constructor before the first call.
+        '''
+
+        if self._planned_res is None:
+            return self._resources
+        return self._planned_res
+
+    def _to_encoding(self, assignment):
+        '''
+        Return the encoding of an individual given as an array of resource
+        indices. The workflows of each resource are in campaign order.
+        '''
+
+        schedule = [[] for _ in range(len(self._planned_resources()))]
+        for wf_id, r_id in zip(self._wf_ids, assignment.tolist()):
+            schedule[r_id].append(wf_id)
+
+        return self._encode_schedule(schedule)
+
+    def _to_assignment(self, encoding):
+        '''
+        Return the array of resource indices of an individual given by its
+        encoding.
+        '''
+
+        assignment = np.empty(len(self._wf_ids), dtype=np.int64)
+        r_id = 0
+        for wf_id in encoding:
+            if wf_id == -1:
+                r_id += 1
+            else:
+                assignment[self._wf_index[wf_id]] = r_id
+
+        return assignment
+
 
     def _initialize_population(self, workflows, resources, random_init,
                                start_time):
         '''
-        This method creates the initial population. The population is 
+        This method creates the initial population. In every individual, the
+        first `random_init` fraction of the workflows is assigned to random
+        resources, and the rest to the resource on which they finish first.
+        All individuals are created at once, one workflow at a time.
         '''
 
-        # This part of the code is to allow unit tests to be get a reproducible
-        # result in the population initialization 
-        if os.environ.get('PLANNER_TEST',"FALSE").lower() == 'true':
-            self._logger.debug('Setting seed')
-            seed(0)
-
-        # This list tracks when a resource whould be available.
-        if isinstance(start_time, list):
-            resource_free = start_time
-        elif isinstance(start_time, float) or isinstance(start_time, int):
-            resource_free = [start_time] * len(resources)
-        else:
-            resource_free = [0] * len(resources)
+        # This array tracks when a resource whould be available.
+        resource_free = self._get_resource_free(start_time, len(resources))
 
         total_operations = 0
         for workflow in workflows:
@@ -138,240 +441,907 @@ class GAPlanner(Planner):
         for resource in resources:
             total_rate += resource['performance']
 
-        self._abs_fitness_term = total_operations / total_rate + sum(resource_free)
+        self._abs_fitness_term = total_operations / total_rate + \
+                                 float(resource_free.sum())
+
+        est_tx = np.asarray(self._est_txs, dtype=np.float64)
+        num_wfs = len(workflows)
+        num_random = int(num_wfs * random_init)
+        individuals = np.arange(self._population_size)
+
+        population = np.empty((self._population_size, num_wfs), dtype=np.int64)
+        population[:, :num_random] = self._get_rng().integers(
+                            0, len(resources),
+                            size=(self._population_size, num_random))
+
+        # Each individual starts when the resources become available, and the
+        # randomly assigned workflows execute first.
+        free = np.tile(resource_free, (self._population_size, 1))
+        free += _calc_loads(population[:, :num_random], est_tx, len(resources))
+        for idx in range(num_random, num_wfs):
+            end_times = free + est_tx[idx]
+            selected = end_times.argmin(axis=1)
+            population[:, idx] = selected
+            free[individuals, selected] = end_times[individuals, selected]
+
+        self._population = population
+
+    def _get_seeds(self, warm_start, workflows, resources, start_time,
+                   est_txs=None):
+        '''
+        Return the individuals that seed the population of a warm start, as
+        rows of resource indices of `workflows`. `warm_start` is either a plan,
+        or `True` for the population of the last call of `plan`. This method
+        is called before the workflows of the new call are set. `est_txs` is
+        the execution time table of `workflows`, and defaults to
+        `self._est_txs`.
+
+        A plan gives a single individual, and the rest of the seeds are copies
+        of it with a swap mutation. The population gives its best individual
+        and the fittest half of the individuals. Workflows keep their resource
+        by ID, and workflows that were not part of the plan or the population,
+        or whose resource is gone, are assigned to the resource on which they
+        finish first.
+        '''
+
+        res_index = {_get_uid(resource): idx
+                     for idx, resource in enumerate(resources)}
+        if warm_start is True:
+            if self._best is None or not self._wf_ids:
+                self._logger.debug('No population to warm start from')
+                return None
+            fittest = np.argsort(-np.asarray(self._fitness), kind='stable')
+            fittest = fittest[:max(1, self._population_size // 2 - 1)]
+            rows = np.vstack([self._best[np.newaxis],
+                              self._population[fittest]])
+            res_ids = self._res_ids
+            if res_ids is None:
+                res_ids = [_get_uid(resource) for resource in resources]
+            res_map = np.array([res_index.get(res_id, -1)
+                                for res_id in res_ids] + [-1], dtype=np.int64)
+            rows = res_map[rows]
+            old_index = self._wf_index
+        else:
+            rows = np.array([[res_index.get(_get_uid(entry[1]), -1)
+                              for entry in warm_start]], dtype=np.int64)
+            old_index = {_get_uid(entry[0]): idx
+                         for idx, entry in enumerate(warm_start)}
+
+        cols = np.array([old_index.get(workflow['id'], -1)
+                         for workflow in workflows], dtype=np.int64)
+        num_seeds = rows.shape[0]
+        seeds = np.full((num_seeds, len(workflows)), -1, dtype=np.int64)
+        seeds[:, cols >= 0] = rows[:, cols[cols >= 0]]
+
+        # Assign the rest of the workflows, in campaign order, to the resource
+        # on which they finish first in each individual.
+        if est_txs is None:
+            est_txs = self._est_txs
+        est_tx = np.asarray(est_txs, dtype=np.float64)
+        num_res = len(resources)
+        known = seeds >= 0
+        assigned = np.where(known, seeds, 0)
+        wf_est_tx = np.where(known,
+                             est_tx[np.arange(len(workflows)), assigned], 0)
+        bins = assigned + (np.arange(num_seeds) * num_res)[:, np.newaxis]
+        free = np.bincount(bins.ravel(), weights=wf_est_tx.ravel(),
+                           minlength=num_seeds * num_res)
+        free = free.reshape(num_seeds, num_res) + \
+            self._get_resource_free(start_time, num_res)
+        for idx in np.flatnonzero(~known.all(axis=0)).tolist():
+            missing = np.flatnonzero(~known[:, idx])
+            end_times = free[missing] + est_tx[idx]
+            selected = end_times.argmin(axis=1)
+            seeds[missing, idx] = selected
+            free[missing, selected] = end_times[np.arange(missing.shape[0]),
+                                                selected]
+
+        if warm_start is not True:
+            copies = max(1, self._population_size // 2)
+            seeds = np.repeat(seeds, copies, axis=0)
+            seeds[1:] = self._mutate(seeds[1:])
+
+        self._logger.debug('Warm start from %d individuals, %d of %d ' +
+                           'workflows known', num_seeds,
+                           int((cols >= 0).sum()), len(workflows))
+        return seeds
+
+    def _seed_population(self, seeds):
+        '''
+        Replace the first individuals of the population with the seeds of a
+        warm start, up to half of the population. The rest of the population
+        keeps its random and greedy individuals, for diversity.
+        '''
+
+        if seeds is None:
+            return
 
+        num_seeds = min(seeds.shape[0], max(1, self._population_size // 2))
+        self._population[:num_seeds] = seeds[:num_seeds]
 
-        for _ in range(self._population_size):
-            chromosome = [[] for j in range(len(resources))]
-            for idx in range(int(len(workflows) * random_init)):
-                wf_est_tx = self._est_txs[idx]
-                resource = randint(0,len(resources) - 1)
-                chromosome[resource].append(workflows[idx]['id'])
-                tmp_str_time = resource_free[resource]
-                tmp_end_time = tmp_str_time + wf_est_tx[resource]
-                resource_free[resource] = tmp_end_time
+    def _selection(self, num_parents=None):
+        '''
+        This method selects `num_parents` individuals, by default half of the
+        population, with the roulette wheel or the tournament method.
+
+        The roulette wheel selects an individual with probability proportional
+        to its fitness. All draws are located on the cumulative fitness with a
+        single binary search. A tournament selects the fittest of
+        `tournament_size` random individuals.
+        '''
 
-            for idx in range(int(len(workflows) * random_init), len(workflows)):
-                wf_est_tx = self._est_txs[idx]
-                min_end_time = float('inf')
-                for i in range(len(resources)):
-                    tmp_str_time = resource_free[i]
-                    tmp_end_time = tmp_str_time + wf_est_tx[i]
-                    if tmp_end_time < min_end_time:
-                        min_end_time = tmp_end_time
-                        tmp_min_idx = i
-                chromosome[tmp_min_idx].append(workflows[idx]['id'])
-                resource_free[tmp_min_idx] = resource_free[tmp_min_idx] + \
-                                             wf_est_tx[tmp_min_idx] 
+        if num_parents is None:
+            num_parents = int(self._population_size / 2)
+
+        rng = self._get_rng()
+        fitness = np.asarray(self._fitness, dtype=np.float64)
+        if self._selection_method == 'tournament':
+            contestants = rng.integers(0, fitness.shape[0],
+                                       size=(num_parents,
+                                             self._tournament_size))
+            winners = fitness[contestants].argmax(axis=1)
+            sel_idx = contestants[np.arange(num_parents), winners]
+        else:
+            slots = np.cumsum(fitness / fitness.sum())
+            sel_idx = np.searchsorted(slots, rng.random(num_parents))
+            # Rounding may leave the last slot slightly below 1.
+            np.minimum(sel_idx, fitness.shape[0] - 1, out=sel_idx)
 
-            self._population.append(self._encode_schedule(chromosome))
+        selected = self._population[sel_idx]
+        return selected
 
 
-    def _selection(self):
+    def _recombine(self, parents):
         '''
-        This method uses the roulette wheel method for selection. The selection
-        process will return half of the population.
+        This method produces the children of the selected parents, given as
+        rows of resource indices. Consecutive rows are paired. The uniform
+        crossover works on the rows directly, while the other operators
+        recombine the encoding of the parents.
         '''
 
-        slots = [0]
-        fitness_sum = sum(self._fitness)
-        for ind_fitness in self._fitness:
-            slots.append(ind_fitness / fitness_sum + slots[-1])
+        if self._crossover_method == 'uniform':
+            return self._uniform_crossover(parents)
 
-        sel_idx = []
-        for i in range(int(self._population_size / 2)):
-            selection = random()
-            i = 0
-            while selection > slots[i]:
-                i += 1
-            sel_idx.append(i - 1)
+        children = self._crossover([self._to_encoding(parent)
+                                    for parent in parents])
+        return np.array([self._to_assignment(child) for child in children],
+                        dtype=np.int64).reshape(-1, parents.shape[1])
 
-        selected = [self._population[i] for i in sel_idx]
-        return selected
+    def _uniform_crossover(self, parents):
+        '''
+        This method implements the uniform assignment crossover. Each child
+        gets the resource of each workflow from one of the parents, chosen with
+        equal probability, and the other child from the other parent.
+        '''
 
+        num_pairs = len(parents) // 2
+        parent1 = parents[0:2 * num_pairs:2]
+        parent2 = parents[1:2 * num_pairs:2]
+        mask = self._get_rng().random(parent1.shape) < 0.5
+
+        children = np.empty((2 * num_pairs, parents.shape[1]), dtype=np.int64)
+        children[0::2] = np.where(mask, parent1, parent2)
+        children[1::2] = np.where(mask, parent2, parent1)
+
+        return children
 
     def _crossover(self, parents):
         '''
-        This method implements the cycle crossover method
-
-        Reference: https://codereview.stackexchange.com/questions/226179/easiest-way-to-implement-cycle-crossover
+        This method recombines pairs of consecutive parents, given by their
+        encoding, with the cycle, order or PMX crossover. The delimiters are
+        removed before the crossover, and each child gets back the delimiters of
+        one parent. A second child that is the same as an earlier child is
+        dropped.
         '''
-        children = []
-        for p_id in range(0, len(parents), 2):
-            delimiters = [[], []]
-            tmp_parent1 = []
-            tmp_parent2 = []
-            # Remove delimiters from parents and keep their position
-            for j in range(len(parents[p_id])):
-                if parents[p_id][j] == -1:
-                    delimiters[0].append(j)
-                else:
-                    tmp_parent1.append(parents[p_id][j])
 
-            for j in range(len(parents[p_id + 1])):
-                if parents[p_id + 1][j] == -1:
-                    delimiters[1].append(j)
-                else:
-                    tmp_parent2.append(parents[p_id + 1][j])
-
-            swap = True
-            count = 0
-            pos = 0
-            p1_copy = deepcopy(tmp_parent1)
-            p2_copy = deepcopy(tmp_parent2)
-            tmp_child1 = [-1] * len(tmp_parent1)
-            tmp_child2 = [-1] * len(tmp_parent2)
-            chrom_length = len(tmp_parent1)
-            while True:
-                if count > chrom_length:
-                    break
-                for i in range(chrom_length):
-                    if tmp_child1[i] == -1:
-                        pos = i
-                        break
-
-                if swap:
-                    while True:
-                        tmp_child1[pos] = tmp_parent1[pos]
-                        count += 1
-                        pos = tmp_parent2.index(tmp_parent1[pos])
-                        if p1_copy[pos] == -1:
-                            swap = False
-                            break
-                        p1_copy[pos] = -1
-                else:
-                    while True:
-                        tmp_child1[pos] = tmp_parent2[pos]
-                        count += 1
-                        pos = tmp_parent1.index(tmp_parent2[pos])
-                        if p2_copy[pos] == -1:
-                            swap = True
-                            break
-                        p2_copy[pos] = -1
-
-            for i in range(chrom_length):  # for the second child
-                if tmp_child1[i] == tmp_parent1[i]:
-                    tmp_child2[i] = tmp_parent2[i]
-                else:
-                    tmp_child2[i] = tmp_parent1[i]
+        operators = {'cycle': self._cycle_crossover,
+                     'order': self._order_crossover,
+                     'pmx': self._pmx_crossover}
+        operator = operators[self._crossover_method]
 
-            for i in range(chrom_length):  # Special mode
-                if tmp_child1[i] == -1:
-                    if p1_copy[i] == -1:  # it means that the ith gene from p1 has been already transfered
-                        tmp_child1[i] = tmp_parent2[i]
+        children = []
+        seen = set()
+        for p_id in range(0, len(parents) - 1, 2):
+            # Remove delimiters from parents and keep their position
+            delimiters = [[], []]
+            tmp_parents = [[], []]
+            for p_idx in range(2):
+                for j, work_id in enumerate(parents[p_id + p_idx]):
+                    if work_id == -1:
+                        delimiters[p_idx].append(j)
                     else:
-                        tmp_child1[i] = tmp_parent1[i]
+                        tmp_parents[p_idx].append(work_id)
+
+            tmp_children = operator(tmp_parents[0], tmp_parents[1])
 
-            child1, child2 = [], []
             # Introduce the delimiters and produce the final children
-            for i in range(len(parents[p_id])):
-                if delimiters[0] and i == delimiters[0][0]:
-                    child1.append(-1)
-                    delimiters[0].pop(0)
-                else:
-                    child1.append(tmp_child1.pop(0))
-            for i in range(len(parents[p_id + 1])):
-                if delimiters[1] and i == delimiters[1][0]:
-                    child2.append(-1)
-                    delimiters[1].pop(0)
-                else:
-                    child2.append(tmp_child2.pop(0))
+            child1, child2 = [self._insert_delimiters(tmp_child, delims)
+                              for tmp_child, delims in zip(tmp_children,
+                                                           delimiters)]
             children.append(child1)
-            if child2 not in children:
+            seen.add(tuple(child1))
+            if tuple(child2) not in seen:
                 children.append(child2)
+                seen.add(tuple(child2))
 
             self._logger.debug('Children %s %s', child1, child2)
         return children
 
+    def _insert_delimiters(self, genes, delimiters):
+        '''
+        Return a chromosome with the genes and delimiters at the given
+        positions.
+        '''
+
+        chromosome = [-1] * (len(genes) + len(delimiters))
+        is_gene = [True] * len(chromosome)
+        for pos in delimiters:
+            is_gene[pos] = False
+
+        genes = iter(genes)
+        for pos in range(len(chromosome)):
+            if is_gene[pos]:
+                chromosome[pos] = next(genes)
+
+        return chromosome
+
+    def _cycle_crossover(self, tmp_parent1, tmp_parent2):
+        '''
+        This method implements the cycle crossover method
+
+        Reference: https://codereview.stackexchange.com/questions/226179/easiest-way-to-implement-cycle-crossover
+
+        The cycles are found in the order of their first position, and the
+        first child takes its genes alternately from the first and the second
+        parent. Every cycle counts as one more than its length and cycles are
+        taken until the count exceeds the length of the chromosome. The genes
+        of the remaining positions come from the first parent. The second child
+        takes the genes of the first parent, except for the cycles the first
+        child took from the first parent.
+
+        The position of each gene in the second parent is kept in a dictionary,
+        so the crossover is linear in the length of the chromosome.
+        '''
+
+        chrom_length = len(tmp_parent1)
+        pos_parent2 = {gene: pos for pos, gene in enumerate(tmp_parent2)}
+
+        # The cycle of each position, -1 when the position is not in a cycle.
+        cycle_ids = [-1] * chrom_length
+        count = 0
+        cycles = 0
+        start = 0
+        while count <= chrom_length:
+            while start < chrom_length and cycle_ids[start] != -1:
+                start += 1
+            if start == chrom_length:
+                break
+
+            pos = start
+            while True:
+                cycle_ids[pos] = cycles
+                count += 1
+                pos = pos_parent2[tmp_parent1[pos]]
+                if pos == start:
+                    break
+            count += 1
+            cycles += 1
+
+        tmp_child1 = list(tmp_parent1)
+        tmp_child2 = list(tmp_parent1)
+        for pos, cycle in enumerate(cycle_ids):
+            if cycle == -1:
+                continue
+            elif cycle % 2:
+                tmp_child1[pos] = tmp_parent2[pos]
+            else:
+                tmp_child2[pos] = tmp_parent2[pos]
+
+        return tmp_child1, tmp_child2
+
+    def _cut_points(self, chrom_length):
+        '''
+        Return two random cut points of a chromosome, such that
+        0 <= cut1 < cut2 <= chrom_length.
+        '''
+
+        cut1, cut2 = self._get_rng().choice(chrom_length + 1, size=2,
+                                            replace=False).tolist()
+        return min(cut1, cut2), max(cut1, cut2)
+
+    def _order_crossover(self, tmp_parent1, tmp_parent2):
+        '''
+        This method implements the order crossover. Each child keeps the genes
+        of one parent between two cut points, and takes the rest of the genes
+        in the order they appear in the other parent, starting after the
+        second cut point.
+        '''
+
+        chrom_length = len(tmp_parent1)
+        if chrom_length < 2:
+            return list(tmp_parent1), list(tmp_parent2)
+
+        cut1, cut2 = self._cut_points(chrom_length)
+        children = []
+        for parent, other in ((tmp_parent1, tmp_parent2),
+                              (tmp_parent2, tmp_parent1)):
+            child = list(parent)
+            segment = set(parent[cut1:cut2])
+            pos = cut2 % chrom_length
+            for idx in range(cut2, cut2 + chrom_length):
+                gene = other[idx % chrom_length]
+                if gene not in segment:
+                    child[pos] = gene
+                    pos = (pos + 1) % chrom_length
+            children.append(child)
+
+        return children[0], children[1]
+
+    def _pmx_crossover(self, tmp_parent1, tmp_parent2):
+        '''
+        This method implements the partially mapped crossover (PMX). Each child
+        keeps the genes of one parent between two cut points, and the genes of
+        the other parent elsewhere. Genes that appear in the segment are
+        replaced following the mapping between the two parents' segments.
+        '''
+
+        chrom_length = len(tmp_parent1)
+        if chrom_length < 2:
+            return list(tmp_parent1), list(tmp_parent2)
+
+        cut1, cut2 = self._cut_points(chrom_length)
+        children = []
+        for parent, other in ((tmp_parent1, tmp_parent2),
+                              (tmp_parent2, tmp_parent1)):
+            # A gene of the segment is mapped to the gene of the other parent
+            # at the same position. Mappings are resolved once and remembered.
+            mapping = {parent[pos]: other[pos] for pos in range(cut1, cut2)}
+            resolved = dict()
+            child = list(other)
+            child[cut1:cut2] = parent[cut1:cut2]
+            for pos in list(range(cut1)) + list(range(cut2, chrom_length)):
+                gene = other[pos]
+                path = []
+                while gene in mapping and gene not in resolved:
+                    path.append(gene)
+                    gene = mapping[gene]
+                gene = resolved.get(gene, gene)
+                for mapped in path:
+                    resolved[mapped] = gene
+                child[pos] = gene
+            children.append(child)
+
+        return children[0], children[1]
 
     def _mutate(self, chromosomes):
         '''
-        This method implements the swap mutation.
+        This method implements the swap mutation. In every individual, two
+        random workflows exchange their resources.
+        '''
+
+        num_chrom, num_wfs = chromosomes.shape
+        if num_wfs < 2:
+            return chromosomes
+
+        rng = self._get_rng()
+        individuals = np.arange(num_chrom)
+        idx1 = rng.integers(0, num_wfs, size=num_chrom)
+        idx2 = (idx1 + rng.integers(1, num_wfs, size=num_chrom)) % num_wfs
+        res1 = chromosomes[individuals, idx1]
+        chromosomes[individuals, idx1] = chromosomes[individuals, idx2]
+        chromosomes[individuals, idx2] = res1
+
+        return chromosomes
+
+
+    def _improve_elite(self):
+        '''
+        This method implements the local search of the memetic algorithm. The
+        `local_search` individuals with the best fitness are improved by hill
+        climbing, see `LoadTracker.hill_climb`. Each move and swap is evaluated
+        from the loads of the resources, without calculating the makespan of
+        the whole individual.
+
+        Returns `True` when any individual changed.
+        '''
+
+        if not self._local_search:
+            return False
+
+        est_tx = np.asarray(self._est_txs, dtype=np.float64)
+        elite = np.argsort(self._fitness, kind='stable')[-self._local_search:]
+        changed = False
+        for idx in elite.tolist():
+            tracker = LoadTracker(est_tx, self._population[idx])
+            if tracker.hill_climb(self._local_search_steps):
+                self._population[idx] = tracker.assignment
+                changed = True
+
+        return changed
+
+    def _rebalancing(self, chromosomes):
+        '''
+        This method implements the rebalancing procedure. In every individual,
+        workflows are moved from the most loaded resource to the resource with
+        which the makespan is the smallest, as long as the makespan improves
+        and up to `rebalancing` moves, see `LoadTracker.hill_climb`.
         '''
 
-        for chromosome in chromosomes:
-            self._logger.debug('Before mutation %s', chromosome)
-            idx1 = randint(0, len(chromosome) - 1)
-            while chromosome[idx1] == -1:
-                idx1 = randint(0, len(chromosome) - 1)
+        if not self._rebalance_steps:
+            return chromosomes
 
-            idx2 = randint(0, len(chromosome) - 1)
-            while chromosome[idx2] == -1 or idx2 == idx1:
-                idx2 = randint(0, len(chromosome) - 1)
+        est_tx = np.asarray(self._est_txs, dtype=np.float64)
+        for idx, chromosome in enumerate(chromosomes):
+            tracker = LoadTracker(est_tx, chromosome)
+            if tracker.hill_climb(self._rebalance_steps, swaps=False):
+                chromosomes[idx] = tracker.assignment
 
-            chromosome[idx1], chromosome[idx2] = chromosome[idx2], chromosome[idx1]
-            self._logger.debug('After mutation %s', chromosome)
         return chromosomes
 
+    @property
+    def cache_info(self):
+        '''
+        The hits, misses and size of the fitness cache since the last call of
+        `plan`.
+        '''
+
+        size = len(self._fitness_cache) if self._fitness_cache else 0
+        return {'hits': self._cache_hits, 'misses': self._cache_misses,
+                'size': size}
+
+    def _reset_fitness_cache(self):
+        '''
+        Empty the fitness cache. The fitness of an individual depends on the
+        campaign and the resources, so the cache is reset on every plan.
+        '''
+
+        self._fitness_cache = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def _start_pool(self, max_workers):
+        '''
+        Start a process pool with `max_workers` processes, unless it is
+        already running, and publish the estimated execution time table to
+        it. The pool lives as long as the planner, see `close`, and its
+        workers are started by a fork server, see `_pool_context`. The table
+        is copied once to a shared memory block, which the workers attach to.
+        When shared memory is not available, the table is sent with every
+        task.
+        '''
+
+        if not max_workers or max_workers < 2:
+            return
+
+        if self._executor is not None and self._pool_size != max_workers:
+            self.close()
+        if self._executor is None:
+            self._pool_size = max_workers
+            self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                                 mp_context=_pool_context())
+
+        est_tx = np.ascontiguousarray(self._est_txs, dtype=np.float64)
+        self._pool_table = est_tx
+        if shared_memory is not None:
+            try:
+                self._shm = shared_memory.SharedMemory(
+                                            create=True,
+                                            size=max(est_tx.nbytes, 1))
+                shared = np.ndarray(est_tx.shape, dtype=np.float64,
+                                    buffer=self._shm.buf)
+                shared[:] = est_tx
+                self._pool_table = (self._shm.name, est_tx.shape)
+            except OSError as e:
+                self._logger.warning('Shared memory is not available: %s', e)
+                self._shm = None
+
+    def _stop_pool(self):
+        '''
+        Release the shared memory of the table published by `_start_pool`.
+        The pool keeps running for the next call of `plan`.
+        '''
+
+        self._pool_table = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self):
+        '''
+        Stop the process pool, if any, and release its shared memory.
+        '''
+
+        self._stop_pool()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._pool_size = None
+
+    def _score(self, assignments):
+        '''
+        Return the fitness and the makespan of each individual, given as rows of
+        resource indices. With a process pool, the individuals are split in a
+        chunk per worker.
+        '''
 
-    # def _rebalancing(self):
-    #     '''
-    #     This method implements the rebalancing procedure
-    #     '''
-    #     pass
+        num_resources = len(self._planned_resources())
+        if self._executor is None or self._pool_table is None or \
+           assignments.shape[0] < 2:
+            est_tx = np.asarray(self._est_txs, dtype=np.float64)
+            return _calc_scores(assignments, est_tx, self._abs_fitness_term,
+                                num_resources)
+
+        # The smallest integer type that holds the resource indices keeps the
+        # chunks sent to the workers small.
+        assignments = assignments.astype(np.min_scalar_type(num_resources))
+        chunks = np.array_split(assignments,
+                                min(self._pool_size, assignments.shape[0]))
+        results = list(self._executor.map(_score_chunk, chunks,
+                                          [self._abs_fitness_term] * len(chunks),
+                                          [num_resources] * len(chunks),
+                                          [self._pool_table] * len(chunks)))
+
+        return (np.concatenate([fitness for fitness, _ in results]),
+                np.concatenate([makespans for _, makespans in results]))
 
     def _calc_fitness(self):
         '''
         This methods calculates the fitness of the individuals in  the population.
+
+        Most individuals survive from one generation to the next, so the
+        fitness and makespan of the individuals are kept in a least recently
+        used cache, keyed by a hash of the individual. Only the individuals that
+        are not in the cache are scored.
         '''
-        self._fitness = []
-        for individual in self._population:
-            total_dist = 0
-            sched = self._decode_schedule(individual)
-            self._logger.debug('Calculating fitness of %s with sched %s',
-                                individual, sched)
-            for r_id in range(len(self._resources)):
-                workflows = sched[r_id]
-                term = sum([self._est_txs[w_id - 1][r_id] for w_id in workflows])
-                total_dist += math.pow(abs(self._abs_fitness_term - term), 2)
-            error = math.sqrt(total_dist)
-
-            if error:
-                self._fitness.append(1 / error)
+
+        if self._fitness_cache is None or not self._cache_size:
+            self._fitness, self._makespans = self._score(self._population)
+            return
+
+        num_ind = self._population.shape[0]
+        self._fitness = np.empty(num_ind, dtype=np.float64)
+        self._makespans = np.empty(num_ind, dtype=np.float64)
+        keys = [hashlib.blake2b(individual.tobytes(), digest_size=16).digest()
+                for individual in self._population]
+        misses = list()
+        for idx, key in enumerate(keys):
+            entry = self._fitness_cache.get(key)
+            if entry is None:
+                misses.append(idx)
             else:
-                self._fitness.append(1)
+                self._fitness_cache.move_to_end(key)
+                self._fitness[idx], self._makespans[idx] = entry
+        self._cache_hits += num_ind - len(misses)
+        self._cache_misses += len(misses)
+
+        if misses:
+            fitness, makespans = self._score(self._population[misses])
+            self._fitness[misses] = fitness
+            self._makespans[misses] = makespans
+            for idx, ind_fitness, makespan in zip(misses, fitness.tolist(),
+                                                  makespans.tolist()):
+                self._fitness_cache[keys[idx]] = (ind_fitness, makespan)
+            while len(self._fitness_cache) > self._cache_size:
+                self._fitness_cache.popitem(last=False)
+
+
+    def _get_makespan(self, individuals):
+        '''
+        This method calculates the makespan of each individual, given as rows
+        of resource indices, and returns them as an array.
+        '''
+
+        est_tx = np.asarray(self._est_txs, dtype=np.float64)
+        loads = _calc_loads(np.atleast_2d(individuals), est_tx,
+                            len(self._planned_resources()))
 
+        return loads.max(axis=1)
 
-    def _get_makespan(self, individual):
+    def _get_plan(self, individual):
         '''
-        This method calculates the makespan based on a specific individual and
-        returns it.
+        This method gets an individual and sets the plan it corresponds to as
+        the planner's plan. It is called once, for the best individual, after
+        evolution.
         '''
 
-        sched = self._decode_schedule(individual)
-        makespan = 0
-        for r_id in range(len(self._resources)):
-            workflows = sched[r_id]
-            term = sum([self._est_txs[w_id - 1][r_id] for w_id in workflows]) 
-            makespan = max(makespan, term)
+        self._plan = self._individual_plan(individual)
+
+    def _plan_state(self):
+        '''
+        Return the workflows, execution time table, resources and resource
+        start times that individuals refer to. Another thread must hold
+        `self._best_lock` while calling it, since `plan` replaces them.
+        '''
 
-        return makespan
+        workflows = self._workflows if self._workflows is not None \
+            else self._campaign
+        resources = self._planned_resources()
+        if self._resource_free is None:
+            resource_free = [0.0] * len(resources)
+        else:
+            resource_free = list(self._resource_free)
 
-    def _get_plan(self, individual):
+        return workflows, self._est_txs, resources, resource_free
+
+    def _individual_plan(self, individual, state=None):
+        '''
+        This method gets an individual, as an array of resource indices, and
+        returns the plan it corresponds to. The workflows of a resource execute
+        in campaign order, starting when the resource becomes available.
+        `state` is the return value of `_plan_state`, and defaults to the
+        current one.
+        '''
+
+        if state is None:
+            state = self._plan_state()
+        workflows, est_txs, resources, resource_free = state
+
+        return self._build_plan(workflows, resources, individual,
+                                resource_free, est_txs)
+
+    def best_so_far(self):
+        '''
+        Return the plan of the individual with the smallest makespan found so
+        far by the running, or the last, call of `plan`. It can be called from
+        any thread while the planner is planning. Returns an empty list when no
+        individual has been evaluated yet.
+        '''
+
+        # The individual and the state it refers to are read together, since
+        # `plan` replaces both.
+        with self._best_lock:
+            best = self._best
+            state = self._plan_state()
+
+        if best is None:
+            return list()
+
+        return self._individual_plan(best, state)
+
+    def _update_best(self, individual, makespan):
+        '''
+        Keep the individual if its makespan is the smallest found so far.
+        Returns `True` when it is.
+        '''
+
+        with self._best_lock:
+            if self._best_makespan is not None and \
+               makespan >= self._best_makespan:
+                return False
+            self._best = individual.copy()
+            self._best_makespan = float(makespan)
+
+        return True
+
+    def _reset_best(self):
+        '''
+        Forget the best individual, before a new plan.
+        '''
+
+        with self._best_lock:
+            self._best = None
+            self._best_makespan = None
+
+
+    def _evolve(self, generations, early_stop=True):
+        '''
+        Evolve the population for up to `generations` generations. Evolution
+        stops when the best individual meets the deadline or is perfectly fit,
+        when the time budget runs out, or when the smallest makespan has not
+        improved for `stall_generations` generations. With `early_stop`, it
+        also stops when the makespan of the fittest individual improves. The
+        individual with the smallest makespan is kept in `self._best`. With
+        local search, the best individuals of every generation are improved by
+        hill climbing before they are checked.
+
+        Returns `True` when evolution stopped before the last generation.
+        '''
+
+        self._calc_fitness()
+        sorted_fitness = np.argsort(self._fitness, kind='stable')
+        gen_best = int(np.argmin(self._makespans))
+        self._update_best(self._population[gen_best],
+                          self._makespans[gen_best])
+
+        # With elitism, the children replace all but the best individuals.
+        # Otherwise they replace the worst half of the population.
+        num_parents = None
+        if self._elitism is not None:
+            num_parents = max(self._population_size - self._elitism, 0)
+            num_parents -= num_parents % 2
+        curr_makespan = 0
+        stall = 0
+        for gen_id in range(generations):
+            self._logger.debug('Generation: %d', gen_id)
+            parents = self._selection(num_parents)
+            children = self._recombine(parents)
+            self._logger.debug('Number of parents: %d, number of children %d',
+                               len(parents), len(children))
+            children = self._mutate(children)
+            children = self._rebalancing(children)
+            # Replace the individuals with the worst fitness. There are fewer
+            # children than non elite individuals.
+            self._population[sorted_fitness[:len(children)]] = children
+            # Get the one with the best fitness and check it
+            self._calc_fitness()
+            if self._improve_elite():
+                self._calc_fitness()
+            sorted_fitness = np.argsort(self._fitness, kind='stable')
+            gen_best = int(np.argmin(self._makespans))
+            if self._update_best(self._population[gen_best],
+                                 self._makespans[gen_best]):
+                stall = 0
+            else:
+                stall += 1
+            tmp_makespan = float(self._makespans[sorted_fitness[-1]])
+            self._logger.debug('Best individual makespan: %f, smallest ' +
+                               'makespan: %f', tmp_makespan,
+                               self._best_makespan)
+            if self._deadline is not None and \
+               self._best_makespan < self._deadline:
+                return True
+            elif self._fitness[sorted_fitness[-1]] == 1:
+                return True
+            elif self._end_time is not None and time.time() >= self._end_time:
+                self._logger.debug('Time budget is over')
+                return True
+            elif self._stall_generations and \
+                 stall >= self._stall_generations:
+                return True
+            elif self._gap_reached():
+                return True
+            elif early_stop and tmp_makespan < curr_makespan:
+                return True
+            curr_makespan = tmp_makespan
+
+        return False
+
+    def _gap_reached(self):
+        '''
+        Returns `True` when the optimality gap of the smallest makespan found
+        so far is at most `gap_epsilon`.
+        '''
+
+        if self._gap_epsilon is None or self._best_makespan is None:
+            return False
+
+        return bounds.gap(self._best_makespan, self._lower_bound,
+                          self._bound_start) <= self._gap_epsilon
+
+    def _island_state(self, population, rng):
+        '''
+        Return the attributes of an island, which evolves `population` with its
+        own random number generator. The estimated execution time table is not
+        part of the state, since it is shared with the workers.
+        '''
+
+        state = {'_population': population, '_rng': rng}
+        for attr in ['_uid', '_resources', '_planned_res',
+                     '_population_size', '_abs_fitness_term',
+                     '_crossover_method', '_selection_method',
+                     '_tournament_size', '_elitism',
+                     '_cache_size', '_deadline', '_end_time',
+                     '_gap_epsilon', '_lower_bound', '_bound_start', '_wf_ids',
+                     '_wf_index', '_local_search', '_local_search_steps',
+                     '_rebalance_steps']:
+            state[attr] = getattr(self, attr)
+
+        return state
+
+    def _migrate(self, states):
         '''
-        This method gets an individual and return the plan it corresponds
+        Move the best individuals of every island to its neighbours, according
+        to the topology. Migrants replace the individuals with the worst fitness
+        of the island they move to, up to half of its population.
         '''
 
-        sched = self._decode_schedule(individual)
-        self._logger.debug('Plan sched: %s', sched)
-        self._plan = list()
+        num_islands = len(states)
+        num_migrants = max(1, int(round(self._migration_rate *
+                                        self._population_size)))
+        if self._topology == 'ring':
+            targets = [[(idx + 1) % num_islands] for idx in range(num_islands)]
+        elif self._topology == 'random':
+            rng = self._get_rng()
+            targets = [[(idx + int(rng.integers(1, num_islands))) % num_islands]
+                       for idx in range(num_islands)]
+        else:
+            targets = [[target for target in range(num_islands) if target != idx]
+                       for idx in range(num_islands)]
+
+        emigrants = list()
+        for state in states:
+            best = np.argsort(state['_fitness'], kind='stable')[-num_migrants:]
+            emigrants.append((state['_population'][best].copy(),
+                              state['_fitness'][best].copy()))
+
+        incoming = [[] for _ in range(num_islands)]
+        for source, island_targets in enumerate(targets):
+            for target in island_targets:
+                incoming[target].append(emigrants[source])
+
+        for state, migrants in zip(states, incoming):
+            if not migrants:
+                continue
+            population = np.concatenate([mig for mig, _ in migrants])
+            fitness = np.concatenate([fit for _, fit in migrants])
+            keep = np.argsort(-fitness, kind='stable')
+            keep = keep[:max(1, state['_population'].shape[0] // 2)]
+            worst = np.argsort(state['_fitness'], kind='stable')[:len(keep)]
+            state['_population'][worst] = population[keep]
+            state['_fitness'][worst] = fitness[keep]
+
+    def _evolve_islands(self, workflows, resources, start_time, seeds=None):
+        '''
+        Evolve a population per island, in epochs of `migration_interval`
+        generations. The islands of an epoch evolve in parallel, on a process
+        pool that shares the estimated execution time table. Between epochs,
+        the best individuals migrate, and the best individual of all islands
+        becomes the planner's best. Evolution stops when an island meets the
+        deadline, finds a perfectly fit individual or runs out of time, when
+        the best individual has not improved for `stall_generations`
+        generations, or after `max_gen` generations. The seeds of a warm start
+        are part of the population of every island.
+        '''
 
-        resource_free = [0] * len(self._resources)
+        if self._island_seeds is not None:
+            island_seeds = list(self._island_seeds)[:self._islands]
+        else:
+            island_seeds = self._get_rng().integers(0, 2 ** 32,
+                                                    size=self._islands).tolist()
+
+        states = list()
+        planner_rng = self._rng
+        for seed in island_seeds:
+            self._rng = np.random.default_rng(seed)
+            self._initialize_population(workflows, resources,
+                                        self._random_init,
+                                        start_time=start_time)
+            self._seed_population(seeds)
+            states.append(self._island_state(self._population, self._rng))
+        self._rng = planner_rng
+
+        est_tx = np.asarray(self._est_txs, dtype=np.float64)
+        self._start_pool(min(self._workers or len(states), len(states)))
         try:
-            for idx in range(len(self._campaign)):
-                wf_est_tx = self._est_txs[idx]
-                for r_id in range(len(sched)):
-                    if self._campaign[idx]['id'] in sched[r_id]:
-                        break
-                tmp_str_time = resource_free[r_id]
-                tmp_end_time = tmp_str_time + wf_est_tx[r_id]
-                self._plan.append((self._campaign[idx], self._resources[r_id],
-                                tmp_str_time, tmp_end_time))
-                resource_free[r_id] = tmp_end_time
-        except Exception as e:
-            self._logger.error(idx, r_id, sched, individual, e)
-            raise
+            generations = 0
+            stall = 0
+            while True:
+                epoch = min(self._migration_interval,
+                            self._max_gen + 1 - generations)
+                if self._executor is None:
+                    results = [_island_epoch(state, epoch, est_tx)
+                               for state in states]
+                else:
+                    results = list(self._executor.map(
+                                        _island_epoch, states,
+                                        [epoch] * len(states),
+                                        [self._pool_table] * len(states)))
+                improved = False
+                for state, (update, _) in zip(states, results):
+                    state.update(update)
+                    improved |= self._update_best(state['_best'],
+                                                  state['_best_makespan'])
+                generations += epoch
+                stall = 0 if improved else stall + epoch
+                self._logger.debug('Islands after %d generations: %s',
+                                   generations,
+                                   [state['_best_makespan'] for state in states])
+
+                if any(stop for _, stop in results) or \
+                   generations > self._max_gen:
+                    break
+                elif self._stall_generations and \
+                     stall >= self._stall_generations:
+                    break
+                self._migrate(states)
+        finally:
+            self._stop_pool()
 
+        best = min(range(len(states)),
+                   key=lambda idx: states[idx]['_best_makespan'])
+        self._population = states[best]['_population']
+        self._fitness = states[best]['_fitness']
 
     def plan(self, campaign=None, resources=None, num_oper=None, start_time=None,
              **kargs):
@@ -382,68 +1352,115 @@ class GAPlanner(Planner):
         The plan method takes as input a campaign, resources and num_oper in case
         any of these has changed. They default to `None`
 
+        *Keyword arguments:*
+            deadline: Stop when the makespan of the best plan is smaller.
+            max_gen: The maximum number of generations. Defaults to 100.
+            time_budget: The wall-clock time, in seconds, the planner can
+                         spend. When it runs out, the best plan found so far
+                         is returned.
+            stall_generations: Stop when the best plan has not improved for
+                               this number of generations.
+            gap_epsilon: Stop when the makespan of the best plan is at most
+                         this fraction larger than a lower bound of the
+                         optimal makespan, see `bounds.lower_bound`.
+            warm_start: A previous plan, or `True` for the population of the
+                        last call of `plan`, that seeds the initial population,
+                        see `_get_seeds`. Only the workflows of the campaign
+                        are planned, so the seeds are restricted to them.
+                        `replan` warm starts from the last population.
+
+        By default, evolution also stops as soon as the makespan of the
+        fittest individual improves. When a time budget or a stall limit is
+        given, the planner runs until one of them, or another stopping
+        condition, is met. Both apply only to the call that gives them. The
+        best plan found so far can be retrieved from another thread with
+        `best_so_far`.
+
         *Returns:*
             list(tuples)
         '''
 
+        start = time.time()
         self._deadline = kargs.get('deadline', self._deadline)
         self._max_gen = kargs.get('max_gen', self._max_gen)
+        # The anytime conditions apply only to the call that gives them.
+        self._time_budget = kargs.get('time_budget', None)
+        self._stall_generations = kargs.get('stall_generations', None)
+        self._end_time = None
+        if self._time_budget is not None:
+            self._end_time = start + self._time_budget
+        self._gap_epsilon = kargs.get('gap_epsilon', self._gap_epsilon)
+        early_stop = self._time_budget is None and \
+                     self._stall_generations is None
 
         tmp_cmp = campaign if campaign else self._campaign
         tmp_res = resources if resources else self._resources
-        # FIXME: allow replanning
-        # tmp_nop = num_oper if num_oper else self._num_oper
-
-        self._initialize_population(tmp_cmp, tmp_res, self._random_init,
-                                    start_time=start_time)
-        self._logger.debug('Initial  population: %s', self._population)
-        self._calc_fitness()
-        sorted_fitness = sorted(enumerate(self._fitness), key=lambda x: x[1])
-        self._logger.debug('Sorted fitness: %s', sorted_fitness)
-        gen_id = 0
-        curr_makespan = 0
-        while True:
-            self._logger.debug('Generation: %d', gen_id)
-            parents = self._selection()
-            children = self._crossover(parents)
-            self._logger.debug('Number of parents: %d, number of children %d',
-                               len(parents), len(children))
-            children = self._mutate(children)
-            self._logger.debug('Number of parents: %d, number of children %d',
-                                len(parents), len(children))
-            # Replace half of the individuals with the worst fitness
-            for i in range(len(children)):
-                self._population[sorted_fitness[i][0]] = children[i]
-            # Get the one with the best fitness and check it
-            self._calc_fitness()
-            sorted_fitness = sorted(enumerate(self._fitness), key=lambda x: x[1])
-            self._logger.debug('Sorted fitness: %s', sorted_fitness)
-            best_individual = self._population[sorted_fitness[-1][0]]
-            tmp_makespan = self._get_makespan(best_individual)
-            self._get_plan(best_individual)
-            self._logger.debug('Best individual makespan: %f and plan %s',
-                               tmp_makespan, self._plan)
-            if self._deadline is not None and tmp_makespan < self._deadline:
-                break
-            elif sorted_fitness[-1][1] == 1:
-                break
-            elif gen_id == self._max_gen or tmp_makespan < curr_makespan:
-                break
-            curr_makespan = tmp_makespan
-            gen_id += 1
-
+        tmp_nop = num_oper if num_oper else [wf['num_oper'] for wf in tmp_cmp]
+        # The table of the last call may be of other workflows, e.g. after a
+        # replan. The cache of the table makes this cheap when nothing changed.
+        est_txs = self._get_est_tx(num_oper=tmp_nop, resources=tmp_res,
+                                   campaign=tmp_cmp)
+
+        seeds = None
+        warm_start = kargs.get('warm_start', None)
+        if warm_start:
+            seeds = self._get_seeds(warm_start, tmp_cmp, tmp_res, start_time,
+                                    est_txs)
+
+        # The best individual of the last call is forgotten before the state
+        # it refers to is replaced, so that `best_so_far` never mixes them.
+        self._reset_best()
+        with self._best_lock:
+            self._est_txs = est_txs
+            self._set_workflows(tmp_cmp)
+            self._res_ids = [_get_uid(resource) for resource in tmp_res]
+            self._planned_res = list(tmp_res)
+            self._resource_free = self._get_resource_free(
+                                      start_time, len(tmp_res)).tolist()
+        # Evolution measures the makespan of an individual from the time
+        # the resources become available. The lower bound is only needed to
+        # stop at an optimality gap.
+        self._lower_bound = None
+        if self._gap_epsilon is not None:
+            self._lower_bound = bounds.lower_bound(
+                                    tmp_nop,
+                                    [res['performance'] for res in tmp_res])
+        self._bound_start = 0.0
+        self._reset_fitness_cache()
+        if self._islands and self._islands > 1:
+            self._evolve_islands(tmp_cmp, tmp_res, start_time, seeds=seeds)
+        else:
+            self._initialize_population(tmp_cmp, tmp_res, self._random_init,
+                                        start_time=start_time)
+            self._seed_population(seeds)
+            self._logger.debug('Initial  population: %s', self._population)
+            self._start_pool(self._workers)
+            try:
+                self._evolve(self._max_gen + 1, early_stop=early_stop)
+            finally:
+                self._stop_pool()
+
+        self._get_plan(self._best)
+        self._logger.debug('Best individual makespan: %f',
+                           self._best_makespan)
+        if self._lower_bound is not None:
+            self._logger.debug('Gap: %f', bounds.gap(self._best_makespan,
+                                                     self._lower_bound))
         self._logger.info('Derived plan %s', self._plan)
         return self._plan
 
 
     def replan(self, campaign=None, resources=None, num_oper=None, start_time=0):
         '''
-        The planning method
+        The replanning method. The population is warm started from the last
+        population, so that the workflows that have not started yet keep their
+        resources unless a better plan is found.
         '''
         if campaign and resources and num_oper:
             self._logger.debug('Replanning')
             self._plan = self.plan(campaign=campaign, resources=resources,
-                                   num_oper=num_oper, start_time=start_time)
+                                   num_oper=num_oper, start_time=start_time,
+                                   warm_start=True)
         else:
             self._logger.debug('Nothing to plan for')
 
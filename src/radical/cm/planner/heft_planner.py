@@ -3,7 +3,12 @@ Author: Ioannis Paraskevakos
 License: MIT
 Copyright: 2018-2019
 """
+import numpy as np
+
 from .base import Planner
+from .resource_queue import ResourceQueue
+from .timeline import Timeline
+from ..utils import dag
 
 
 class HeftPlanner(Planner):
@@ -21,30 +26,16 @@ class HeftPlanner(Planner):
     resources: A list of resources, whose performance is given in operations per second
     num_oper: The number of operations each workflow will execute
 
+    Workflows may depend on other workflows of the campaign through their
+    `dependencies` key, see `radical.cm.utils.dag.get_dependencies`. Workflows
+    are then prioritized by their upward rank, and a workflow starts only after
+    the data of all its predecessors are available on its resource.
+
     The class implements a plan method that return a plan, a list of tuples. 
 
     Each tuple will have the workflow, selected resource, starting time and
     estimated finish time.
     '''
-    def __init__(self, campaign, resources, num_oper, sid=None):
-
-        super(HeftPlanner, self).__init__(campaign=campaign,
-                                          resources=resources,
-                                          num_oper=num_oper, sid=sid)
-
-        # Calculate the estimated execution time of each workflow on to each 
-        # resource. This table will be used to calculate the plan.
-        # est_tx holds this table. The index of the table is
-        # <workflow_idx, resource_idx>, and each entry is the estimated
-        # execution time of a workflow on a resource.
-        # TODO: not all workflows can run in a resource
-        res_perf = list()
-        for resource in self._resources:
-            res_perf.append(resource['performance'])
-
-        self._est_tx = self._calc_est_tx(cmp_oper=self._num_oper,
-                                         resources=res_perf)
-
     def plan(self, campaign=None, resources=None, num_oper=None, start_time=None,
              **kargs):
         '''
@@ -54,6 +45,20 @@ class HeftPlanner(Planner):
         The plan method takes as input a campaign, resources and num_oper in case
         any of these has changed. They default to `None`
 
+        *Keyword arguments:*
+            uniform: When `True`, the resources are treated as uniformly
+                     related, i.e. the execution time of a workflow depends
+                     only on the resource's performance. Each placement is then
+                     O(c + log m), where c is the number of distinct
+                     performance values, instead of O(m). The plan is the same
+                     as the one of the default mode. It is ignored when
+                     workflows have dependencies. Defaults to `False`.
+            insertion: When `True`, a workflow can be placed in an idle gap
+                       between already placed workflows, instead of only after
+                       the last one on a resource. Gaps appear when workflows
+                       wait for their dependencies, so without dependencies the
+                       plan is the same. Defaults to `False`.
+
         *Returns:*
             list(tuples)
         '''
@@ -61,54 +66,169 @@ class HeftPlanner(Planner):
         tmp_cmp = campaign if campaign else self._campaign
         tmp_res = resources if resources else self._resources
         tmp_nop = num_oper if num_oper else self._num_oper
-        res_perf = list()
-        for resource in tmp_res:
-            res_perf.append(resource['performance'])
-
-        self._est_tx = self._calc_est_tx(cmp_oper=tmp_nop,
-                                         resources=res_perf)
 
         # Reset the plan in case of a recall
         self._plan = list()
 
-        # Calculate the average execution time for all worflows        
-        av_est_tx = list()
-        for est_tx in self._est_tx:
-            av_est_tx.append(sum(est_tx) / len(est_tx))
-
-        # Get the indices of the sorted list.
-        av_est_idx_sorted = [i[0] for i in sorted(enumerate(av_est_tx),
-                                                  key=lambda x:x[1],
-                                                  reverse=True)]
-
-        # This list tracks when a resource whould be available.
-        if isinstance(start_time, list):
-            resource_free = start_time
-        elif isinstance(start_time, float) or isinstance(start_time, int):
-            resource_free = [start_time] * len(tmp_res)
-        else:
-            resource_free = [0] * len(tmp_res)
-
-        for sorted_idx in av_est_idx_sorted:
-            wf_est_tx = self._est_tx[sorted_idx]
-            min_end_time = float('inf')
-            for i in range(len(tmp_res)):
-                tmp_str_time = resource_free[i]
-                tmp_end_time = tmp_str_time + wf_est_tx[i]
-                if tmp_end_time < min_end_time:
-                    min_end_time = tmp_end_time
-                    tmp_min_idx = i
-            self._plan.append((tmp_cmp[sorted_idx],
-                               tmp_res[tmp_min_idx],
-                               resource_free[tmp_min_idx], 
-                               resource_free[tmp_min_idx] +
-                                   wf_est_tx[tmp_min_idx]))
-            resource_free[tmp_min_idx] = resource_free[tmp_min_idx] + \
-                                         wf_est_tx[tmp_min_idx]
+        # This array tracks when a resource whould be available.
+        resource_free = self._get_resource_free(start_time, len(tmp_res))
+
+        preds = dag.get_predecessors(tmp_cmp)
+        has_deps = any(preds)
+
+        if kargs.get('uniform', False):
+            if not has_deps:
+                self._plan_uniform(tmp_cmp, tmp_res, tmp_nop, resource_free)
+                self._logger.info('Derived plan %s', self._plan)
+                return self._plan
+            self._logger.warning('Workflows have dependencies, ignoring ' +
+                                 'uniform mode')
+
+        # Calculate the estimated execution time of each workflow on to each
+        # resource. This table will be used to calculate the plan.
+        # est_tx holds this table. The index of the table is
+        # <workflow_idx, resource_idx>, and each entry is the estimated
+        # execution time of a workflow on a resource.
+        # TODO: not all workflows can run in a resource
+        self._est_tx = self._get_est_tx(num_oper=tmp_nop, resources=tmp_res,
+                                        campaign=tmp_cmp)
+
+        # Rank the workflows by their average execution time. All workflows
+        # are ranked with a single stable argsort, so workflows with the same
+        # average keep their campaign order.
+        av_est_tx = self._est_tx.mean(axis=1)
+        if has_deps:
+            self._plan_dag(tmp_cmp, tmp_res, preds, av_est_tx, resource_free,
+                           insertion=kargs.get('insertion', False))
+            self._logger.info('Derived plan %s', self._plan)
+            return self._plan
+
+        av_est_idx_sorted = np.argsort(-av_est_tx, kind='stable')
+
+        # Each placement is a single vectorized argmin over the finish times
+        # of the workflow on every resource. `np.argmin` returns the first
+        # minimum, i.e. the resource with the smallest index on ties.
+        end_times = np.empty(len(tmp_res), dtype=np.float64)
+        for sorted_idx in av_est_idx_sorted.tolist():
+            np.add(resource_free, self._est_tx[sorted_idx], out=end_times)
+            tmp_min_idx = int(np.argmin(end_times))
+            tmp_str_time = float(resource_free[tmp_min_idx])
+            tmp_end_time = float(end_times[tmp_min_idx])
+            self._plan.append((tmp_cmp[sorted_idx], tmp_res[tmp_min_idx],
+                               tmp_str_time, tmp_end_time))
+            resource_free[tmp_min_idx] = tmp_end_time
 
         self._logger.info('Derived plan %s', self._plan)
         return self._plan
 
+    def _plan_uniform(self, campaign, resources, num_oper, resource_free):
+        '''
+        Plan a campaign on uniformly related resources. A ResourceQueue groups
+        the resources by performance, so the resource with the earliest finish
+        time is found without scanning all resources, and the execution times
+        are only calculated once per distinct performance value.
+
+        The average execution time of a workflow is proportional to its number
+        of operations, so workflows are ranked by their operations.
+        '''
+
+        queue = ResourceQueue(performance=[resource['performance']
+                                           for resource in resources],
+                              resource_free=resource_free.tolist())
+        est_tx = self._calc_est_tx(cmp_oper=num_oper,
+                                   resources=queue.performance)
+        num_oper = np.asarray(num_oper, dtype=np.float64)
+        for sorted_idx in np.argsort(-num_oper, kind='stable').tolist():
+            res_idx, tmp_str_time, tmp_end_time = \
+                queue.place(est_tx[sorted_idx])
+            self._plan.append((campaign[sorted_idx], resources[res_idx],
+                               tmp_str_time, tmp_end_time))
+
+    def _upward_ranks(self, av_est_tx, preds):
+        '''
+        Calculate the upward rank of each workflow, i.e. the length of the
+        longest path from the workflow to the end of the campaign, including
+        the workflow's average execution time and the communication costs.
+        Returns the ranks and the position of each workflow in a topological
+        order.
+        '''
+
+        topo_order = dag.topological_order(preds)
+        av_est_tx = av_est_tx.tolist()
+        ranks = [0.0] * len(av_est_tx)
+        succ_rank = [0.0] * len(av_est_tx)
+        for idx in reversed(topo_order):
+            ranks[idx] = av_est_tx[idx] + succ_rank[idx]
+            for pred, cost in preds[idx].items():
+                succ_rank[pred] = max(succ_rank[pred], cost + ranks[idx])
+
+        topo_pos = [0] * len(topo_order)
+        for pos, idx in enumerate(topo_order):
+            topo_pos[idx] = pos
+
+        return np.array(ranks), np.array(topo_pos)
+
+    def _ready_times(self, wf_preds, end_times, placement, num_resources):
+        '''
+        Return the time the data of all the predecessors of a workflow are
+        available on each resource. A predecessor's data are available on its
+        own resource when it ends, and on any other resource after the
+        communication cost.
+        '''
+
+        ready = np.zeros(num_resources, dtype=np.float64)
+        for pred, cost in wf_preds.items():
+            arrival = np.full(num_resources, end_times[pred] + cost)
+            arrival[placement[pred]] = end_times[pred]
+            np.maximum(ready, arrival, out=ready)
+
+        return ready
+
+    def _plan_dag(self, campaign, resources, preds, av_est_tx, resource_free,
+                  insertion=False):
+        '''
+        Plan a campaign whose workflows have dependencies. Workflows are placed
+        in decreasing upward rank, which puts every workflow after its
+        predecessors, on the resource where they finish first.
+
+        With the insertion policy, each resource keeps a Timeline of its idle
+        gaps, and a workflow starts in the earliest gap it fits in.
+        '''
+
+        ranks, topo_pos = self._upward_ranks(av_est_tx, preds)
+        # Sort by decreasing rank, and by topological order on ties.
+        order = np.lexsort((topo_pos, -ranks))
+
+        if insertion:
+            timelines = [Timeline(free_time=free)
+                         for free in resource_free.tolist()]
+
+        end_times = [0.0] * len(campaign)
+        placement = [0] * len(campaign)
+        for idx in order.tolist():
+            str_times = self._ready_times(preds[idx], end_times, placement,
+                                          len(resources))
+            if insertion:
+                wf_est_tx = self._est_tx[idx].tolist()
+                for res_idx, timeline in enumerate(timelines):
+                    str_times[res_idx] = timeline.earliest_start(
+                                            ready=float(str_times[res_idx]),
+                                            duration=wf_est_tx[res_idx])
+            else:
+                np.maximum(str_times, resource_free, out=str_times)
+
+            res_idx = int(np.argmin(str_times + self._est_tx[idx]))
+            tmp_str_time = float(str_times[res_idx])
+            tmp_end_time = tmp_str_time + float(self._est_tx[idx, res_idx])
+            self._plan.append((campaign[idx], resources[res_idx],
+                               tmp_str_time, tmp_end_time))
+            if insertion:
+                timelines[res_idx].reserve(tmp_str_time, tmp_end_time)
+            else:
+                resource_free[res_idx] = tmp_end_time
+            end_times[idx] = tmp_end_time
+            placement[idx] = res_idx
+
     def replan(self, campaign=None, resources=None, num_oper=None, start_time=0):
         '''
         The planning method
@@ -3,8 +3,10 @@ Author: Ioannis Paraskevakos
 License: MIT
 Copyright: 2018-2019
 """
+import numpy as np
 
 from .base import Planner
+from .resource_queue import ResourceQueue
 
 
 class L2FFPlanner(Planner):
@@ -12,6 +14,12 @@ class L2FFPlanner(Planner):
     This class implements a campaign planner based on Largest workflows to 
     fastest resource first.
 
+    By default, the largest workflows are assigned to the resources in
+    decreasing order of performance, in a round robin fashion. With the
+    `earliest_finish` option, each workflow, from the largest to the smallest,
+    is assigned to the resource on which it finishes first, similar to the
+    Longest Processing Time first list scheduling.
+
     Constractor parameters:
     campaign: A list of workflows
     resources: A list of resources, whose performance is given in operations per second
@@ -22,27 +30,23 @@ class L2FFPlanner(Planner):
     Each tuple will have the workflow, selected resource, starting time and
     estimated finish time.
     '''
-    def __init__(self, campaign, resources, num_oper, sid=None):
-
-        super(L2FFPlanner, self).__init__(campaign=campaign,
-                                          resources=resources,
-                                          num_oper=num_oper, sid=sid)
-
-        res_perf = list()
-        for resource in self._resources:
-            res_perf.append(resource['performance'])
-        self._est_tx = self._calc_est_tx(cmp_oper=self._num_oper,
-                                         resources=res_perf)
-
     def plan(self, campaign=None, resources=None, num_oper=None, start_time=None,
              **kargs):
         '''
-        This method implements a random algorithm. It returns a list of tuples
+        This method implements the L2FF algorithm. It returns a list of tuples
         Each tuple contains: Workflow ID, Resource ID, Start Time, End Time.
 
         The plan method takes as input a campaign, resources and num_oper in case
         any of these has changed. They default to `None`
 
+        *Keyword arguments:*
+            earliest_finish: When `True`, each workflow is assigned to the
+                             resource on which it finishes first, instead of
+                             the next resource in the round robin. Resources
+                             are kept in a ResourceQueue, so planning is
+                             O(n (c + log m)) for c distinct performance
+                             values. Defaults to `False`.
+
         *Returns:*
             list(tuples)
         '''
@@ -50,21 +54,19 @@ class L2FFPlanner(Planner):
         tmp_cmp = campaign if campaign else self._campaign
         tmp_res = resources if resources else self._resources
         tmp_nop = num_oper if num_oper else self._num_oper
-        res_perf = list()
-        for resource in self._resources:
-            res_perf.append(resource['performance'])
-        self._est_tx = self._calc_est_tx(cmp_oper=tmp_nop,
-                                         resources=res_perf)
         # Reset the plan in case of a recall
         self._plan = list()
 
         # This list tracks when a resource whould be available.
-        if isinstance(start_time, list):
-            resource_free = start_time
-        elif isinstance(start_time, float) or isinstance(start_time, int):
-            resource_free = [start_time] * len(tmp_res)
-        else:
-            resource_free = [0] * len(tmp_res)
+        resource_free = self._get_resource_free(start_time, len(tmp_res))
+
+        if kargs.get('earliest_finish', False):
+            self._plan_earliest_finish(tmp_cmp, tmp_res, tmp_nop, resource_free)
+            return self._plan
+
+        self._est_tx = self._get_est_tx(num_oper=tmp_nop, resources=tmp_res,
+                                        campaign=tmp_cmp)
+        resource_free = resource_free.tolist()
 
         sorted_nop = sorted([nop for nop in enumerate(tmp_nop)],
                             key=lambda nop:nop[1], reverse=True)
@@ -75,7 +77,7 @@ class L2FFPlanner(Planner):
         for i in range(len(sorted_nop)):
             sel_res = sorted_res[i % len(sorted_res)][0]
             wf_idx = sorted_nop[i][0]
-            wf_est_tx = self._est_tx[wf_idx]
+            wf_est_tx = self._est_tx[wf_idx].tolist()
             tmp_str_time = resource_free[sel_res]
             tmp_end_time = tmp_str_time + wf_est_tx[sel_res]
             self._plan.append((tmp_cmp[wf_idx], tmp_res[sel_res],
@@ -84,6 +86,26 @@ class L2FFPlanner(Planner):
 
         return self._plan
 
+    def _plan_earliest_finish(self, campaign, resources, num_oper,
+                              resource_free):
+        '''
+        Assign the workflows, from the largest to the smallest, to the resource
+        on which each one finishes first. The execution time of a workflow
+        depends only on the resource's performance, so it is calculated once
+        per distinct performance value.
+        '''
+
+        queue = ResourceQueue(performance=[resource['performance']
+                                           for resource in resources],
+                              resource_free=resource_free.tolist())
+        est_tx = self._calc_est_tx(cmp_oper=num_oper,
+                                   resources=queue.performance)
+        num_oper = np.asarray(num_oper, dtype=np.float64)
+        for wf_idx in np.argsort(-num_oper, kind='stable').tolist():
+            res_idx, tmp_str_time, tmp_end_time = queue.place(est_tx[wf_idx])
+            self._plan.append((campaign[wf_idx], resources[res_idx],
+                               tmp_str_time, tmp_end_time))
+
     def replan(self, campaign=None, resources=None, num_oper=None, start_time=0):
         '''
         The planning method
@@ -0,0 +1,328 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import heapq
+
+import numpy as np
+
+
+class LoadTracker(object):
+    '''
+    This class tracks the load of each resource for an assignment of workflows
+    to resources, and evaluates how the makespan changes when a workflow moves
+    to another resource or two workflows exchange their resources.
+
+    A move or a swap changes the load of two resources only, so the makespan
+    after it is the largest of these two loads and of the largest load of the
+    other resources. The three largest loads are kept, and the largest load
+    outside any two resources is one of them. A move or a swap is therefore
+    evaluated in O(1), without summing the loads again. Applying it updates the
+    two loads and pushes them on a max-heap of loads, whose outdated entries
+    are dropped lazily, so the three largest loads are found again in
+    O(log m).
+
+    The makespan is the largest load of the resources that have workflows, so
+    a resource that becomes available late, but executes nothing, does not
+    count.
+
+    Constractor parameters:
+    est_tx: The estimated execution time table, a 2-D array whose index is
+            <workflow_idx, resource_idx>
+    assignment: The index of the resource each workflow is assigned to
+    resource_free: The time each resource becomes available. Defaults to 0.
+    '''
+
+    def __init__(self, est_tx, assignment, resource_free=None):
+
+        self._est_tx = np.asarray(est_tx, dtype=np.float64)
+        self._assignment = np.array(assignment, dtype=np.int64)
+        num_wfs, num_res = self._est_tx.shape
+
+        wf_est_tx = self._est_tx[np.arange(num_wfs), self._assignment]
+        self._loads = np.bincount(self._assignment, weights=wf_est_tx,
+                                  minlength=num_res).astype(np.float64)
+        self._counts = np.bincount(self._assignment, minlength=num_res)
+        if resource_free is not None:
+            self._loads += np.asarray(resource_free, dtype=np.float64)
+
+        self._top = list()
+        self._top_loads = list()
+        self._heap = list()
+        self._update_top()
+
+    @property
+    def assignment(self):
+        '''
+        The index of the resource each workflow is assigned to.
+        '''
+
+        return self._assignment
+
+    @property
+    def loads(self):
+        '''
+        The load of each resource.
+        '''
+
+        return self._loads
+
+    @property
+    def makespan(self):
+        '''
+        The largest load of the resources that have workflows.
+        '''
+
+        return self._top_loads[0]
+
+    @property
+    def most_loaded(self):
+        '''
+        The index of the resource with the largest load.
+        '''
+
+        return self._top[0]
+
+    def _update_top(self, changed=None):
+        '''
+        Find the three largest loads and their resources, in decreasing load.
+        The loads of the `changed` resources are pushed on the heap of loads.
+        Entries whose load is no longer the load of their resource are dropped
+        when they reach the top. The heap is built again from all loads when
+        nothing is given, or when outdated entries are most of it.
+        '''
+
+        if changed is None or len(self._heap) > 4 * self._loads.shape[0]:
+            self._heap = [(-self._busy_load(res_idx), res_idx)
+                          for res_idx in range(self._loads.shape[0])]
+            heapq.heapify(self._heap)
+        else:
+            for res_idx in changed:
+                heapq.heappush(self._heap,
+                               (-self._busy_load(res_idx), res_idx))
+
+        top = list()
+        entries = list()
+        while len(top) < 3 and self._heap:
+            entry = heapq.heappop(self._heap)
+            neg_load, res_idx = entry
+            if res_idx in top or -neg_load != self._busy_load(res_idx):
+                continue
+            top.append(res_idx)
+            entries.append(entry)
+        for entry in entries:
+            heapq.heappush(self._heap, entry)
+
+        self._top = top
+        self._top_loads = [-entry[0] for entry in entries]
+
+    def _busy_load(self, res_idx):
+        '''
+        Return the load of a resource, or `-inf` when it has no workflows.
+        '''
+
+        if self._counts[res_idx]:
+            return float(self._loads[res_idx])
+        return -np.inf
+
+    def _rest(self, res1, res2):
+        '''
+        Return the largest load of the resources other than `res1` and `res2`.
+        '''
+
+        for res_idx, load in zip(self._top, self._top_loads):
+            if res_idx != res1 and res_idx != res2:
+                return load
+
+        return -np.inf
+
+    def _rest_loads(self, res_idx):
+        '''
+        Return, for every resource, the largest load of the resources other
+        than it and `res_idx`.
+        '''
+
+        rest = np.full(self._loads.shape[0], self._rest(res_idx, res_idx))
+        for other in self._top:
+            if other != res_idx:
+                rest[other] = self._rest(res_idx, other)
+
+        return rest
+
+    def move_makespan(self, wf_idx, res_idx):
+        '''
+        Return the makespan after moving a workflow to a resource.
+        '''
+
+        src = int(self._assignment[wf_idx])
+        if src == res_idx:
+            return self.makespan
+
+        src_load = self._loads[src] - self._est_tx[wf_idx, src] \
+            if self._counts[src] > 1 else -np.inf
+        dst_load = self._loads[res_idx] + self._est_tx[wf_idx, res_idx]
+
+        return max(src_load, dst_load, self._rest(src, res_idx))
+
+    def swap_makespan(self, wf_idx1, wf_idx2):
+        '''
+        Return the makespan after two workflows exchange their resources.
+        '''
+
+        res1 = int(self._assignment[wf_idx1])
+        res2 = int(self._assignment[wf_idx2])
+        if res1 == res2:
+            return self.makespan
+
+        load1 = self._loads[res1] - self._est_tx[wf_idx1, res1] + \
+            self._est_tx[wf_idx2, res1]
+        load2 = self._loads[res2] - self._est_tx[wf_idx2, res2] + \
+            self._est_tx[wf_idx1, res2]
+
+        return max(load1, load2, self._rest(res1, res2))
+
+    def move(self, wf_idx, res_idx):
+        '''
+        Move a workflow to a resource.
+        '''
+
+        src = int(self._assignment[wf_idx])
+        if src == res_idx:
+            return
+
+        self._loads[src] -= self._est_tx[wf_idx, src]
+        self._loads[res_idx] += self._est_tx[wf_idx, res_idx]
+        self._counts[src] -= 1
+        self._counts[res_idx] += 1
+        self._assignment[wf_idx] = res_idx
+        self._update_top((src, res_idx))
+
+    def swap(self, wf_idx1, wf_idx2):
+        '''
+        Exchange the resources of two workflows.
+        '''
+
+        res1 = int(self._assignment[wf_idx1])
+        res2 = int(self._assignment[wf_idx2])
+        if res1 == res2:
+            return
+
+        self._loads[res1] += self._est_tx[wf_idx2, res1] - \
+            self._est_tx[wf_idx1, res1]
+        self._loads[res2] += self._est_tx[wf_idx1, res2] - \
+            self._est_tx[wf_idx2, res2]
+        self._assignment[wf_idx1] = res2
+        self._assignment[wf_idx2] = res1
+        self._update_top((res1, res2))
+
+    def hill_climb(self, max_steps=None, swaps=True):
+        '''
+        Improve the assignment by moving workflows away from the most loaded
+        resource, or swapping them with workflows of other resources, until no
+        move or swap improves it or `max_steps` have been applied. When `swaps`
+        is `False`, only moves are applied.
+
+        A step improves the assignment when both resources it changes end up
+        with a load smaller than the makespan. The makespan then decreases, or
+        the most loaded resource is no longer the only one with it. Every step
+        applies the move with the smallest resulting makespan and, when no move
+        improves the assignment, the best swap. All the moves and swaps of the
+        workflows of the most loaded resource are evaluated at once, in O(1)
+        each.
+
+        *Returns:*
+            The number of applied steps.
+        '''
+
+        if self._est_tx.shape[1] < 2:
+            return 0
+
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            makespan = self.makespan
+            src = self._top[0]
+            # Changes smaller than the rounding error are no improvement.
+            limit = makespan - abs(makespan) * 1e-12
+
+            # Move a workflow of the most loaded resource to any resource.
+            on_src, local, makespans = self.move_table(src)
+            if not on_src.shape[0]:
+                break
+            best = self._best_step(local, makespans, limit)
+            if best is not None:
+                self.move(int(on_src[best[0]]), int(best[1]))
+                steps += 1
+                continue
+            elif not swaps:
+                break
+
+            # Swap a workflow of the most loaded resource with a workflow of
+            # another resource.
+            on_src, others, local, makespans = self.swap_table(src)
+            if not others.shape[0]:
+                break
+            best = self._best_step(local, makespans, limit)
+            if best is None:
+                break
+            self.swap(int(on_src[best[0]]), int(others[best[1]]))
+            steps += 1
+
+        return steps
+
+    def move_table(self, src):
+        '''
+        Evaluate the moves of all the workflows of a resource at once.
+
+        *Returns:*
+            The workflows of `src`, and two arrays whose index is
+            <workflow, resource>: the largest of the two changed loads and the
+            makespan after moving the workflow to the resource. Moves to `src`
+            itself are infinite.
+        '''
+
+        on_src = np.flatnonzero(self._assignment == src)
+        src_est_tx = self._est_tx[on_src]
+        src_loads = self._loads[src] - src_est_tx[:, src]
+        if on_src.shape[0] == 1:
+            src_loads[:] = -np.inf
+        local = np.maximum(src_loads[:, np.newaxis], self._loads + src_est_tx)
+        local[:, src] = np.inf
+
+        return on_src, local, np.maximum(local, self._rest_loads(src))
+
+    def swap_table(self, src):
+        '''
+        Evaluate the swaps of all the workflows of a resource with all the
+        workflows of other resources at once.
+
+        *Returns:*
+            The workflows of `src`, the workflows of other resources, and two
+            arrays whose index is <workflow of src, other workflow>: the
+            largest of the two changed loads and the makespan after the swap.
+        '''
+
+        on_src = np.flatnonzero(self._assignment == src)
+        others = np.flatnonzero(self._assignment != src)
+        other_res = self._assignment[others]
+        src_loads = self._loads[src] - self._est_tx[on_src, src]
+        swp_src = src_loads[:, np.newaxis] + self._est_tx[others, src]
+        swp_dst = self._loads[other_res] - self._est_tx[others, other_res] + \
+            self._est_tx[on_src][:, other_res]
+        local = np.maximum(swp_src, swp_dst)
+        rest = self._rest_loads(src)[other_res]
+
+        return on_src, others, local, np.maximum(local, rest)
+
+    def _best_step(self, local, makespans, limit):
+        '''
+        Return the position of the improving step with the smallest makespan,
+        or `None` when no step improves the assignment.
+        '''
+
+        makespans = np.where(local < limit, makespans, np.inf)
+        best = np.unravel_index(int(np.argmin(makespans)), makespans.shape)
+        if not np.isfinite(makespans[best]):
+            return None
+
+        return best
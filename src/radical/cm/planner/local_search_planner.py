@@ -0,0 +1,368 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import math
+import time
+
+import numpy as np
+
+from . import bounds
+from .base import Planner, _get_uid
+from .load_tracker import LoadTracker
+
+
+class LocalSearchPlanner(Planner):
+    '''
+    This class implements a campaign planner that improves a single plan with
+    simulated annealing or tabu search. The plan starts from a given plan, for
+    example the plan of `HeftPlanner`, or from placing every workflow on the
+    resource where it completes first.
+
+    For reference:
+    S. Kirkpatrick, C. D. Gelatt, and M. P. Vecchi, "Optimization by simulated
+    annealing," Science, vol. 220, no. 4598, pp. 671-680, 1983.
+    F. Glover, "Tabu search - part I," ORSA Journal on Computing, vol. 1,
+    no. 3, pp. 190-206, 1989.
+
+    The load of every resource is kept by a `LoadTracker`, so a neighbor, i.e.
+    a workflow moving to another resource or two workflows exchanging their
+    resources, is evaluated in O(1) and applied in O(log m), without building
+    the plan again. Only neighbors that change the most loaded resource can
+    decrease the makespan, so neighbors always take a workflow of it.
+
+    Annealing draws a random neighbor at every iteration and applies it when
+    the makespan does not increase, or with a probability that decreases with
+    the increase and the temperature otherwise. Tabu search evaluates all the
+    moves of the workflows of the most loaded resource at every iteration and
+    applies the best one, even when the makespan increases, but a workflow
+    cannot move back to a resource it left for `tabu_tenure` iterations,
+    unless this gives the best makespan so far. Both end with hill climbing the
+    best assignment found, see `LoadTracker.hill_climb`.
+
+    Constractor parameters:
+    campaign: A list of workflows
+    resources: A list of resources, whose performance is given in operations per second
+    num_oper: The number of operations each workflow will execute
+    method: 'annealing' or 'tabu'. Defaults to 'annealing'.
+    temperature: The initial temperature of annealing. Defaults to a tenth of
+                 the mean execution time of a workflow in the initial plan.
+    cooling: The factor by which the temperature decreases every as many
+             iterations as there are workflows. Defaults to 0.95.
+    swap_rate: The fraction of the annealing neighbors that are swaps instead
+               of moves. Defaults to 0.5.
+    tabu_tenure: The number of iterations a tabu move stays tabu. Defaults to
+                 the number of resources plus 2.
+
+    The class implements a plan method that return a plan, a list of tuples.
+
+    Each tuple will have the workflow, selected resource, starting time and
+    estimated finish time.
+    '''
+
+    def __init__(self, campaign, resources, num_oper, sid=None, seed=None,
+                 method='annealing', temperature=None, cooling=0.95,
+                 swap_rate=0.5, tabu_tenure=None):
+
+        super(LocalSearchPlanner, self).__init__(campaign=campaign,
+                                                 resources=resources,
+                                                 num_oper=num_oper,
+                                                 sid=sid, seed=seed)
+
+        if method not in ('annealing', 'tabu'):
+            raise ValueError('Unknown local search method %s' % method)
+        self._method = method
+        self._temperature = temperature
+        self._cooling = cooling
+        self._swap_rate = swap_rate
+        self._tabu_tenure = tabu_tenure
+
+        # The assignment with the smallest makespan found by the last search.
+        self._best = None
+        self._best_makespan = None
+
+    def _initial_assignment(self, initial_plan, workflows, resources,
+                            resource_free):
+        '''
+        Return the index of the resource of every workflow in the initial plan.
+        Workflows and resources of the plan are matched by ID. Workflows that
+        are not in the plan, or whose resource is not available, are placed
+        in campaign order on the resource where they complete first.
+        '''
+
+        res_idx = {_get_uid(resource): idx
+                   for idx, resource in enumerate(resources)}
+        planned = dict()
+        for entry in initial_plan or list():
+            res_id = _get_uid(entry[1])
+            if res_id in res_idx:
+                planned[_get_uid(entry[0])] = res_idx[res_id]
+
+        assignment = np.full(len(workflows), -1, dtype=np.int64)
+        for idx, workflow in enumerate(workflows):
+            assignment[idx] = planned.get(_get_uid(workflow), -1)
+
+        known = assignment >= 0
+        loads = resource_free + np.bincount(
+                    assignment[known],
+                    weights=self._est_tx[np.flatnonzero(known),
+                                         assignment[known]],
+                    minlength=len(resources))
+        for idx in np.flatnonzero(~known):
+            res = int(np.argmin(loads + self._est_tx[idx]))
+            assignment[idx] = res
+            loads[res] += self._est_tx[idx, res]
+
+        return assignment
+
+    def _stop(self, iteration, max_iter, end_time, deadline, gap_epsilon,
+              lower_bound, bound_start):
+        '''
+        Return whether the search stops, because it ran `max_iter`
+        iterations or out of time, or because the best makespan meets the
+        deadline or is within `gap_epsilon` of the lower bound. The time is
+        checked every 64 iterations.
+        '''
+
+        if iteration >= max_iter:
+            return True
+        elif deadline is not None and self._best_makespan <= deadline:
+            return True
+        elif gap_epsilon is not None and \
+             bounds.gap(self._best_makespan, lower_bound,
+                        bound_start) <= gap_epsilon:
+            return True
+        elif end_time is not None and not iteration % 64 and \
+             time.time() >= end_time:
+            return True
+
+        return False
+
+    def _anneal(self, tracker, stop):
+        '''
+        Improve an assignment with simulated annealing. The workflows of every
+        resource are kept in a list, along with the position of each workflow
+        in its list, so a workflow of the most loaded resource is drawn in
+        O(1).
+        '''
+
+        rng = self._get_rng()
+        num_wfs, num_res = self._est_tx.shape
+        assignment = tracker.assignment
+        members = [list() for _ in range(num_res)]
+        position = [0] * num_wfs
+        for wf_idx, res_idx in enumerate(assignment.tolist()):
+            position[wf_idx] = len(members[res_idx])
+            members[res_idx].append(wf_idx)
+
+        def _leave(wf_idx, res_idx):
+            # Move the last workflow of the resource to the freed position.
+            last = members[res_idx].pop()
+            if last != wf_idx:
+                members[res_idx][position[wf_idx]] = last
+                position[last] = position[wf_idx]
+
+        def _join(wf_idx, res_idx):
+            position[wf_idx] = len(members[res_idx])
+            members[res_idx].append(wf_idx)
+
+        temperature = self._temperature
+        if temperature is None:
+            temperature = 0.1 * float(
+                self._est_tx[np.arange(num_wfs), assignment].mean())
+        cooling = self._cooling ** (1.0 / num_wfs)
+
+        iteration = 0
+        while not stop(iteration):
+            iteration += 1
+            temperature *= cooling
+            makespan = tracker.makespan
+            src = tracker.most_loaded
+            if not members[src]:
+                # The resource is busy until after the makespan of any plan.
+                break
+            wf_idx = members[src][int(rng.integers(len(members[src])))]
+            if rng.random() < self._swap_rate:
+                other = int(rng.integers(num_wfs))
+                dst = int(assignment[other])
+                if dst == src:
+                    continue
+                new_makespan = tracker.swap_makespan(wf_idx, other)
+            else:
+                other = None
+                dst = int(rng.integers(num_res - 1))
+                dst += dst >= src
+                new_makespan = tracker.move_makespan(wf_idx, dst)
+
+            delta = new_makespan - makespan
+            if delta > 0 and (temperature <= 0 or
+                              rng.random() >= math.exp(-delta / temperature)):
+                continue
+
+            _leave(wf_idx, src)
+            _join(wf_idx, dst)
+            if other is None:
+                tracker.move(wf_idx, dst)
+            else:
+                _leave(other, dst)
+                _join(other, src)
+                tracker.swap(wf_idx, other)
+
+            if tracker.makespan < self._best_makespan:
+                self._best = assignment.copy()
+                self._best_makespan = tracker.makespan
+
+        return iteration
+
+    def _tabu_search(self, tracker, stop):
+        '''
+        Improve an assignment with tabu search. The iteration until which a
+        workflow cannot move back to a resource is kept in a table whose index
+        is <workflow_idx, resource_idx>.
+        '''
+
+        num_res = self._est_tx.shape[1]
+        tenure = self._tabu_tenure
+        if tenure is None:
+            tenure = num_res + 2
+        tabu_until = np.zeros(self._est_tx.shape, dtype=np.int64)
+
+        iteration = 0
+        while not stop(iteration):
+            iteration += 1
+            src = tracker.most_loaded
+            on_src, local, makespans = tracker.move_table(src)
+            if not on_src.shape[0]:
+                break
+
+            # Tabu moves are allowed when they give the best makespan so far.
+            allowed = (tabu_until[on_src] < iteration) | \
+                      (makespans < self._best_makespan)
+            makespans = np.where(allowed, makespans, np.inf)
+            best = makespans.min()
+            if not np.isfinite(best):
+                break
+
+            # Among the best moves, the one that leaves the two changed
+            # resources least loaded is applied.
+            local = np.where(makespans == best, local, np.inf)
+            row, dst = np.unravel_index(int(np.argmin(local)), local.shape)
+            wf_idx = int(on_src[row])
+            tracker.move(wf_idx, int(dst))
+            tabu_until[wf_idx, src] = iteration + tenure
+
+            if tracker.makespan < self._best_makespan:
+                self._best = tracker.assignment.copy()
+                self._best_makespan = tracker.makespan
+
+        return iteration
+
+    def plan(self, campaign=None, resources=None, num_oper=None, start_time=None,
+             **kargs):
+        '''
+        This method implements the local search. It returns a list of tuples
+        Each tuple contains: Workflow ID, Resource ID, Start Time, End Time.
+
+        The plan method takes as input a campaign, resources and num_oper in case
+        any of these has changed. They default to `None`
+
+        *Keyword arguments:*
+            initial_plan: The plan the search starts from, e.g. the plan of
+                          another planner. Workflows that are not in it are
+                          placed where they complete first.
+            max_iter: The maximum number of iterations. Defaults to 100 times
+                      the number of workflows for annealing and to the number
+                      of workflows for tabu search.
+            time_budget: The wall-clock time, in seconds, the planner can
+                         spend. When it runs out, the best plan found so far
+                         is returned.
+            deadline: Stop when the makespan of the best plan is smaller.
+            gap_epsilon: Stop when the makespan of the best plan is at most
+                         this fraction larger than a lower bound of the
+                         optimal makespan, see `bounds.lower_bound`.
+
+        *Returns:*
+            list(tuples)
+        '''
+
+        start = time.time()
+        tmp_cmp = campaign if campaign else self._campaign
+        tmp_res = resources if resources else self._resources
+        tmp_nop = num_oper if num_oper else self._num_oper
+
+        # Reset the plan in case of a recall
+        self._plan = list()
+        if not tmp_cmp:
+            return self._plan
+
+        resource_free = self._get_resource_free(start_time, len(tmp_res))
+        self._est_tx = self._get_est_tx(num_oper=tmp_nop, resources=tmp_res,
+                                        campaign=tmp_cmp)
+
+        assignment = self._initial_assignment(kargs.get('initial_plan', None),
+                                              tmp_cmp, tmp_res, resource_free)
+        tracker = LoadTracker(self._est_tx, assignment,
+                              resource_free=resource_free)
+        self._best = tracker.assignment.copy()
+        self._best_makespan = tracker.makespan
+        initial_makespan = tracker.makespan
+
+        bound_start = float(resource_free.min())
+        max_iter = kargs.get('max_iter', None)
+        if max_iter is None:
+            max_iter = len(tmp_cmp) * (1 if self._method == 'tabu' else 100)
+        end_time = None
+        if kargs.get('time_budget', None) is not None:
+            end_time = start + kargs['time_budget']
+        deadline = kargs.get('deadline', None)
+        gap_epsilon = kargs.get('gap_epsilon', None)
+        # The lower bound is only needed to stop at an optimality gap.
+        lower_bound = None
+        if gap_epsilon is not None:
+            lower_bound = bounds.lower_bound(
+                                tmp_nop, [res['performance'] for res in tmp_res],
+                                resource_free)
+
+        def _stop(iteration):
+            return self._stop(iteration, max_iter, end_time, deadline,
+                              gap_epsilon, lower_bound, bound_start)
+
+        iterations = 0
+        if len(tmp_res) > 1:
+            if self._method == 'tabu':
+                iterations = self._tabu_search(tracker, _stop)
+            else:
+                iterations = self._anneal(tracker, _stop)
+
+            tracker = LoadTracker(self._est_tx, self._best,
+                                  resource_free=resource_free)
+            tracker.hill_climb()
+            self._best = tracker.assignment.copy()
+            self._best_makespan = tracker.makespan
+
+        self._logger.debug('Local search of %d iterations, makespan %f -> %f',
+                           iterations, initial_makespan, self._best_makespan)
+        if lower_bound is not None:
+            self._logger.debug('Gap: %f', bounds.gap(self._best_makespan,
+                                                     lower_bound, bound_start))
+        self._plan = self._build_plan(tmp_cmp, tmp_res, self._best,
+                                      resource_free, self._est_tx)
+        self._logger.info('Derived plan %s', self._plan)
+        return self._plan
+
+    def replan(self, campaign=None, resources=None, num_oper=None, start_time=0):
+        '''
+        The replanning method. The search starts from the last plan, so that
+        the workflows that have not started yet keep their resources unless a
+        better plan is found.
+        '''
+        if campaign and resources and num_oper:
+            self._logger.debug('Replanning')
+            self._plan = self.plan(campaign=campaign, resources=resources,
+                                   num_oper=num_oper, start_time=start_time,
+                                   initial_plan=self._plan)
+        else:
+            self._logger.debug('Nothing to plan for')
+
+        return self._plan
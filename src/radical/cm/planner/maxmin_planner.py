@@ -0,0 +1,42 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import numpy as np
+
+from .minmin_planner import MinMinPlanner
+
+
+class MaxMinPlanner(MinMinPlanner):
+    '''
+    This class implements a campaign planner based on the Max-Min heuristic.
+    In every round, the earliest completion time of each workflow that is not
+    planned yet is found, and the workflow whose earliest completion time is
+    the largest is placed on the resource where it completes first. Large
+    workflows are placed first, so that small ones fill the gaps between them.
+
+    For reference:
+    T. D. Braun et al., "A comparison of eleven static heuristics for mapping
+    a class of independent tasks onto heterogeneous distributed computing
+    systems," Journal of Parallel and Distributed Computing, vol. 61, no. 6,
+    pp. 810-837, 2001.
+
+    Constractor parameters:
+    campaign: A list of workflows
+    resources: A list of resources, whose performance is given in operations per second
+    num_oper: The number of operations each workflow will execute
+
+    The class implements a plan method that return a plan, a list of tuples.
+
+    Each tuple will have the workflow, selected resource, starting time and
+    estimated finish time.
+    '''
+
+    def _select(self, best_ct, second_ct, planned):
+        '''
+        Return the index of the workflow whose earliest completion time is the
+        largest.
+        '''
+
+        return int(np.argmax(np.where(planned, -np.inf, best_ct)))
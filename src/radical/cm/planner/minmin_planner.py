@@ -0,0 +1,126 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import numpy as np
+
+from .base import Planner
+
+
+class MinMinPlanner(Planner):
+    '''
+    This class implements a campaign planner based on the Min-Min heuristic.
+    In every round, the earliest completion time of each workflow that is not
+    planned yet is found, and the workflow whose earliest completion time is
+    the smallest is placed on the resource where it completes first.
+
+    For reference:
+    T. D. Braun et al., "A comparison of eleven static heuristics for mapping
+    a class of independent tasks onto heterogeneous distributed computing
+    systems," Journal of Parallel and Distributed Computing, vol. 61, no. 6,
+    pp. 810-837, 2001.
+
+    The completion time of every workflow on every resource is kept in a table,
+    along with the best and second best resource of every workflow. A placement
+    only delays the resource it is on, so only the workflows for which that
+    resource was one of the two best are looked at again. Every round is a few
+    vectorized reductions over the table.
+
+    Max-Min and Sufferage differ only in the workflow they select every round,
+    see `MaxMinPlanner`, `SufferagePlanner` and `_select`.
+
+    Constractor parameters:
+    campaign: A list of workflows
+    resources: A list of resources, whose performance is given in operations per second
+    num_oper: The number of operations each workflow will execute
+
+    The class implements a plan method that return a plan, a list of tuples.
+
+    Each tuple will have the workflow, selected resource, starting time and
+    estimated finish time.
+    '''
+
+    def _select(self, best_ct, second_ct, planned):
+        '''
+        Return the index of the workflow that is placed next, given the
+        earliest and second earliest completion time of each workflow. The
+        workflows that are already planned are marked in `planned`. Ties are
+        resolved in favor of the workflow with the smallest index.
+        '''
+
+        return int(np.argmin(np.where(planned, np.inf, best_ct)))
+
+    def plan(self, campaign=None, resources=None, num_oper=None, start_time=None,
+             **kargs):
+        '''
+        This method implements the Min-Min algorithm. It returns a list of tuples
+        Each tuple contains: Workflow ID, Resource ID, Start Time, End Time.
+
+        The plan method takes as input a campaign, resources and num_oper in case
+        any of these has changed. They default to `None`
+
+        *Returns:*
+            list(tuples)
+        '''
+
+        tmp_cmp = campaign if campaign else self._campaign
+        tmp_res = resources if resources else self._resources
+        tmp_nop = num_oper if num_oper else self._num_oper
+
+        # Reset the plan in case of a recall
+        self._plan = list()
+
+        # This array tracks when a resource whould be available.
+        resource_free = self._get_resource_free(start_time, len(tmp_res))
+        self._est_tx = self._get_est_tx(num_oper=tmp_nop, resources=tmp_res,
+                                        campaign=tmp_cmp)
+
+        num_wfs = len(tmp_cmp)
+        rows = np.arange(num_wfs)
+        completion = resource_free + self._est_tx
+        best_res, best_ct, second_res, second_ct = \
+            self._two_best(completion, rows)
+        planned = np.zeros(num_wfs, dtype=bool)
+        for _ in range(num_wfs):
+            wf_idx = self._select(best_ct, second_ct, planned)
+            res_idx = int(best_res[wf_idx])
+            tmp_str_time = float(resource_free[res_idx])
+            tmp_end_time = float(best_ct[wf_idx])
+            self._plan.append((tmp_cmp[wf_idx], tmp_res[res_idx],
+                               tmp_str_time, tmp_end_time))
+            planned[wf_idx] = True
+
+            # Only the completion times on the selected resource change, and
+            # they only increase. The best two resources of a workflow change
+            # only if the selected resource was one of them.
+            resource_free[res_idx] = tmp_end_time
+            completion[:, res_idx] = tmp_end_time + self._est_tx[:, res_idx]
+            changed = np.flatnonzero(~planned & ((best_res == res_idx) |
+                                                 (second_res == res_idx)))
+            if changed.shape[0]:
+                (best_res[changed], best_ct[changed], second_res[changed],
+                 second_ct[changed]) = self._two_best(completion, changed)
+
+        self._logger.info('Derived plan %s', self._plan)
+        return self._plan
+
+    def _two_best(self, completion, rows):
+        '''
+        Return the resource with the earliest and the second earliest
+        completion time of some workflows, given by their rows, and these
+        times. With a single resource, the second time is infinite.
+        '''
+
+        times = completion[rows]
+        best_res = times.argmin(axis=1)
+        best_ct = times[np.arange(rows.shape[0]), best_res]
+        if times.shape[1] < 2:
+            return (best_res, best_ct, np.full(rows.shape[0], -1),
+                    np.full(rows.shape[0], np.inf))
+
+        times[np.arange(rows.shape[0]), best_res] = np.inf
+        second_res = times.argmin(axis=1)
+        second_ct = times[np.arange(rows.shape[0]), second_res]
+
+        return best_res, best_ct, second_res, second_ct
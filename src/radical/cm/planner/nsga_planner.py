@@ -0,0 +1,388 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import time
+
+import numpy as np
+
+from . import bounds
+from .base import _get_uid
+from .ga_planner import GAPlanner, _calc_loads
+
+
+# ------------------------------------------------------------------------------
+#
+def _non_dominated_sort(objectives):
+    '''
+    Return the front of each individual, given as a row of objectives that are
+    minimized. Individuals of front 0 are not dominated by any individual, and
+    individuals of front k are only dominated by individuals of earlier fronts.
+    The dominance relation of all pairs is calculated at once, and each front
+    is removed from the domination counts with a single sum.
+    '''
+
+    smaller_equal = (objectives[:, np.newaxis] <=
+                     objectives[np.newaxis]).all(axis=2)
+    smaller = (objectives[:, np.newaxis] < objectives[np.newaxis]).any(axis=2)
+    # dominates[i, j] is True when individual i dominates individual j.
+    dominates = smaller_equal & smaller
+
+    counts = dominates.sum(axis=0)
+    fronts = np.full(objectives.shape[0], -1, dtype=np.int64)
+    remaining = np.ones(objectives.shape[0], dtype=bool)
+    front = 0
+    while remaining.any():
+        current = remaining & (counts == 0)
+        fronts[current] = front
+        counts -= dominates[current].sum(axis=0)
+        remaining &= ~current
+        front += 1
+
+    return fronts
+
+
+# ------------------------------------------------------------------------------
+#
+def _crowding_distance(objectives, fronts):
+    '''
+    Return the crowding distance of each individual within its front, i.e. the
+    sum over the objectives of the normalized distance between its neighbours.
+    The first and last individual of a front in any objective have an infinite
+    distance. All fronts are handled at once, by sorting the individuals by
+    front and objective value.
+    '''
+
+    distance = np.zeros(objectives.shape[0], dtype=np.float64)
+    if objectives.shape[0] == 0:
+        return distance
+
+    for values in objectives.T:
+        order = np.lexsort((values, fronts))
+        sorted_fronts = fronts[order]
+        sorted_values = values[order]
+        first = np.r_[True, sorted_fronts[1:] != sorted_fronts[:-1]]
+        last = np.r_[sorted_fronts[1:] != sorted_fronts[:-1], True]
+
+        # Within a front, values are sorted, so its range is between its first
+        # and last individual.
+        front_idx = np.cumsum(first) - 1
+        span = (sorted_values[last] - sorted_values[first])[front_idx]
+
+        gaps = np.zeros(objectives.shape[0], dtype=np.float64)
+        inner = ~(first | last)
+        gaps[1:-1] = sorted_values[2:] - sorted_values[:-2]
+        np.divide(gaps, span, out=gaps, where=inner & (span > 0))
+        gaps[~inner] = 0
+        gaps[first | last] = np.inf
+        distance[order] += gaps
+
+    return distance
+
+
+class NSGAPlanner(GAPlanner):
+    '''
+    This class implemements a multi-objective campaign planner based on the
+    Non-dominated Sorting Genetic Algorithm II (NSGA-II).
+
+    For reference:
+    K. Deb, A. Pratap, S. Agarwal and T. Meyarivan, "A fast and elitist
+    multiobjective genetic algorithm: NSGA-II," IEEE Transactions on
+    Evolutionary Computation, vol. 6, no. 2, pp. 182-197, April 2002.
+
+    The planner minimizes three objectives: the makespan, the resource-seconds
+    the workflows consume, and the load imbalance, i.e. the standard deviation
+    of the time the resources become free. The resource-seconds of a workflow
+    are its execution time times the `cores` of its resource, which default to
+    1, so that they reflect an allocation charged in core-hours.
+
+    Instead of a single best individual, evolution keeps the Pareto front, the
+    plans that no other plan improves in all objectives. The front is returned
+    by `pareto_front`, and `plan` selects a plan from it.
+
+    Constractor parameters:
+    campaign: A list of workflows
+    resources: A list of resources, whose performance is given in operations per second
+    num_oper: The number of operations each workflow will execute
+    population_size: The size of the population
+    random_init: The fraction of the workflows that are assigned at random in
+                 the initial population. The rest are assigned greedily.
+    crossover: The crossover operator, see `GAPlanner`. Defaults to `uniform`.
+    tournament_size: The number of individuals that compete in a tournament.
+
+    Individuals, crossover and mutation are the ones of GAPlanner. Parents are
+    selected with the crowded tournament, and the children and the population
+    compete for the next generation by front and crowding distance.
+
+    The class implements a plan method that return a plan, a list of tuples.
+
+    Each tuple will have the workflow, selected resource, starting time and
+    estimated finish time.
+    '''
+    # The names of the objectives, in the order of the objectives' columns.
+    objective_names = ('makespan', 'resource_seconds', 'imbalance')
+
+    def __init__(self, campaign, resources, num_oper, population_size=20,
+                 random_init=0.5, sid=None, crossover='uniform',
+                 tournament_size=2):
+
+        super(NSGAPlanner, self).__init__(campaign=campaign,
+                                          resources=resources,
+                                          num_oper=num_oper,
+                                          population_size=population_size,
+                                          random_init=random_init, sid=sid,
+                                          crossover=crossover,
+                                          selection='tournament',
+                                          tournament_size=tournament_size)
+
+        # The objectives, front and crowding distance of each individual of
+        # the population, see `_sort_population`, and the cores of each
+        # resource.
+        self._objectives = None
+        self._fronts = None
+        self._crowding = None
+        self._cores = None
+
+    def _calc_objectives(self, assignments):
+        '''
+        Return the makespan, resource-seconds and load imbalance of each
+        individual, given as rows of resource indices, as a row per individual.
+        '''
+
+        est_tx = np.asarray(self._est_txs, dtype=np.float64)
+        loads = _calc_loads(assignments, est_tx,
+                            len(self._planned_resources()))
+        free = loads + np.asarray(self._resource_free, dtype=np.float64)
+
+        return np.column_stack([free.max(axis=1), loads @ self._cores,
+                                free.std(axis=1)])
+
+    def _sort_population(self):
+        '''
+        Calculate the objectives, the front and the crowding distance of each
+        individual of the population.
+        '''
+
+        self._objectives = self._calc_objectives(self._population)
+        self._fronts = _non_dominated_sort(self._objectives)
+        self._crowding = _crowding_distance(self._objectives, self._fronts)
+
+    def _selection(self, num_parents=None):
+        '''
+        This method implements the crowded tournament. Of `tournament_size`
+        random individuals, the one in the earliest front wins, and on ties the
+        one with the largest crowding distance, i.e. in the least crowded part
+        of the front.
+        '''
+
+        if num_parents is None:
+            num_parents = self._population_size
+
+        contestants = self._get_rng().integers(
+                            0, self._population.shape[0],
+                            size=(num_parents, self._tournament_size))
+        winners = contestants[:, 0]
+        for other in contestants[:, 1:].T:
+            better = (self._fronts[other] < self._fronts[winners]) | \
+                     ((self._fronts[other] == self._fronts[winners]) &
+                      (self._crowding[other] > self._crowding[winners]))
+            winners = np.where(better, other, winners)
+
+        return self._population[winners]
+
+    def _evolve(self, generations, early_stop=False):
+        '''
+        Evolve the population for up to `generations` generations, or until
+        the time budget runs out or the smallest makespan is within
+        `gap_epsilon` of the lower bound. Every generation, the children and the
+        population are sorted together, and the next population is filled by
+        front, and within the last front that fits partially by crowding
+        distance. The individual with the smallest makespan is kept in
+        `self._best`, for `best_so_far`.
+
+        Returns `True` when evolution stopped before the last generation.
+        '''
+
+        self._sort_population()
+        num_parents = self._population_size + self._population_size % 2
+        for gen_id in range(generations):
+            self._logger.debug('Generation: %d', gen_id)
+            best = int(np.argmin(self._objectives[:, 0]))
+            self._update_best(self._population[best],
+                              self._objectives[best, 0])
+            if self._deadline is not None and \
+               self._best_makespan < self._deadline:
+                return True
+            elif self._end_time is not None and time.time() >= self._end_time:
+                self._logger.debug('Time budget is over')
+                return True
+            elif self._gap_reached():
+                return True
+
+            children = self._mutate(self._recombine(
+                                        self._selection(num_parents)))
+            self._population = np.vstack([self._population, children])
+            self._sort_population()
+            survivors = np.lexsort((-self._crowding, self._fronts))
+            survivors = survivors[:self._population_size]
+            self._population = self._population[survivors]
+            self._objectives = self._objectives[survivors]
+            # Whole fronts survive, except maybe the last one, so the front of
+            # the survivors is the same. Their crowding distance is calculated
+            # again, since their neighbours may not have survived.
+            self._fronts = self._fronts[survivors]
+            self._crowding = _crowding_distance(self._objectives, self._fronts)
+
+        best = int(np.argmin(self._objectives[:, 0]))
+        self._update_best(self._population[best], self._objectives[best, 0])
+
+        return False
+
+    def pareto_front(self):
+        '''
+        Return the Pareto front of the last call of `plan`, sorted by makespan.
+        Individuals with the same assignment appear once.
+
+        *Returns:*
+            list(dict): The objectives of each plan of the front, by name, and
+                        the plan, with the key `plan`.
+        '''
+
+        if self._fronts is None:
+            return list()
+
+        front = np.flatnonzero(self._fronts == 0)
+        _, unique = np.unique(self._population[front], axis=0,
+                              return_index=True)
+        front = front[np.sort(unique)]
+        front = front[np.lexsort(self._objectives[front].T[::-1])]
+
+        pareto = list()
+        for idx in front.tolist():
+            entry = dict(zip(self.objective_names,
+                             self._objectives[idx].tolist()))
+            entry['plan'] = self._individual_plan(self._population[idx])
+            pareto.append(entry)
+
+        return pareto
+
+    def _select(self, makespan_slack=0, weights=None):
+        '''
+        Return the index of the individual of the front that the plan is made
+        of. With weights, it is the one with the smallest weighted sum of its
+        objectives, each scaled to [0, 1] over the front. Otherwise, it is the
+        one with the smallest resource-seconds, whose makespan is at most
+        `makespan_slack` times larger than the smallest makespan of the front.
+        '''
+
+        front = np.flatnonzero(self._fronts == 0)
+        objectives = self._objectives[front]
+        if weights is not None:
+            low = objectives.min(axis=0)
+            span = objectives.max(axis=0) - low
+            scaled = np.zeros_like(objectives)
+            np.divide(objectives - low, span, out=scaled, where=span > 0)
+            return int(front[np.argmin(scaled @ np.asarray(weights,
+                                                           dtype=np.float64))])
+
+        limit = objectives[:, 0].min() * (1 + makespan_slack)
+        eligible = np.flatnonzero(objectives[:, 0] <= limit)
+        order = np.lexsort((objectives[eligible, 0],
+                            objectives[eligible, 1]))
+        return int(front[eligible[order[0]]])
+
+    def plan(self, campaign=None, resources=None, num_oper=None, start_time=None,
+             **kargs):
+        '''
+        This method implements the NSGA-II algorithm. It returns a list of tuples
+        Each tuple contains: Workflow ID, Resource ID, Start Time, End Time.
+
+        The plan method takes as input a campaign, resources and num_oper in case
+        any of these has changed. They default to `None`
+
+        *Keyword arguments:*
+            max_gen: The number of generations. Defaults to 100.
+            time_budget: The wall-clock time, in seconds, the planner can
+                         spend.
+            deadline: Stop when the smallest makespan is smaller.
+            gap_epsilon: Stop when the smallest makespan is at most this
+                         fraction larger than a lower bound of the optimal
+                         makespan, see `bounds.lower_bound`.
+            makespan_slack: The plan with the smallest resource-seconds is
+                            selected among the plans of the front whose
+                            makespan is at most this fraction larger than the
+                            smallest one. Defaults to 0, i.e. the plan with the
+                            smallest makespan.
+            weights: The weights of the objectives, in the order of
+                     `objective_names`. When given, the plan of the front with
+                     the smallest weighted sum of its scaled objectives is
+                     selected instead.
+            warm_start: A previous plan, or `True` for the population of the
+                        last call of `plan`, see `GAPlanner.plan`.
+
+        The whole front is available afterwards from `pareto_front`.
+
+        *Returns:*
+            list(tuples)
+        '''
+
+        start = time.time()
+        self._deadline = kargs.get('deadline', self._deadline)
+        self._max_gen = kargs.get('max_gen', self._max_gen)
+        time_budget = kargs.get('time_budget', None)
+        self._end_time = None
+        if time_budget is not None:
+            self._end_time = start + time_budget
+        self._gap_epsilon = kargs.get('gap_epsilon', self._gap_epsilon)
+
+        tmp_cmp = campaign if campaign else self._campaign
+        tmp_res = resources if resources else self._resources
+        tmp_nop = num_oper if num_oper else [wf['num_oper'] for wf in tmp_cmp]
+        # The table of the last call may be of other workflows, e.g. after a
+        # replan. The cache of the table makes this cheap when nothing changed.
+        est_txs = self._get_est_tx(num_oper=tmp_nop, resources=tmp_res,
+                                   campaign=tmp_cmp)
+
+        seeds = None
+        warm_start = kargs.get('warm_start', None)
+        if warm_start:
+            seeds = self._get_seeds(warm_start, tmp_cmp, tmp_res, start_time,
+                                    est_txs)
+
+        # The best individual of the last call is forgotten before the state
+        # it refers to is replaced, so that `best_so_far` never mixes them.
+        self._reset_best()
+        with self._best_lock:
+            self._est_txs = est_txs
+            self._set_workflows(tmp_cmp)
+            self._res_ids = [_get_uid(resource) for resource in tmp_res]
+            self._planned_res = list(tmp_res)
+            self._resource_free = self._get_resource_free(
+                                      start_time, len(tmp_res)).tolist()
+        self._cores = np.array([resource.get('cores', 1)
+                                for resource in tmp_res], dtype=np.float64)
+        # The lower bound is only needed to stop at an optimality gap.
+        self._lower_bound = None
+        if self._gap_epsilon is not None:
+            self._lower_bound = bounds.lower_bound(
+                                    tmp_nop,
+                                    [res['performance'] for res in tmp_res],
+                                    self._resource_free)
+        self._bound_start = min(self._resource_free)
+        self._initialize_population(tmp_cmp, tmp_res, self._random_init,
+                                    start_time=start_time)
+        self._seed_population(seeds)
+        self._evolve(self._max_gen)
+
+        # A warm start from the population uses the fitness of the
+        # individuals, which is the inverse of their front.
+        self._fitness = 1 / (1 + self._fronts)
+
+        selected = self._select(kargs.get('makespan_slack', 0),
+                                kargs.get('weights', None))
+        self._get_plan(self._population[selected])
+        self._logger.debug('Selected objectives: %s',
+                           self._objectives[selected])
+        self._logger.info('Derived plan %s', self._plan)
+        return self._plan
@@ -3,9 +3,8 @@ Author: Ioannis Paraskevakos
 License: MIT
 Copyright: 2018-2019
 """
+import numpy as np
 
-import os
-from random import randint, seed
 from .base import Planner
 
 
@@ -15,6 +14,13 @@ class RandomPlanner(Planner):
     resources for workflows. The random selection is happening based on a uniform
     distribution between resources. 
 
+    Several random plans can be drawn at once, and the one with the smallest
+    makespan is returned. With the power of d choices, each workflow is
+    assigned to the resource, out of d random ones, on which it finishes first.
+
+    The random choices are drawn from the planner's own random number
+    generator, see `Planner._get_rng`.
+
     Constractor parameters:
     campaign: A list of workflows
     resources: A list of resources, whose performance is given in operations per second
@@ -25,18 +31,6 @@ class RandomPlanner(Planner):
     Each tuple will have the workflow, selected resource, starting time and
     estimated finish time.
     '''
-    def __init__(self, campaign, resources, num_oper, sid=None):
-
-        super(RandomPlanner, self).__init__(campaign=campaign,
-                                          resources=resources,
-                                          num_oper=num_oper, sid=sid)
-
-        res_perf = list()
-        for resource in self._resources:
-            res_perf.append(resource['performance'])
-        self._est_tx = self._calc_est_tx(cmp_oper=self._num_oper,
-                                         resources=res_perf)
-
     def plan(self, campaign=None, resources=None, num_oper=None, start_time=None,
              **kargs):
         '''
@@ -46,44 +40,102 @@ class RandomPlanner(Planner):
         The plan method takes as input a campaign, resources and num_oper in case
         any of these has changed. They default to `None`
 
+        *Keyword arguments:*
+            samples: The number of random plans that are drawn. The plan with
+                     the smallest makespan is returned. Defaults to 1.
+            choices: When set, each workflow is assigned to the resource on
+                     which it finishes first out of `choices` resources
+                     selected at random. Defaults to `None`, i.e. the resource
+                     is selected uniformly at random.
+
         *Returns:*
             list(tuples)
         '''
-        if os.environ.get('PLANNER_TEST',"FALSE").lower() == 'true':
-            self._logger.debug('Setting seed')
-            seed(0)
 
         # FIXME: add replanning support
         tmp_cmp = campaign if campaign else self._campaign
         tmp_res = resources if resources else self._resources
         tmp_nop = num_oper if num_oper else self._num_oper
-        res_perf = list()
-        for resource in self._resources:
-            res_perf.append(resource['performance'])
-        self._est_tx = self._calc_est_tx(cmp_oper=tmp_nop,
-                                         resources=res_perf)
+        self._est_tx = self._get_est_tx(num_oper=tmp_nop, resources=tmp_res,
+                                        campaign=tmp_cmp)
         # Reset the plan in case of a recall
         self._plan = list()
 
-        # This list tracks when a resource whould be available.
-        if isinstance(start_time, list):
-            resource_free = start_time
-        elif isinstance(start_time, float) or isinstance(start_time, int):
-            resource_free = [start_time] * len(tmp_res)
+        # This array tracks when a resource whould be available.
+        resource_free = self._get_resource_free(start_time, len(tmp_res))
+
+        samples = kargs.get('samples', 1)
+        choices = kargs.get('choices', None)
+        if choices:
+            assignments, makespans = self._sample_d_choices(resource_free,
+                                                            samples, choices)
         else:
-            resource_free = [0] * len(tmp_res)
+            assignments, makespans = self._sample_uniform(resource_free,
+                                                          samples)
 
-        for idx in range(len(tmp_cmp)):
-            wf_est_tx = self._est_tx[idx]
-            resource = randint(0,len(self._resources) - 1)
+        best = int(np.argmin(makespans))
+        self._logger.debug('Selected sample %d with makespan %f', best,
+                           makespans[best])
+
+        resource_free = resource_free.tolist()
+        wf_est_tx = self._est_tx[np.arange(len(tmp_cmp)), assignments[best]]
+        for idx, (resource, est_tx) in enumerate(zip(assignments[best].tolist(),
+                                                     wf_est_tx.tolist())):
             tmp_str_time = resource_free[resource]
-            tmp_end_time = tmp_str_time + wf_est_tx[resource]
-            self._plan.append((tmp_cmp[idx], self._resources[resource],
+            tmp_end_time = tmp_str_time + est_tx
+            self._plan.append((tmp_cmp[idx], tmp_res[resource],
                                tmp_str_time, tmp_end_time))
             resource_free[resource] = tmp_end_time
 
         return self._plan
 
+    def _sample_uniform(self, resource_free, samples):
+        '''
+        Draw `samples` assignments of workflows to resources uniformly at random
+        in a single call. Returns the assignments, as an array with a row of
+        resource indices per sample, and the makespan of each sample.
+
+        The makespan of a sample is the largest time a resource becomes free,
+        i.e. the sum of the execution times of the workflows assigned to it.
+        The loads of all samples are summed with a single bincount.
+        '''
+
+        num_wfs, num_res = self._est_tx.shape
+        assignments = self._get_rng().integers(0, num_res,
+                                               size=(samples, num_wfs))
+        wf_est_tx = self._est_tx[np.arange(num_wfs), assignments]
+        bins = assignments + (np.arange(samples) * num_res)[:, np.newaxis]
+        loads = np.bincount(bins.ravel(), weights=wf_est_tx.ravel(),
+                            minlength=samples * num_res)
+        loads = loads.reshape(samples, num_res) + resource_free
+
+        return assignments, loads.max(axis=1)
+
+    def _sample_d_choices(self, resource_free, samples, choices):
+        '''
+        Draw `samples` assignments with the power of d choices. All the random
+        choices are drawn in a single call. Workflows are assigned in campaign
+        order, and for all samples at once, to the chosen resource on which
+        they finish first.
+        '''
+
+        num_wfs, num_res = self._est_tx.shape
+        candidates = self._get_rng().integers(0, num_res,
+                                              size=(num_wfs, samples, choices))
+        free = np.tile(resource_free, (samples, 1))
+        sample_idx = np.arange(samples)
+        assignments = np.empty((samples, num_wfs), dtype=np.int64)
+        for idx in range(num_wfs):
+            wf_candidates = candidates[idx]
+            end_times = free[sample_idx[:, np.newaxis], wf_candidates] + \
+                self._est_tx[idx, wf_candidates]
+            best = end_times.argmin(axis=1)
+            selected = wf_candidates[sample_idx, best]
+            free[sample_idx, selected] = end_times[sample_idx, best]
+            assignments[:, idx] = selected
+
+        return assignments, free.max(axis=1)
+
     def replan(self, campaign=None, resources=None, num_oper=None, start_time=0):
         '''
         The planning method
@@ -0,0 +1,123 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import heapq
+
+import numpy as np
+
+
+class ResourceQueue(object):
+    '''
+    This class tracks when a set of uniformly related resources become
+    available, and selects the resource on which a workflow finishes first.
+
+    Uniformly related resources differ only in their performance, so the
+    execution time of a workflow is the same on all resources with the same
+    performance. Resources are grouped in speed classes. Each class keeps a
+    heap of the distinct times its resources become free, and for each time a
+    heap of the indices of the resources that become free then. The resource of
+    a class on which a workflow finishes first is at the top of the heaps, so a
+    placement compares only the tops of the classes and costs O(c + log m),
+    where c is the number of distinct performance values and m the number of
+    resources.
+
+    Ties are resolved in favor of the resource with the smallest index, as a
+    linear scan over all resources would do.
+
+    Constractor parameters:
+    performance: The performance of each resource
+    resource_free: The time each resource becomes available
+    '''
+
+    def __init__(self, performance, resource_free):
+
+        performance = np.asarray(performance, dtype=np.float64)
+        speeds, res_class = np.unique(performance, return_inverse=True)
+
+        # The performance of each class, in increasing order.
+        self._speeds = speeds
+        self._frees = [list() for _ in range(speeds.shape[0])]
+        self._members = [dict() for _ in range(speeds.shape[0])]
+        for res_idx, (cls, free) in enumerate(zip(res_class.tolist(),
+                                                  resource_free)):
+            members = self._members[cls]
+            free = float(free)
+            if free in members:
+                members[free].append(res_idx)
+            else:
+                members[free] = [res_idx]
+                self._frees[cls].append(free)
+
+        # Indices are added in increasing order, so every list is a heap.
+        for frees in self._frees:
+            heapq.heapify(frees)
+
+        self._heads = np.empty(speeds.shape[0], dtype=np.float64)
+        for cls in range(speeds.shape[0]):
+            self._heads[cls] = self._frees[cls][0]
+
+    @property
+    def performance(self):
+        '''
+        The distinct performance values of the resources, in increasing order.
+        The execution time of a workflow on each class should be given in this
+        order.
+        '''
+
+        return self._speeds
+
+    def place(self, wf_est_tx):
+        '''
+        Place a workflow on the resource on which it finishes first, and return
+        the index of the resource, and the start and end time of the workflow.
+        `wf_est_tx` is the execution time of the workflow on each class of
+        resources.
+        '''
+
+        end_times = self._heads + wf_est_tx
+        end_time = end_times.min()
+        tied_classes = np.flatnonzero(end_times == end_time).tolist()
+
+        # Resources that become free slightly later may still finish at the
+        # same time, due to rounding. They are at the top of the heap of their
+        # class, and among all of them the one with the smallest index is
+        # selected.
+        candidates = list()
+        for cls in tied_classes:
+            frees = self._frees[cls]
+            members = self._members[cls]
+            est_tx = float(wf_est_tx[cls])
+            tied = [heapq.heappop(frees)]
+            while frees and frees[0] + est_tx == end_time:
+                free = heapq.heappop(frees)
+                if free in members and free != tied[-1]:
+                    tied.append(free)
+
+            for free in tied:
+                heapq.heappush(frees, free)
+                candidates.append((members[free][0], cls, free))
+
+        res_idx, cls, tmp_str_time = min(candidates)
+        members = self._members[cls]
+        heapq.heappop(members[tmp_str_time])
+        if not members[tmp_str_time]:
+            # The free time stays in the heap and is dropped when it reaches
+            # the top.
+            del members[tmp_str_time]
+
+        tmp_end_time = float(end_time)
+        if tmp_end_time in members:
+            heapq.heappush(members[tmp_end_time], res_idx)
+        else:
+            members[tmp_end_time] = [res_idx]
+            heapq.heappush(self._frees[cls], tmp_end_time)
+
+        for cls in tied_classes:
+            frees = self._frees[cls]
+            while frees[0] not in self._members[cls]:
+                heapq.heappop(frees)
+            self._heads[cls] = frees[0]
+
+        return res_idx, tmp_str_time, tmp_end_time
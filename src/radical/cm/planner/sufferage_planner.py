@@ -0,0 +1,45 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import numpy as np
+
+from .minmin_planner import MinMinPlanner
+
+
+class SufferagePlanner(MinMinPlanner):
+    '''
+    This class implements a campaign planner based on the Sufferage heuristic.
+    The sufferage of a workflow is how much later it would complete on its
+    second best resource than on its best. In every round, the workflow that
+    would suffer the most if it did not get its best resource is placed on it.
+
+    For reference:
+    M. Maheswaran, S. Ali, H. J. Siegel, D. Hensgen and R. F. Freund,
+    "Dynamic mapping of a class of independent tasks onto heterogeneous
+    computing systems," Journal of Parallel and Distributed Computing, vol. 59,
+    no. 2, pp. 107-131, 1999.
+
+    Workflows are placed one per round, i.e. a workflow that loses its best
+    resource to one with a larger sufferage is reconsidered in the next round
+    with its new completion times.
+
+    Constractor parameters:
+    campaign: A list of workflows
+    resources: A list of resources, whose performance is given in operations per second
+    num_oper: The number of operations each workflow will execute
+
+    The class implements a plan method that return a plan, a list of tuples.
+
+    Each tuple will have the workflow, selected resource, starting time and
+    estimated finish time.
+    '''
+
+    def _select(self, best_ct, second_ct, planned):
+        '''
+        Return the index of the workflow with the largest sufferage. With a
+        single resource, workflows are placed in campaign order.
+        '''
+
+        return int(np.argmax(np.where(planned, -np.inf, second_ct - best_ct)))
@@ -0,0 +1,70 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+from bisect import bisect_right
+
+
+class Timeline(object):
+    '''
+    This class keeps the idle gaps of a resource as two sorted lists, one with
+    the start and one with the end of each gap. Gaps do not overlap, so both
+    lists are sorted the same way, and the last gap never ends.
+
+    The gap in which a workflow can start is found with a binary search, and
+    reserving time for a workflow splits the gap it is placed in.
+
+    Constractor parameters:
+    free_time: The time the resource becomes available
+    '''
+
+    def __init__(self, free_time=0.0):
+
+        self._starts = [free_time]
+        self._ends = [float('inf')]
+
+    @property
+    def gaps(self):
+        '''
+        The idle gaps of the resource as a list of <start, end> tuples.
+        '''
+
+        return list(zip(self._starts, self._ends))
+
+    def earliest_start(self, ready, duration):
+        '''
+        Return the earliest time after `ready` that the resource can execute a
+        workflow for `duration` time units.
+        '''
+
+        # The first gap that ends after the workflow is ready. The last gap
+        # never ends, so the search always succeeds.
+        idx = bisect_right(self._ends, ready)
+        while True:
+            start = max(self._starts[idx], ready)
+            if start + duration <= self._ends[idx]:
+                return start
+            idx += 1
+
+    def reserve(self, start, end):
+        '''
+        Reserve the resource from `start` to `end`. The interval should be in
+        a gap, as returned by `earliest_start`.
+        '''
+
+        idx = bisect_right(self._starts, start) - 1
+        gap_start = self._starts[idx]
+        gap_end = self._ends[idx]
+
+        new_starts = list()
+        new_ends = list()
+        if gap_start < start:
+            new_starts.append(gap_start)
+            new_ends.append(start)
+        if end < gap_end:
+            new_starts.append(end)
+            new_ends.append(gap_end)
+
+        self._starts[idx:idx + 1] = new_starts
+        self._ends[idx:idx + 1] = new_ends
@@ -0,0 +1,101 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+"""
+import heapq
+
+
+# ------------------------------------------------------------------------------
+#
+def get_dependencies(workflow):
+    '''
+    Returns the dependencies of a workflow as a dictionary, whose keys are the
+    IDs of the workflows that should finish before the workflow starts, and
+    values the communication cost, in units of time, when the two workflows
+    execute on different resources.
+
+    Dependencies are declared with the `dependencies` key of a workflow, either
+    as a list of workflow IDs, with no communication cost, or as a dictionary
+    from workflow ID to communication cost. Workflows that are not
+    dictionaries have no dependencies.
+    '''
+
+    if not isinstance(workflow, dict):
+        return dict()
+
+    deps = workflow.get('dependencies')
+    if not deps:
+        return dict()
+    elif isinstance(deps, dict):
+        return deps
+    else:
+        return {dep_id: 0 for dep_id in deps}
+
+
+# ------------------------------------------------------------------------------
+#
+def get_predecessors(campaign):
+    '''
+    Returns for each workflow of the campaign a dictionary from the index of
+    each of its predecessors in the campaign to the communication cost.
+    Dependencies to workflows that are not part of the campaign are ignored,
+    since those workflows have already been executed or are executing.
+    '''
+
+    wf_idx = dict()
+    for idx, workflow in enumerate(campaign):
+        if isinstance(workflow, dict):
+            wf_idx[workflow['id']] = idx
+
+    preds = list()
+    for workflow in campaign:
+        wf_preds = dict()
+        for dep_id, cost in get_dependencies(workflow).items():
+            if dep_id in wf_idx:
+                wf_preds[wf_idx[dep_id]] = cost
+        preds.append(wf_preds)
+
+    return preds
+
+
+# ------------------------------------------------------------------------------
+#
+def topological_order(preds):
+    '''
+    Returns the indices of the workflows in an order where each workflow comes
+    after its predecessors. Among the workflows that are ready, the one with
+    the smallest index comes first, so without dependencies the order is the
+    campaign order.
+
+    *Parameters:*
+
+    *preds:* For each workflow the indices of its predecessors, as returned by
+             `get_predecessors`.
+
+    *Raises:*
+        ValueError: The dependencies have a cycle.
+    '''
+
+    succs = [list() for _ in preds]
+    in_degree = list()
+    for idx, wf_preds in enumerate(preds):
+        in_degree.append(len(wf_preds))
+        for pred in wf_preds:
+            succs[pred].append(idx)
+
+    ready = [idx for idx, degree in enumerate(in_degree) if degree == 0]
+    heapq.heapify(ready)
+    order = list()
+    while ready:
+        idx = heapq.heappop(ready)
+        order.append(idx)
+        for succ in succs[idx]:
+            in_degree[succ] -= 1
+            if in_degree[succ] == 0:
+                heapq.heappush(ready, succ)
+
+    if len(order) != len(preds):
+        raise ValueError('Workflow dependencies have a cycle')
+
+    return order
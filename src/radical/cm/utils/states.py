@@ -15,6 +15,7 @@ DONE = 3  # Campaign has finished successfully
 FAILED = 4  # Campaign execution has failed
 CANCELED = 5  # Campaign got canceled by the user.
 CFINAL = [DONE, FAILED, CANCELED]  # Final states for a campaign.
+DEFERRED = 6  # Workflow was not admitted, because the objective is not met.
 
 
 state_dict = {0: 'NEW',
@@ -22,6 +23,7 @@ state_dict = {0: 'NEW',
               2: 'EXECUTING',
               3: 'DONE',
               4: 'FAILED',
-              5: 'CANCELED'
+              5: 'CANCELED',
+              6: 'DEFERRED'
              }
 # ------------------------------------------------------------------------------
@@ -7,7 +7,13 @@ Unit test for heft_planner scheduler
 # pylint: disable=protected-access, unused-argument
 
 
+import threading as mt
+
+import radical.utils as ru
+from simpy import Environment
+
 from radical.cm.bookkeeper import Bookkeeper
+from radical.cm.planner import DeadlinePlanner
 from radical.cm.utils import states as st
 
 try:
@@ -124,3 +130,306 @@ def test_get_workflows_state(mocked_init):
     bookkeeper._campaign = {'campaign': [{'id': 1},
                                          {'id': 2}]}
     assert bookkeeper.get_workflows_state() == {1: st.NEW, 2: st.EXECUTING}
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(Bookkeeper, '__init__', return_value=None)
+def test_dependencies_done(mocked_init):
+
+    bookkeeper = Bookkeeper(campaign=None, resources=None)
+    bookkeeper._exec_state_lock = mt.RLock()
+    bookkeeper._workflows_state = {1: st.DONE,
+                                   2: st.EXECUTING}
+
+    assert bookkeeper._dependencies_done({'id': 3})
+    assert bookkeeper._dependencies_done({'id': 3, 'dependencies': [1, 5]})
+    assert not bookkeeper._dependencies_done({'id': 3,
+                                              'dependencies': {1: 0, 2: 4}})
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(Bookkeeper, '__init__', return_value=None)
+@mock.patch.object(DeadlinePlanner, '__init__', return_value=None)
+def test_admit(mocked_init, mocked_planner_init):
+
+    bookkeeper = Bookkeeper(campaign=None, resources=None)
+    bookkeeper._campaign = {'campaign': [{'id': 1, 'num_oper': 8},
+                                         {'id': 2, 'num_oper': 10},
+                                         {'id': 3, 'num_oper': 2,
+                                          'dependencies': [2]},
+                                         {'id': 4, 'num_oper': 4,
+                                          'weight': 100}],
+                            'state': st.EXECUTING}
+    bookkeeper._resources = [{'id': 1, 'performance': 2},
+                             {'id': 2, 'performance': 1}]
+    bookkeeper._objective = 5
+    bookkeeper._planner = DeadlinePlanner(None, None, None)
+    bookkeeper._planner._logger = ru.Logger('dummy')
+    bookkeeper._planner._est_tx_cache = None
+    bookkeeper._planner._deadline = None
+    bookkeeper._planner._rtol = 1e-3
+    bookkeeper._exec_state_lock = mt.RLock()
+    bookkeeper._logger = ru.Logger('dummy')
+    bookkeeper._workflows_state = {1: st.NEW, 2: st.NEW, 3: st.NEW, 4: st.NEW}
+
+    # 24 operations do not fit in 15. W4 weighs the most per operation, and
+    # W1 and W3 are admitted with it, but W3 depends on W2, which is not.
+    with mock.patch.object(DeadlinePlanner, 'admit',
+                           wraps=bookkeeper._planner.admit) as mocked_admit:
+        bookkeeper._admit()
+        assert mocked_admit.call_args[1]['weights'] == [8, 10, 2, 100]
+    assert sorted(place[0]['id'] for place in bookkeeper._planner._plan) == \
+        [1, 3, 4]
+
+    assert bookkeeper._workflows_state[4] == st.NEW
+    assert bookkeeper._workflows_state[2] == st.DEFERRED
+    assert bookkeeper._workflows_state[3] == st.DEFERRED
+    admitted = [place[0]['id'] for place in bookkeeper._plan]
+    assert sorted(admitted) == [1, 4]
+    assert bookkeeper._verify_objective()
+
+
+# ------------------------------------------------------------------------------
+#
+def _planner_init(planner, **kargs):
+
+    planner._logger = ru.Logger('dummy')
+
+    planner._est_tx_cache = None
+    planner._deadline = kargs['deadline']
+    planner._rtol = 1e-3
+
+
+@mock.patch.object(Bookkeeper, '__init__', return_value=None)
+@mock.patch.object(DeadlinePlanner, '__init__', autospec=True,
+                   side_effect=_planner_init)
+def test_admit_replan(mocked_planner_init, mocked_init):
+
+    bookkeeper = Bookkeeper(campaign=None, resources=None)
+    campaign = [{'id': idx, 'num_oper': 10} for idx in range(1, 6)]
+    res1 = {'id': 1, 'performance': 1}
+    res2 = {'id': 2, 'performance': 1}
+    bookkeeper._campaign = {'campaign': campaign, 'state': st.EXECUTING}
+    bookkeeper._resources = [res1, res2]
+    bookkeeper._objective = 20
+    bookkeeper._admission = True
+    bookkeeper._planner = mock.Mock()
+    bookkeeper._sid = 'rcm.session.0000'
+    bookkeeper._uid = 'bookkeeper.0000'
+    bookkeeper._exec_state_lock = mt.RLock()
+    bookkeeper._monitor_lock = mt.RLock()
+    bookkeeper._logger = ru.Logger('dummy')
+    bookkeeper._prof = mock.Mock()
+    bookkeeper._workflows_state = {idx: st.NEW for idx in range(1, 6)}
+
+    # Four workflows fit in the objective, and the deadline planner that
+    # admitted them plans the campaign from now on.
+    bookkeeper._admit()
+    planner = bookkeeper._planner
+    assert isinstance(planner, DeadlinePlanner)
+    assert mocked_planner_init.call_args[1]['deadline'] == 20
+    deferred = [idx for idx, state in bookkeeper._workflows_state.items()
+                if state == st.DEFERRED]
+    assert len(deferred) == 1
+    assert bookkeeper._verify_objective()
+
+    # The first workflow on the first resource ends at 15 instead of 10, and
+    # the one on the second resource is still executing. The two workflows
+    # that have not started no longer fit, so one more is deferred.
+    late = [place[0] for place in bookkeeper._plan
+            if place[1] == res1 and place[2] == 0][0]
+    running = [place[0] for place in bookkeeper._plan
+               if place[1] == res2 and place[2] == 0][0]
+    bookkeeper._workflows_state[late['id']] = st.DONE
+    bookkeeper._workflows_state[running['id']] = st.EXECUTING
+    bookkeeper._workflows_to_monitor = [late]
+    bookkeeper._unavail_resources = [res1]
+    bookkeeper._est_end_times = {1: 10, 2: 10}
+    bookkeeper._env = mock.Mock(now=15)
+    bookkeeper._waiting = set()
+    bookkeeper._hold = False
+    bookkeeper._terminate_event = mock.Mock()
+    bookkeeper._terminate_event.is_set.side_effect = [False, True]
+    with mock.patch.object(DeadlinePlanner, 'replan',
+                           wraps=planner.replan) as mocked_replan:
+        bookkeeper.monitor()
+        assert mocked_replan.call_args[1]['start_time'] == [15, 10]
+
+    assert bookkeeper._planner is planner
+    assert mocked_planner_init.call_count == 1
+    deferred = [idx for idx, state in bookkeeper._workflows_state.items()
+                if state == st.DEFERRED]
+    assert len(deferred) == 2
+    assert len(bookkeeper._plan) == 1
+    assert bookkeeper._plan[0][0]['id'] not in deferred
+    assert bookkeeper._plan[0][1] == res2
+    assert bookkeeper._verify_objective()
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(Bookkeeper, '__init__', return_value=None)
+@mock.patch('radical.cm.bookkeeper.bookkeeper.sleep')
+def test_work_dependencies(mocked_init, mocked_sleep):
+
+    bookkeeper = Bookkeeper(campaign=None, resources=None)
+    wf1 = {'id': 1, 'num_oper': 10}
+    wf2 = {'id': 2, 'num_oper': 5, 'dependencies': [1]}
+    res1 = {'id': 1, 'performance': 1}
+    res2 = {'id': 2, 'performance': 1}
+    bookkeeper._campaign = {'campaign': [wf1, wf2], 'state': st.NEW}
+    bookkeeper._plan = [(wf1, res1, 0, 10), (wf2, res2, 0, 5)]
+    bookkeeper._objective = None
+    bookkeeper._admission = False
+    bookkeeper._workflows_state = {1: st.NEW, 2: st.NEW}
+    bookkeeper._exec_state_lock = mt.RLock()
+    bookkeeper._monitor_lock = mt.RLock()
+    bookkeeper._logger = ru.Logger('dummy')
+    bookkeeper._prof = mock.Mock()
+    bookkeeper._uid = 'bookkeeper.0000'
+    bookkeeper._env = mock.Mock(now=0)
+    bookkeeper._enactor = mock.Mock()
+    bookkeeper._terminate_event = mock.Mock()
+    bookkeeper._time = 0
+    bookkeeper._waiting = set()
+    bookkeeper._wake_ups = set()
+    bookkeeper._unavail_resources = list()
+    bookkeeper._workflows_to_monitor = list()
+    bookkeeper._est_end_times = dict()
+    bookkeeper._cont = True
+    bookkeeper._hold = False
+
+    # W2 starts at 0 in the plan, but waits for W1, which is enacted.
+    bookkeeper._terminate_event.is_set.side_effect = [False, True]
+    bookkeeper.work()
+    bookkeeper._enactor.enact.assert_called_once_with(workflows=[wf1],
+                                                      resources=[res1])
+    assert bookkeeper._waiting == {2}
+
+    # Once W1 is done, W2 is enacted and expected to end as much later.
+    bookkeeper._workflows_state[1] = st.DONE
+    bookkeeper._unavail_resources = list()
+    bookkeeper._time = 10
+    bookkeeper._cont = True
+    bookkeeper._hold = False
+    bookkeeper._enactor.reset_mock()
+    bookkeeper._terminate_event.is_set.side_effect = [False, True]
+    bookkeeper.work()
+    bookkeeper._enactor.enact.assert_called_once_with(workflows=[wf2],
+                                                      resources=[res2])
+    assert bookkeeper._waiting == set()
+    assert bookkeeper._est_end_times[2] == 15
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(Bookkeeper, '__init__', return_value=None)
+@mock.patch('radical.cm.bookkeeper.bookkeeper.sleep')
+def test_work_gap(mocked_init, mocked_sleep):
+
+    bookkeeper = Bookkeeper(campaign=None, resources=None)
+    wf1 = {'id': 1, 'num_oper': 10}
+    wf5 = {'id': 5, 'num_oper': 10}
+    wf2 = {'id': 2, 'num_oper': 20, 'dependencies': {1: 1, 5: 1}}
+    res1 = {'id': 1, 'performance': 1}
+    res2 = {'id': 2, 'performance': 1}
+    bookkeeper._campaign = {'campaign': [wf1, wf5, wf2], 'state': st.NEW}
+    # W2 starts after the communication cost of its dependencies, when no
+    # workflow ends.
+    bookkeeper._plan = [(wf1, res1, 0, 10), (wf5, res2, 0, 10),
+                        (wf2, res1, 11, 31)]
+    bookkeeper._objective = None
+    bookkeeper._admission = False
+    bookkeeper._workflows_state = {1: st.DONE, 5: st.DONE, 2: st.NEW}
+    bookkeeper._exec_state_lock = mt.RLock()
+    bookkeeper._monitor_lock = mt.RLock()
+    bookkeeper._logger = ru.Logger('dummy')
+    bookkeeper._prof = mock.Mock()
+    bookkeeper._uid = 'bookkeeper.0000'
+    bookkeeper._env = Environment()
+    bookkeeper._env.run(until=10)
+    bookkeeper._enactor = mock.Mock()
+    bookkeeper._terminate_event = mock.Mock()
+    bookkeeper._time = 10
+    bookkeeper._waiting = set()
+    bookkeeper._wake_ups = set()
+    bookkeeper._unavail_resources = list()
+    bookkeeper._workflows_to_monitor = list()
+    bookkeeper._est_end_times = dict()
+    bookkeeper._cont = True
+    bookkeeper._hold = False
+
+    # Nothing is enacted at 10, and the simulation pauses at 11.
+    bookkeeper._terminate_event.is_set.side_effect = [False, True]
+    bookkeeper.work()
+    bookkeeper._enactor.enact.assert_not_called()
+    assert bookkeeper._wake_ups == {11}
+    assert bookkeeper._hold
+    bookkeeper._env.run()
+    assert bookkeeper._env.now == 11
+    assert not bookkeeper._hold
+
+    bookkeeper._time = 11
+    bookkeeper._cont = True
+    bookkeeper._terminate_event.is_set.side_effect = [False, True]
+    bookkeeper.work()
+    bookkeeper._enactor.enact.assert_called_once_with(workflows=[wf2],
+                                                      resources=[res1])
+    assert bookkeeper._est_end_times[1] == 31
+
+    # Had the clock passed 11 before W2 was enacted, it would be enacted as
+    # soon as possible, and expected to end as much later.
+    bookkeeper._unavail_resources = list()
+    bookkeeper._time = 12
+    bookkeeper._cont = True
+    bookkeeper._hold = False
+    bookkeeper._enactor.reset_mock()
+    bookkeeper._terminate_event.is_set.side_effect = [False, True]
+    bookkeeper.work()
+    bookkeeper._enactor.enact.assert_called_once_with(workflows=[wf2],
+                                                      resources=[res1])
+    assert bookkeeper._est_end_times[1] == 32
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(Bookkeeper, '__init__', return_value=None)
+def test_monitor_replan(mocked_init):
+
+    bookkeeper = Bookkeeper(campaign=None, resources=None)
+    wf1 = {'id': 1, 'num_oper': 10}
+    wf2 = {'id': 2, 'num_oper': 10}
+    wf3 = {'id': 3, 'num_oper': 10}
+    res1 = {'id': 1, 'performance': 1}
+    res2 = {'id': 2, 'performance': 1}
+    res3 = {'id': 3, 'performance': 1}
+    bookkeeper._campaign = {'campaign': [wf1, wf2, wf3],
+                            'state': st.EXECUTING}
+    bookkeeper._resources = [res1, res2, res3]
+    bookkeeper._admission = False
+    bookkeeper._planner = mock.Mock()
+    bookkeeper._planner.replan.return_value = [(wf3, res1, 12, 22)]
+    bookkeeper._uid = 'bookkeeper.0000'
+    bookkeeper._monitor_lock = mt.RLock()
+    bookkeeper._logger = ru.Logger('dummy')
+    bookkeeper._prof = mock.Mock()
+    bookkeeper._workflows_state = {1: st.DONE, 2: st.DONE, 3: st.NEW}
+    bookkeeper._workflows_to_monitor = [wf1, wf2]
+    bookkeeper._unavail_resources = [res1, res2]
+    bookkeeper._est_end_times = {1: 10, 2: 11, 3: 12}
+    bookkeeper._env = mock.Mock(now=12)
+    bookkeeper._waiting = set()
+    bookkeeper._hold = True
+    bookkeeper._terminate_event = mock.Mock()
+    bookkeeper._terminate_event.is_set.side_effect = [False, True]
+
+    # Both workflows end later than expected in the same pass, and the
+    # campaign is replanned once, with a start time per resource.
+    bookkeeper.monitor()
+    bookkeeper._planner.replan.assert_called_once_with(
+        campaign=[wf3], resources=[res1, res2, res3], num_oper=[10],
+        start_time=[12, 12, 12])
+    assert bookkeeper._plan == [(wf3, res1, 12, 22)]
+    assert not bookkeeper._hold
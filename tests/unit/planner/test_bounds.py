@@ -0,0 +1,73 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the makespan lower bounds
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+from radical.cm.planner import bounds
+
+
+# ------------------------------------------------------------------------------
+#
+def test_bounds():
+
+    num_oper = [6, 6, 6, 2]
+    performance = [3, 1, 1, 1]
+
+    # 20 operations at 6 operations per second.
+    assert bounds.ratio_bound(num_oper, performance) == pytest.approx(20 / 6)
+    # A workflow of 6 operations on the fastest resource.
+    assert bounds.largest_bound(num_oper, performance) == 2.0
+    # The three largest workflows on the three fastest resources.
+    assert bounds.preemptive_bound(num_oper, performance) == \
+        pytest.approx(18 / 5)
+    assert bounds.preemptive_bound([12], performance) == 4.0
+    assert bounds.lower_bound(num_oper, performance) == pytest.approx(18 / 5)
+
+    # The second resource joins at time 5.
+    assert bounds.ratio_bound([10, 10], [1, 1], [0, 5]) == 12.5
+    assert bounds.largest_bound([10, 10], [1, 1], [0, 5]) == 10.0
+    assert bounds.preemptive_bound([10, 10], [1, 1], [0, 5]) == \
+        pytest.approx(12.5)
+    assert bounds.ratio_bound([10], [1, 1], [0, 100]) == 10.0
+    assert bounds.preemptive_bound([2], [1, 10], [0, 100]) == \
+        pytest.approx(2.0)
+
+    assert bounds.lower_bound([], [1, 2], [3, 4]) == 3.0
+    assert bounds.gap(12.0, 10.0) == pytest.approx(0.2)
+    assert bounds.gap(12.0, 10.0, start=5.0) == pytest.approx(0.4)
+    assert bounds.gap(0.0, 0.0) == 0.0
+
+
+# ------------------------------------------------------------------------------
+#
+def test_bounds_optimal():
+
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        num_wfs = int(rng.integers(1, 6))
+        num_res = int(rng.integers(1, 4))
+        num_oper = rng.integers(1, 20, size=num_wfs).astype(np.float64)
+        performance = rng.integers(1, 5, size=num_res).astype(np.float64)
+        resource_free = rng.integers(0, 10, size=num_res).astype(np.float64)
+
+        # The optimal makespan of all assignments.
+        optimal = min(
+            max(resource_free[res_idx] +
+                num_oper[np.array(assignment) == res_idx].sum() /
+                performance[res_idx] for res_idx in range(num_res))
+            for assignment in itertools.product(range(num_res),
+                                                repeat=num_wfs))
+
+        bound = bounds.lower_bound(num_oper, performance, resource_free)
+        assert bound <= optimal + 1e-9
+        assert bounds.preemptive_bound(num_oper, performance,
+                                       resource_free) >= \
+            max(bounds.ratio_bound(num_oper, performance, resource_free),
+                bounds.largest_bound(num_oper, performance,
+                                     resource_free)) - 1e-6
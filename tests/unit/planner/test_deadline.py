@@ -0,0 +1,204 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the deadline planner
+"""
+# pylint: disable=protected-access, unused-argument
+import itertools
+
+import numpy as np
+import pytest
+
+from radical.cm.planner import DeadlinePlanner, bounds
+import radical.utils as ru
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(DeadlinePlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_relaxed_assignment(mocked_init, mocked_raise_on):
+
+    planner = DeadlinePlanner(None, None, None)
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        num_wfs = int(rng.integers(1, 7))
+        num_res = int(rng.integers(1, 4))
+        num_oper = rng.integers(1, 20, size=num_wfs).astype(np.float64)
+        performance = rng.integers(1, 5, size=num_res).astype(np.float64)
+        resource_free = rng.integers(0, 5, size=num_res).astype(np.float64)
+        planner._est_tx = np.divide.outer(num_oper, performance)
+        optimal = min(
+            max(resource_free[res_idx] +
+                planner._est_tx[np.array(assignment) == res_idx,
+                                res_idx].sum() for res_idx in range(num_res))
+            for assignment in itertools.product(range(num_res),
+                                                repeat=num_wfs))
+
+        # A target is refuted only when it is smaller than the optimal
+        # makespan. Otherwise, the plan ends by twice the target.
+        wf_order = np.argsort(-num_oper, kind='stable')
+        res_order = np.argsort(performance, kind='stable')
+        for target in np.linspace(0, 2 * optimal, 9):
+            assignment = planner._relaxed_assignment(target, wf_order,
+                                                     res_order, resource_free)
+            if assignment is None:
+                assert optimal > target
+            else:
+                for res_idx in range(num_res):
+                    on_res = assignment == res_idx
+                    if on_res.any():
+                        assert resource_free[res_idx] + \
+                            planner._est_tx[on_res, res_idx].sum() < 2 * target
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(DeadlinePlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan(mocked_init, mocked_raise_on):
+
+    planner = DeadlinePlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6']
+    planner._resources = [{'id': 1, 'performance': 2},
+                          {'id': 2, 'performance': 1},
+                          {'id': 3, 'performance': 1}]
+    planner._num_oper = [8, 6, 6, 4, 2, 2]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._deadline = None
+    planner._rtol = 1e-3
+
+    # All 28 operations execute by 7 only when the first resource executes
+    # 14 of them and the other two 7 each, which is not possible since all
+    # workflows are even. A makespan of 8 is.
+    est_plan = planner.plan(deadline=8)
+    assert planner.feasible
+    assert [entry[0] for entry in est_plan] == planner._campaign
+    assert max(entry[3] for entry in est_plan) <= 8
+    for resource in planner._resources:
+        entries = [entry for entry in est_plan if entry[1] == resource]
+        for prev, entry in zip(entries, entries[1:]):
+            assert entry[2] == prev[3]
+
+    # The workflow of 8 operations takes 4 on the fastest resource.
+    est_plan = planner.plan(deadline=3.9)
+    assert planner.feasible is False
+    assert len(est_plan) == 6
+
+    # Without a deadline the makespan is minimized.
+    est_plan = planner.plan()
+    assert planner.feasible is None
+    assert max(entry[3] for entry in est_plan) == pytest.approx(8)
+
+    # Resources that become available later are taken into account.
+    est_plan = planner.plan(deadline=8, start_time=[0, 4, 4])
+    assert planner.feasible is False
+    est_plan = planner.plan(deadline=10, start_time=[0, 4, 4])
+    assert planner.feasible
+    assert max(entry[3] for entry in est_plan) <= 10
+
+    # A resource that is busy past the deadline is not used, and does not make
+    # the plan miss it.
+    est_plan = planner.plan(campaign=['W7'],
+                            resources=[{'id': 1, 'performance': 5},
+                                       {'id': 2, 'performance': 4}],
+                            num_oper=[3], start_time=[9, 4], deadline=6)
+    assert planner.feasible
+    assert est_plan == [('W7', {'id': 2, 'performance': 4}, 4.0, 4.75)]
+
+    # The lower bound is only computed when the greedy plan misses the
+    # deadline.
+    with mock.patch('radical.cm.planner.bounds.lower_bound',
+                    wraps=bounds.lower_bound) as mocked_bound:
+        planner.plan(deadline=100)
+        assert planner.feasible
+        assert not mocked_bound.called
+        planner.plan(deadline=3.9)
+        assert mocked_bound.call_count == 1
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(DeadlinePlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_admit(mocked_init, mocked_raise_on):
+
+    planner = DeadlinePlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6']
+    planner._resources = [{'id': 1, 'performance': 2},
+                          {'id': 2, 'performance': 1}]
+    planner._num_oper = [30, 8, 6, 6, 4, 2]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._deadline = None
+    planner._rtol = 1e-3
+
+    # W1 does not end by 5 on any resource. By then, the resources execute
+    # 10 and 5 operations, and W2, W5 and W6 complete the most work. W5 and
+    # W6 end by 5 after the plan of W2, so they are admitted without planning
+    # again. Only W2 alone, and W3 and W4 with W2, are planned.
+    with mock.patch.object(planner, 'plan', wraps=planner.plan) as mocked_plan:
+        est_plan = planner.admit(deadline=5)
+        assert mocked_plan.call_count == 3
+    assert planner.feasible
+    assert sorted(entry[0] for entry in est_plan) == ['W2', 'W5', 'W6']
+    assert max(entry[3] for entry in est_plan) <= 5
+    for resource in planner._resources:
+        entries = sorted([entry for entry in est_plan if entry[1] == resource],
+                         key=lambda entry: entry[2])
+        for prev, entry in zip(entries, entries[1:]):
+            assert entry[2] == prev[3]
+
+    # Workflows with a larger weight per operation are admitted first.
+    est_plan = planner.admit(deadline=5, weights=[1, 1, 10, 1, 1, 1])
+    assert sorted(entry[0] for entry in est_plan) == ['W3', 'W5', 'W6']
+    assert max(entry[3] for entry in est_plan) <= 5
+
+    # A heavy workflow is admitted alone when it outweighs the greedy subset.
+    est_plan = planner.admit(campaign=['W7', 'W8'],
+                             resources=[{'id': 3, 'performance': 1}],
+                             num_oper=[2, 10], weights=[3, 10], deadline=10)
+    assert [entry[0] for entry in est_plan] == ['W8']
+
+    # The greedy subset is kept when no plan of the heaviest workflow alone
+    # meets the deadline.
+    plan = planner.plan
+
+    def _plan(**kargs):
+        tmp_plan = plan(**kargs)
+        if kargs['campaign'] == ['W8']:
+            planner._feasible = None
+        return tmp_plan
+
+    with mock.patch.object(planner, 'plan', side_effect=_plan):
+        est_plan = planner.admit(campaign=['W7', 'W8'],
+                                 resources=[{'id': 3, 'performance': 1}],
+                                 num_oper=[2, 10], weights=[3, 10],
+                                 deadline=10)
+    assert [entry[0] for entry in est_plan] == ['W7']
+
+    # A resource that is free only after the deadline executes nothing, and
+    # the heaviest workflow is admitted on the other one.
+    est_plan = planner.admit(campaign=['W7', 'W8'],
+                             resources=[{'id': 1, 'performance': 5},
+                                        {'id': 2, 'performance': 4}],
+                             num_oper=[3, 1], weights=[10, 1],
+                             start_time=[9, 4], deadline=6.0)
+    assert est_plan == [('W7', {'id': 2, 'performance': 4}, 4.0, 4.75),
+                        ('W8', {'id': 2, 'performance': 4}, 4.75, 5.0)]
+    assert planner.admit(campaign=['W7'],
+                         resources=[{'id': 1, 'performance': 5},
+                                    {'id': 2, 'performance': 4}],
+                         num_oper=[3], start_time=[9, 4], deadline=6.0) == \
+        [('W7', {'id': 2, 'performance': 4}, 4.0, 4.75)]
+
+    assert planner.admit(deadline=0.5) == []
+    with pytest.raises(ValueError):
+        planner.admit()
@@ -0,0 +1,148 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the estimated execution time matrix
+"""
+# pylint: disable=protected-access, unused-argument
+
+import numpy as np
+
+from radical.cm.planner import EstTxMatrix, HeftPlanner
+import radical.utils as ru
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+# ------------------------------------------------------------------------------
+#
+def test_matrix():
+
+    num_oper = [53649, 11201, 31700]
+    performance = [523, 487, 96]
+    est_tx = EstTxMatrix(num_oper=num_oper, performance=performance)
+
+    assert est_tx.shape == (3, 3)
+    assert len(est_tx) == 3
+    assert est_tx.matrix.dtype == np.float64
+    for i, wf_oper in enumerate(num_oper):
+        for j, perf in enumerate(performance):
+            assert est_tx[i, j] == float(wf_oper / perf)
+
+
+# ------------------------------------------------------------------------------
+#
+def test_matrix_empty():
+
+    est_tx = EstTxMatrix(num_oper=[], performance=[523, 487])
+
+    assert est_tx.shape == (0, 2)
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(HeftPlanner, '__init__', return_value=None)
+def test_get_est_tx(mocked_init):
+
+    planner = HeftPlanner(None, None, None)
+    est_tx = planner._get_est_tx(num_oper=[10, 20],
+                                 resources=[{'id': 1, 'performance': 1},
+                                            {'id': 2, 'performance': 2}])
+
+    assert isinstance(est_tx, np.ndarray)
+    assert est_tx.tolist() == [[10.0, 5.0], [20.0, 10.0]]
+
+
+# ------------------------------------------------------------------------------
+#
+def test_incremental_updates():
+
+    est_tx = EstTxMatrix(num_oper=[10, 20], performance=[1, 2],
+                         wf_ids=['W1', 'W2'], res_ids=[1, 2])
+    assert est_tx.version == 0
+
+    est_tx.set_performance(res_id=2, performance=5)
+    assert est_tx.version == 1
+    assert est_tx.matrix.tolist() == [[10.0, 2.0], [20.0, 4.0]]
+
+    # Setting the same value is not a change.
+    est_tx.set_performance(res_id=2, performance=5)
+    assert est_tx.version == 1
+
+    est_tx.add_workflow(wf_id='W3', num_oper=30)
+    est_tx.add_resource(res_id=3, performance=10)
+    assert est_tx.matrix.tolist() == [[10.0, 2.0, 1.0],
+                                      [20.0, 4.0, 2.0],
+                                      [30.0, 6.0, 3.0]]
+
+    est_tx.remove_workflow(wf_id='W1')
+    est_tx.remove_resource(res_id=1)
+    assert est_tx.version == 5
+    assert est_tx.take(wf_ids=['W2', 'W3'], res_ids=[2, 3]).tolist() == \
+        [[4.0, 2.0], [6.0, 3.0]]
+
+
+# ------------------------------------------------------------------------------
+#
+def test_update_and_take():
+
+    est_tx = EstTxMatrix(num_oper=[10, 20, 30], performance=[1, 2],
+                         wf_ids=['W1', 'W2', 'W3'], res_ids=[1, 2])
+
+    est_tx.update(wf_ids=['W3', 'W1'], num_oper=[30, 10], res_ids=[1, 2],
+                  performance=[1, 2])
+    assert est_tx.version == 0
+
+    est_tx.update(wf_ids=['W3', 'W4'], num_oper=[60, 40], res_ids=[1, 2],
+                  performance=[1, 4])
+    assert est_tx.take(wf_ids=['W3', 'W4'], res_ids=[1, 2]).tolist() == \
+        [[60.0, 15.0], [40.0, 10.0]]
+    # Asking for the whole table in its own order does not copy it.
+    assert np.shares_memory(est_tx.take(wf_ids=['W1', 'W2', 'W3', 'W4'],
+                                        res_ids=[1, 2]), est_tx.matrix)
+
+    # Evicting the workflows that are not part of the call shrinks the
+    # buffer once most of it is unused.
+    est_tx.add_workflows(['W%d' % idx for idx in range(5, 41)], [1] * 36)
+    capacity = est_tx._buffer.shape[0]
+    est_tx.update(wf_ids=['W4', 'W3'], num_oper=[40, 60], res_ids=[1, 2],
+                  performance=[1, 4], evict=True)
+    assert sorted(est_tx.workflow_ids) == ['W3', 'W4']
+    assert est_tx._buffer.shape[0] < capacity
+    assert est_tx.take(wf_ids=['W4', 'W3'], res_ids=[1, 2]).tolist() == \
+        [[40.0, 10.0], [60.0, 15.0]]
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(HeftPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_planner_cache(mocked_init, mocked_raise_on):
+
+    planner = HeftPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    campaign = [{'id': 1, 'num_oper': 10}, {'id': 2, 'num_oper': 20}]
+    resources = [{'id': 1, 'performance': 1}, {'id': 2, 'performance': 2}]
+
+    table = planner._get_est_tx(num_oper=[10, 20], resources=resources,
+                                campaign=campaign)
+    assert planner._get_est_tx(num_oper=[10, 20], resources=resources,
+                               campaign=campaign) is table
+
+    # The table a planner keeps is read-only and does not change with the
+    # cache.
+    assert not table.flags.writeable
+    planner._est_tx_cache.set_performance(res_id=1, performance=2)
+    assert table.tolist() == [[10.0, 5.0], [20.0, 10.0]]
+    planner._est_tx_cache.set_performance(res_id=1, performance=1)
+
+    # Workflows that are not planned anymore are evicted.
+    resources[1]['performance'] = 4
+    table = planner._get_est_tx(num_oper=[20], resources=resources,
+                                campaign=campaign[1:])
+    assert planner._est_tx_cache.workflow_ids == [2]
+    assert table.tolist() == [[20.0, 5.0]]
@@ -7,11 +7,16 @@ Unit test for heft_planner scheduler
 # pylint: disable=protected-access, unused-argument
 
 import os
+import threading as mt
+import time
 from radical.cm.planner import GAPlanner
 import radical.utils as ru
 # from random import randint
 import math
 
+import numpy as np
+import pytest
+
 try:
     import mock
 except ImportError:
@@ -106,13 +111,15 @@ def test_decoding(mocked_init, mocked_raise_on):
 @mock.patch('radical.utils.raise_on')
 def test_initialize_population(mocked_init, mocked_raise_on):
 
-    population = [[3, -1, 1, 2, 4, 8, -1, 5, 6, 7, 9, 10],
-                  [6, 8, -1, 1, 2, 3, 4, 5, 10, -1, 7, 9],
-                  [2, 4, -1, 5, 9, -1, 1, 3, 6, 7, 8, 10],
-                  [1, 2, 6, -1, 4, 7, 9, -1, 3, 5, 8, 10],
-                  [3, 5, -1, 4, 7, 10, -1, 1, 2, 6, 8, 9]]
+    population = [[2, 1, 1, 0, 0, 2, 2, 1, 2, 2],
+                  [0, 0, 0, 0, 2, 1, 2, 2, 1, 2],
+                  [1, 2, 1, 1, 2, 2, 2, 0, 1, 2],
+                  [2, 1, 1, 1, 2, 2, 2, 0, 1, 2],
+                  [0, 2, 2, 0, 1, 2, 1, 2, 2, 1]]
     planner = GAPlanner(None, None, None)
     planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._rng = None
     planner._population = []
     planner._population_size = 5
     planner._est_txs = [[1, 0.5, 0.3],
@@ -143,7 +150,8 @@ def test_initialize_population(mocked_init, mocked_raise_on):
     planner._initialize_population(workflows=workflows, resources=resources,
                                    random_init=0.5, start_time=None)
 
-    assert planner._population == population
+    assert planner._population.tolist() == population
+    assert planner._abs_fitness_term == 55 / 6
 
 
 # ------------------------------------------------------------------------------
@@ -154,8 +162,13 @@ def test_calc_fitness(mocked_init, mocked_raise_on):
 
     planner = GAPlanner(None, None, None)
     planner._logger = ru.Logger('dummy')
+    planner._fitness_cache = None
+    planner._executor = None
+    planner._planned_res = None
     planner._campaign = []
-    planner._population = [[1,3,5,6,-1,2,7,-1,4,8,9], [1,5,6,-1,3,2,7,-1,4,8,9]]
+    # [1,3,5,6,-1,2,7,-1,4,8,9] and [1,5,6,-1,3,2,7,-1,4,8,9]
+    planner._population = np.array([[0, 1, 0, 2, 0, 0, 1, 2, 2],
+                                    [0, 1, 1, 2, 0, 0, 1, 2, 2]])
     planner._est_txs = [[10, 10, 10],
                         [10, 10, 10],
                         [10, 10, 10],
@@ -183,6 +196,93 @@ def test_calc_fitness(mocked_init, mocked_raise_on):
     assert planner._fitness[0] == (1 / math.sqrt(200))
 
 
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_fitness_cache(mocked_init, mocked_raise_on):
+
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._executor = None
+    planner._planned_res = None
+    planner._est_txs = [[10, 10, 10]] * 9
+    planner._abs_fitness_term = 30
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 1},
+                          {'id': 3, 'performance': 1}]
+    planner._cache_size = 2
+    planner._reset_fitness_cache()
+
+    planner._population = np.array([[0, 1, 0, 2, 0, 0, 1, 2, 2],
+                                    [0, 1, 1, 2, 0, 0, 1, 2, 2]])
+    planner._calc_fitness()
+    assert planner.cache_info == {'hits': 0, 'misses': 2, 'size': 2}
+
+    planner._population = np.array([[0, 1, 1, 2, 0, 0, 1, 2, 2],
+                                    [0, 0, 0, 0, 0, 0, 0, 0, 0],
+                                    [0, 1, 0, 2, 0, 0, 1, 2, 2]])
+    planner._calc_fitness()
+    assert planner._fitness.tolist() == [1, 1 / math.sqrt(5400),
+                                         1 / math.sqrt(200)]
+    assert planner._makespans.tolist() == [30, 90, 40]
+    assert planner.cache_info == {'hits': 2, 'misses': 3, 'size': 2}
+
+    # The least recently used individual was evicted.
+    planner._population = np.array([[0, 1, 1, 2, 0, 0, 1, 2, 2]])
+    planner._calc_fitness()
+    assert planner.cache_info == {'hits': 2, 'misses': 4, 'size': 2}
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_fitness_pool(mocked_init, mocked_raise_on):
+
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._cache_size = 4096
+    planner._fitness_cache = None
+    planner._executor = None
+    planner._planned_res = None
+    rng = np.random.default_rng(0)
+    planner._est_txs = rng.random((50, 4))
+    planner._abs_fitness_term = 3
+    planner._resources = [{'id': i, 'performance': 1} for i in range(4)]
+    planner._population = rng.integers(0, 4, size=(11, 50))
+
+    planner._calc_fitness()
+    fitness, makespans = planner._fitness, planner._makespans
+
+    planner._start_pool(max_workers=3)
+    try:
+        planner._calc_fitness()
+        executor = planner._executor
+        planner._stop_pool()
+        assert planner._shm is None
+        assert planner._fitness.tolist() == fitness.tolist()
+        assert planner._makespans.tolist() == makespans.tolist()
+
+        # The pool is kept for the next plan, whose table is published again
+        # and attached to by the workers.
+        planner._est_txs = rng.random((50, 4))
+        planner._reset_fitness_cache()
+        planner._calc_fitness()
+        assert planner._fitness.tolist() != fitness.tolist()
+        fitness = planner._fitness.copy()
+        planner._start_pool(max_workers=3)
+        assert planner._executor is executor
+        planner._reset_fitness_cache()
+        planner._calc_fitness()
+        assert planner._fitness.tolist() == fitness.tolist()
+    finally:
+        planner.close()
+
+    assert planner._executor is None
+    assert planner._shm is None
+
+
 # ------------------------------------------------------------------------------
 #
 @mock.patch.object(GAPlanner, '__init__', return_value=None)
@@ -191,15 +291,48 @@ def test_selection(mocked_init, mocked_raise_on):
 
     planner = GAPlanner(None, None, None)
     planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._rng = None
+    planner._selection_method = 'roulette'
     planner._campaign = {'campaign': []}
-    planner._population = [[1, 3, 5, 6, -1, 2, 7, -1, 4, 8, 9],
-                           [1, 5, 6, -1, 3, 2, 7, -1, 4, 8, 9]]
+    planner._population = np.array([[0, 1, 0, 2, 0, 0, 1, 2, 2],
+                                    [0, 1, 1, 2, 0, 0, 1, 2, 2]])
     planner._population_size = 2
     planner._fitness = [1, 0.5]
 
     parents = planner._selection()
-    assert (parents[0] == [1, 3, 5, 6, -1, 2, 7, -1, 4, 8, 9] or
-            parents[0] == [1, 5, 6, -1, 3, 2, 7, -1, 4, 8, 9])
+    assert (parents[0].tolist() == [0, 1, 0, 2, 0, 0, 1, 2, 2] or
+            parents[0].tolist() == [0, 1, 1, 2, 0, 0, 1, 2, 2])
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_selection_methods(mocked_init, mocked_raise_on):
+
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._rng = None
+    planner._selection_method = 'roulette'
+    planner._population = np.arange(4)[:, np.newaxis] * np.ones((4, 3), int)
+    planner._population_size = 4
+    planner._fitness = [0, 0, 1, 0]
+
+    # Only individuals with some fitness are selected by the roulette wheel.
+    parents = planner._selection(num_parents=100)
+    assert parents.shape == (100, 3)
+    assert (parents == 2).all()
+
+    # The fittest individual of a tournament always wins, so the least fit
+    # wins only when it is drawn for all places.
+    planner._selection_method = 'tournament'
+    planner._tournament_size = 3
+    planner._fitness = [0.1, 0.4, 0.2, 0.3]
+    parents = planner._selection(num_parents=100)
+    assert parents.shape == (100, 3)
+    assert (parents == 0).sum() < (parents == 1).sum()
 
 
 # ------------------------------------------------------------------------------
@@ -210,6 +343,7 @@ def test_crossover(mocked_init, mocked_raise_on):
 
     planner = GAPlanner(None, None, None)
     planner._logger = ru.Logger('dummy')
+    planner._crossover_method = 'cycle'
     parents = [[1, 2, 3, -1, 4, 5, -1, 6, 7, 8, 9],
                [9, 3, -1, 7, 8, 2, 6, -1, 5, 1, 4]]
     children = planner._crossover(parents)
@@ -222,6 +356,573 @@ def test_crossover(mocked_init, mocked_raise_on):
     assert children[1] == [-1, 2, 4, -1, 1, -1, 3]
 
 
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch.object(GAPlanner, '_cut_points', return_value=(3, 7))
+@mock.patch('radical.utils.raise_on')
+def test_crossover_operators(mocked_init, mocked_cut_points, mocked_raise_on):
+
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    parents = [[1, 2, 3, -1, 4, 5, 6, 7, -1, 8, 9],
+               [9, 3, 7, -1, 8, 2, 6, 5, 1, -1, 4]]
+
+    planner._crossover_method = 'order'
+    children = planner._crossover(parents)
+    assert children[0] == [3, 8, 2, -1, 4, 5, 6, 7, -1, 1, 9]
+    assert children[1] == [3, 4, 7, -1, 8, 2, 6, 5, 9, -1, 1]
+
+    planner._crossover_method = 'pmx'
+    children = planner._crossover(parents)
+    assert children[0] == [9, 3, 2, -1, 4, 5, 6, 7, -1, 1, 8]
+    assert children[1] == [1, 7, 3, -1, 8, 2, 6, 5, 4, -1, 9]
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_recombine(mocked_init, mocked_raise_on):
+
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._rng = None
+    planner._planned_res = None
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 1},
+                          {'id': 3, 'performance': 1}]
+    planner._set_workflows([{'id': i} for i in range(1, 10)])
+    parents = np.array([[0, 0, 0, 1, 1, 1, 2, 2, 2],
+                        [2, 2, 2, 1, 1, 1, 0, 0, 0],
+                        [0, 1, 2, 0, 1, 2, 0, 1, 2],
+                        [1, 1, 1, 1, 1, 1, 1, 1, 1]])
+
+    for method in ['cycle', 'order', 'pmx']:
+        planner._crossover_method = method
+        children = planner._recombine(parents)
+        assert children.shape[1] == 9
+        # The number of workflows of each resource comes from a parent.
+        for child in children:
+            assert np.bincount(child, minlength=3).tolist() in \
+                [np.bincount(parent, minlength=3).tolist()
+                 for parent in parents]
+
+    planner._crossover_method = 'uniform'
+    children = planner._recombine(parents)
+    assert children.shape == (4, 9)
+    for p_id in [0, 2]:
+        pair = parents[p_id:p_id + 2]
+        assert ((children[p_id] == pair[0]) | (children[p_id] == pair[1])).all()
+        # The two children share the genes of the parents.
+        assert (np.sort(children[p_id:p_id + 2], axis=0) ==
+                np.sort(pair, axis=0)).all()
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_migrate(mocked_init, mocked_raise_on):
+
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._population_size = 4
+    planner._migration_rate = 0.5
+    states = [{'_population': np.full((4, 2), island),
+               '_fitness': np.array([0.1, 0.4, 0.3, 0.2]) * (island + 1)}
+              for island in range(3)]
+    states[0]['_population'][1] = [5, 5]
+
+    planner._topology = 'ring'
+    planner._migrate(states)
+    # Island 0 sent its two best to island 1, whose two worst were replaced.
+    assert states[1]['_population'].tolist() == [[5, 5], [1, 1], [1, 1],
+                                                 [0, 0]]
+    assert states[1]['_fitness'].tolist() == pytest.approx([0.4, 0.8, 0.6,
+                                                            0.3])
+    assert states[0]['_population'].tolist() == [[2, 2], [5, 5], [0, 0],
+                                                 [2, 2]]
+
+    # With a fully connected topology, the best of all incoming migrants
+    # replace at most half of an island.
+    planner._topology = 'fully_connected'
+    planner._migrate(states)
+    assert states[2]['_population'].tolist() == [[2, 2]] * 4
+    assert states[2]['_fitness'].tolist() == pytest.approx([0.9, 1.2, 0.9,
+                                                            1.2])
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_islands(mocked_init, mocked_raise_on):
+
+    rng = np.random.default_rng(0)
+    campaign = [{'id': 'W%d' % i, 'num_oper': int(oper)}
+                for i, oper in enumerate(rng.integers(10, 100, size=30))]
+    resources = [{'id': i, 'performance': perf}
+                 for i, perf in enumerate([1, 2, 3])]
+    plans = list()
+    for workers in [1, 2]:
+        planner = GAPlanner(None, None, None)
+        planner._logger = ru.Logger('dummy')
+        planner._rng = None
+        planner._est_tx_cache = None
+        planner._crossover_method = 'cycle'
+        planner._selection_method = 'roulette'
+        planner._tournament_size = 2
+        planner._elitism = None
+        planner._cache_size = 4096
+        planner._topology = 'ring'
+        planner._migration_rate = 0.1
+        planner._local_search = 0
+        planner._local_search_steps = 10
+        planner._rebalance_steps = 0
+        planner._executor = None
+        planner._shm = None
+        planner._best_lock = mt.Lock()
+        planner._gap_epsilon = None
+        planner._uid = 'planner.0000'
+        planner._campaign = campaign
+        planner._resources = resources
+        planner._population = []
+        planner._population_size = 10
+        planner._random_init = 0.5
+        planner._est_txs = planner._calc_est_tx(
+                                [wf['num_oper'] for wf in campaign], [1, 2, 3])
+        planner._deadline = None
+        planner._max_gen = 12
+        planner._islands = 3
+        planner._island_seeds = [1, 2, 3]
+        planner._migration_interval = 5
+        planner._workers = workers
+        plans.append(planner.plan())
+
+        assert [entry[0] for entry in plans[-1]] == campaign
+        assert max(entry[3] for entry in plans[-1]) == \
+            pytest.approx(planner._best_makespan)
+        assert planner.best_so_far() == plans[-1]
+
+    # Islands evolve the same way in the planner's and in worker processes.
+    assert plans[0] == plans[1]
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_anytime(mocked_init, mocked_raise_on):
+
+    rng = np.random.default_rng(0)
+    campaign = [{'id': 'W%d' % i, 'num_oper': int(oper)}
+                for i, oper in enumerate(rng.integers(10, 100, size=30))]
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._rng = None
+    planner._est_tx_cache = None
+    planner._crossover_method = 'cycle'
+    planner._selection_method = 'roulette'
+    planner._elitism = None
+    planner._cache_size = 4096
+    planner._workers = None
+    planner._islands = None
+    planner._local_search = 0
+    planner._rebalance_steps = 0
+    planner._executor = None
+    planner._shm = None
+    planner._workflows = None
+    planner._planned_res = None
+    planner._resource_free = None
+    planner._best = None
+    planner._gap_epsilon = None
+    planner._campaign = campaign
+    planner._resources = [{'id': i, 'performance': perf}
+                          for i, perf in enumerate([1, 2, 3])]
+    planner._population = []
+    planner._population_size = 10
+    planner._random_init = 0.5
+    planner._est_txs = planner._calc_est_tx(
+                            [wf['num_oper'] for wf in campaign], [1, 2, 3])
+    planner._deadline = None
+    planner._max_gen = 100
+    planner._best_lock = mt.Lock()
+
+    assert planner.best_so_far() == []
+
+    # The best plan only improves while the planner runs.
+    thread = mt.Thread(target=planner.plan,
+                       kwargs={'time_budget': 0.2, 'max_gen': 10 ** 9})
+    start = time.time()
+    thread.start()
+    makespans = list()
+    while thread.is_alive():
+        best = planner.best_so_far()
+        if best:
+            assert [entry[0] for entry in best] == campaign
+            makespans.append(max(entry[3] for entry in best))
+        time.sleep(0.01)
+    thread.join()
+
+    # The upper limit only guards against ignoring the budget, a loaded host
+    # may take much longer than the budget.
+    assert 0.2 <= time.time() - start < 60
+    assert makespans == sorted(makespans, reverse=True)
+    assert max(entry[3] for entry in planner._plan) <= makespans[-1]
+
+    # Without improvement for a few generations, planning stops well before
+    # the last generation.
+    est_plan = planner.plan(stall_generations=5, max_gen=10 ** 9)
+    assert est_plan == planner.best_so_far()
+    assert planner._time_budget is None
+
+    # The conditions of one call do not carry over to the next.
+    planner.plan(max_gen=5)
+    assert planner._time_budget is None
+    assert planner._stall_generations is None
+    assert planner._end_time is None
+
+    # The best individual of the last call is forgotten before the workflows
+    # of a replan are set, and is never combined with them.
+    set_workflows = planner._set_workflows
+    reset = list()
+
+    def _set_workflows(workflows):
+        reset.append(planner._best is None)
+        set_workflows(workflows)
+
+    remaining = campaign[10:]
+    with mock.patch.object(planner, '_set_workflows',
+                           side_effect=_set_workflows):
+        thread = mt.Thread(target=planner.plan,
+                           kwargs={'campaign': remaining,
+                                   'num_oper': [wf['num_oper']
+                                                for wf in remaining],
+                                   'time_budget': 0.2,
+                                   'max_gen': 10 ** 9})
+        thread.start()
+        workflows = list()
+        while thread.is_alive():
+            best = planner.best_so_far()
+            if best:
+                workflows.append([entry[0] for entry in best])
+                assert workflows[-1] in [campaign, remaining]
+        thread.join()
+    assert reset == [True]
+    # Once the replan has an individual, the plan of the last call is gone.
+    assert workflows == sorted(workflows, key=len, reverse=True)
+    assert [entry[0] for entry in planner.best_so_far()] == remaining
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_improve_elite(mocked_init, mocked_raise_on):
+
+    rng = np.random.default_rng(0)
+    campaign = [{'id': 'W%d' % i, 'num_oper': int(oper)}
+                for i, oper in enumerate(rng.integers(10, 100, size=30))]
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._est_tx_cache = None
+    planner._crossover_method = 'cycle'
+    planner._selection_method = 'roulette'
+    planner._elitism = None
+    planner._cache_size = 4096
+    planner._workers = None
+    planner._islands = None
+    planner._local_search = 0
+    planner._rebalance_steps = 0
+    planner._executor = None
+    planner._shm = None
+    planner._planned_res = None
+    planner._gap_epsilon = None
+    planner._resources = [{'id': i, 'performance': perf}
+                          for i, perf in enumerate([1, 2, 3])]
+    planner._est_txs = planner._calc_est_tx(
+                            [wf['num_oper'] for wf in campaign], [1, 2, 3])
+    planner._population = rng.integers(0, 3, size=(6, 30))
+    planner._fitness = np.array([0.1, 0.6, 0.2, 0.5, 0.3, 0.4])
+    population = planner._population.copy()
+    makespans = planner._get_makespan(population)
+
+    # Without local search, nothing changes.
+    assert not planner._improve_elite()
+    assert (planner._population == population).all()
+
+    # The two fittest individuals improve, the rest stay the same.
+    planner._local_search = 2
+    planner._local_search_steps = 5
+    assert planner._improve_elite()
+    new_makespans = planner._get_makespan(planner._population)
+    assert (new_makespans[[1, 3]] < makespans[[1, 3]]).all()
+    assert (planner._population[[0, 2, 4, 5]] ==
+            population[[0, 2, 4, 5]]).all()
+    assert (planner._population[[1, 3]] != population[[1, 3]]).sum(axis=1). \
+        max() <= 10
+
+    # Memetic evolution finds a plan at least as good as the plain one.
+    planner._campaign = campaign
+    planner._population_size = 10
+    planner._random_init = 0.5
+    planner._deadline = None
+    planner._max_gen = 100
+    planner._best_lock = mt.Lock()
+    planner._local_search = 0
+    planner._rng = None
+    plain = planner.plan(max_gen=30, stall_generations=30)
+    planner._local_search = 2
+    planner._rng = None
+    memetic = planner.plan(max_gen=30, stall_generations=30)
+    assert max(entry[3] for entry in memetic) <= \
+        max(entry[3] for entry in plain)
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_rebalancing(mocked_init, mocked_raise_on):
+
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._rebalance_steps = 0
+    planner._planned_res = None
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 2}]
+    planner._est_txs = planner._calc_est_tx([4, 4, 2, 2], [1, 2])
+    children = np.array([[0, 0, 0, 0], [1, 1, 1, 1], [0, 1, 1, 1]])
+
+    # Without rebalancing, the children stay the same.
+    assert (planner._rebalancing(children.copy()) == children).all()
+
+    planner._rebalance_steps = 1
+    assert planner._rebalancing(children.copy()).tolist() == \
+        [[1, 0, 0, 0], [0, 1, 1, 1], [0, 1, 1, 1]]
+
+    planner._rebalance_steps = 10
+    rebalanced = planner._rebalancing(children.copy())
+    assert planner._get_makespan(rebalanced).tolist() == [4.0, 4.0, 4.0]
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_warm_start(mocked_init, mocked_raise_on):
+
+    campaign = [{'id': 'W%d' % i, 'num_oper': 10 * (i + 1)} for i in range(8)]
+    resources = [{'id': 1, 'performance': 1}, {'id': 2, 'performance': 2}]
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._rng = None
+    planner._est_tx_cache = None
+    planner._crossover_method = 'cycle'
+    planner._selection_method = 'roulette'
+    planner._elitism = None
+    planner._cache_size = 4096
+    planner._workers = None
+    planner._islands = None
+    planner._local_search = 0
+    planner._rebalance_steps = 0
+    planner._executor = None
+    planner._shm = None
+    planner._best = None
+    planner._gap_epsilon = None
+    planner._campaign = campaign
+    planner._resources = resources
+    planner._population = []
+    planner._population_size = 6
+    planner._random_init = 0.5
+    planner._est_txs = planner._calc_est_tx(
+                            [wf['num_oper'] for wf in campaign], [1, 2])
+    planner._deadline = None
+    planner._max_gen = 20
+    planner._best_lock = mt.Lock()
+
+    # Without a previous population there is nothing to warm start from.
+    assert planner._get_seeds(True, campaign, resources, None) is None
+
+    est_plan = planner.plan()
+    best = planner._best.copy()
+
+    # The first seed of the population is the best individual, restricted to
+    # the remaining workflows. The rest are the fittest individuals.
+    remaining = campaign[3:]
+    planner._est_txs = planner._get_est_tx(
+                            num_oper=[wf['num_oper'] for wf in remaining],
+                            resources=resources, campaign=remaining)
+    seeds = planner._get_seeds(True, remaining, resources, None)
+    assert seeds.shape == (3, 5)
+    assert seeds[0].tolist() == best[3:].tolist()
+    fittest = np.argsort(-planner._fitness, kind='stable')[:2]
+    assert seeds[1:].tolist() == planner._population[fittest, 3:].tolist()
+
+    # A plan gives a single individual, and copies of it with a swap. New
+    # workflows go to the resource they finish first on, here W8 to the
+    # faster resource, since W6 and W7 are on the slower one.
+    new_wf = {'id': 'W8', 'num_oper': 10}
+    prev_plan = [(campaign[5], resources[0], 0, 60),
+                 (campaign[6], resources[0], 60, 130),
+                 (campaign[7], resources[1], 0, 40)]
+    workflows = [campaign[5], campaign[6], campaign[7], new_wf]
+    planner._est_txs = planner._calc_est_tx([60, 70, 80, 10], [1, 2])
+    planner._rng = None
+    seeds = planner._get_seeds(prev_plan, workflows, resources, None)
+    assert seeds.shape == (3, 4)
+    assert seeds[0].tolist() == [0, 0, 1, 1]
+    assert all(sorted(seed) == [0, 0, 1, 1] for seed in seeds.tolist())
+    assert ((seeds[1:] != seeds[0]).sum(axis=1) <= 2).all()
+
+    # Workflows on resources that are gone are reassigned.
+    planner._est_txs = planner._calc_est_tx([60, 70, 80, 10], [2])
+    seeds = planner._get_seeds(prev_plan, workflows, resources[1:],
+                               [100])
+    assert seeds[0].tolist() == [0, 0, 0, 0]
+
+    # Replanning warm starts from the last population, and the plan covers
+    # the remaining workflows only.
+    planner._est_txs = planner._calc_est_tx(
+                            [wf['num_oper'] for wf in campaign], [1, 2])
+    planner.plan()
+    with mock.patch.object(planner, '_get_seeds',
+                           wraps=planner._get_seeds) as mocked_seeds:
+        new_plan = planner.replan(campaign=remaining, resources=resources,
+                                  num_oper=[wf['num_oper']
+                                            for wf in remaining])
+        assert mocked_seeds.call_args[0][0] is True
+    assert [entry[0] for entry in new_plan] == remaining
+    assert len(est_plan) == len(campaign)
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_resources(mocked_init, mocked_raise_on):
+
+    campaign = [{'id': 'W%d' % i, 'num_oper': 12 * (i + 1)} for i in range(6)]
+    resources = [{'id': i, 'performance': perf}
+                 for i, perf in enumerate([1, 2, 4])]
+    # A reordered subset of the resources of the constructor.
+    planned = [resources[2], resources[0]]
+    for islands in [None, 2]:
+        planner = GAPlanner(None, None, None)
+        planner._logger = ru.Logger('dummy')
+        planner._seed = None
+        planner._rng = None
+        planner._est_tx_cache = None
+        planner._crossover_method = 'cycle'
+        planner._selection_method = 'roulette'
+        planner._tournament_size = 2
+        planner._elitism = None
+        planner._cache_size = 4096
+        planner._workers = None
+        planner._topology = 'ring'
+        planner._migration_rate = 0.1
+        planner._local_search = 0
+        planner._local_search_steps = 10
+        planner._rebalance_steps = 0
+        planner._executor = None
+        planner._shm = None
+        planner._best_lock = mt.Lock()
+        planner._gap_epsilon = None
+        planner._uid = 'planner.0000'
+        planner._campaign = campaign
+        planner._resources = resources
+        planner._population = []
+        planner._population_size = 6
+        planner._random_init = 0.5
+        planner._deadline = None
+        planner._max_gen = 10
+        planner._islands = islands
+        planner._island_seeds = [1, 2]
+        planner._migration_interval = 5
+        est_plan = planner.plan(resources=planned)
+
+        # Individuals index the resources of the call, so every workflow is
+        # planned on one of them, with its execution time on it.
+        assert [entry[0] for entry in est_plan] == campaign
+        for workflow, resource, start, end in est_plan:
+            assert resource in planned
+            assert end - start == pytest.approx(workflow['num_oper'] /
+                                                resource['performance'])
+        assert max(entry[3] for entry in est_plan) == \
+            pytest.approx(planner._best_makespan)
+        assert planner._planned_resources() == planned
+        assert planner._to_encoding(planner._best).count(-1) == 1
+        assert planner._get_makespan(planner._best).tolist() == \
+            [pytest.approx(planner._best_makespan)]
+
+    # After a replan of some workflows, a plan of the whole campaign uses the
+    # table of the whole campaign.
+    planner.replan(campaign=campaign[:2], resources=resources,
+                   num_oper=[12, 24], start_time=0)
+    est_plan = planner.plan()
+    assert [entry[0] for entry in est_plan] == campaign
+    assert planner._est_txs.shape == (6, 3)
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_gap(mocked_init, mocked_raise_on):
+
+    rng = np.random.default_rng(0)
+    campaign = [{'id': 'W%d' % i, 'num_oper': int(oper)}
+                for i, oper in enumerate(rng.integers(10, 100, size=30))]
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._rng = None
+    planner._est_tx_cache = None
+    planner._crossover_method = 'cycle'
+    planner._selection_method = 'roulette'
+    planner._elitism = None
+    planner._cache_size = 4096
+    planner._workers = None
+    planner._islands = None
+    planner._local_search = 0
+    planner._rebalance_steps = 0
+    planner._executor = None
+    planner._shm = None
+    planner._gap_epsilon = None
+    planner._campaign = campaign
+    planner._resources = [{'id': i, 'performance': perf}
+                          for i, perf in enumerate([1, 2, 3])]
+    planner._population = []
+    planner._population_size = 10
+    planner._random_init = 0.5
+    planner._est_txs = planner._calc_est_tx(
+                            [wf['num_oper'] for wf in campaign], [1, 2, 3])
+    planner._deadline = None
+    planner._max_gen = 100
+    planner._best_lock = mt.Lock()
+
+    # With a loose gap, evolution stops as soon as a plan is close enough to
+    # the lower bound. A tight one is not met, and all generations run.
+    with mock.patch.object(planner, '_selection',
+                           wraps=planner._selection) as mocked_selection:
+        est_plan = planner.plan(gap_epsilon=0.1, stall_generations=10 ** 9)
+        assert mocked_selection.call_count == 1
+    assert planner.gap() <= 0.1
+    assert planner._lower_bound == pytest.approx(
+                sum(wf['num_oper'] for wf in campaign) / 6)
+    assert [entry[0] for entry in est_plan] == campaign
+
+    with mock.patch.object(planner, '_selection',
+                           wraps=planner._selection) as mocked_selection:
+        planner.plan(gap_epsilon=0, stall_generations=10 ** 9, max_gen=20)
+        assert mocked_selection.call_count == 21
+
+
 # ------------------------------------------------------------------------------
 #
 @mock.patch.object(GAPlanner, '__init__', return_value=None)
@@ -240,6 +941,9 @@ def test_get_plan(mocked_init, mocked_raise_on):
                    ({'description': 'W10', 'id': 9, 'num_oper': 10}, {'id': 3, 'performance': 1}, 20, 30)]
     planner = GAPlanner(None, None, None)
     planner._logger = ru.Logger('dummy')
+    planner._workflows = None
+    planner._planned_res = None
+    planner._resource_free = None
     planner._campaign = [{'description': 'W1', 'id': 0, 'num_oper': 10},
                          {'description': 'W2', 'id': 1, 'num_oper': 10},
                          {'description': 'W3', 'id': 2, 'num_oper': 10},
@@ -264,7 +968,8 @@ def test_get_plan(mocked_init, mocked_raise_on):
                         [10, 10, 10],
                         [10, 10, 10],
                         [10, 10, 10]]
-    planner._get_plan([1, 3, 5, 6, -1, 2, 7, 0, -1, 4, 8, 9])
+    # [1, 3, 5, 6, -1, 2, 7, 0, -1, 4, 8, 9]
+    planner._get_plan(np.array([1, 0, 1, 0, 2, 0, 0, 1, 2, 2]))
 
     assert planner._plan == actual_plan
     actual_plan = [({'description': None, 'id': 1, 'num_oper': 75000}, {'id': 1, 'performance': 1}, 0, 75000.0), 
@@ -273,6 +978,9 @@ def test_get_plan(mocked_init, mocked_raise_on):
                    ({'description': None, 'id': 4, 'num_oper': 75000}, {'id': 2, 'performance': 1}, 0, 75000.0)]
     planner = GAPlanner(None, None, None)
     planner._logger = ru.Logger('dummy')
+    planner._workflows = None
+    planner._planned_res = None
+    planner._resource_free = None
     planner._campaign = [{'description': None, 'id': 1, 'num_oper': 75000},
                          {'description': None, 'id': 2, 'num_oper': 75000},
                          {'description': None, 'id': 3, 'num_oper': 75000},
@@ -286,10 +994,26 @@ def test_get_plan(mocked_init, mocked_raise_on):
                         [75000, 75000, 75000, 75000],
                         [75000, 75000, 75000, 75000],
                         [75000, 75000, 75000, 75000]]
-    planner._get_plan([1,-1,4,-1,2,-1,3])
+    # [1, -1, 4, -1, 2, -1, 3]
+    planner._get_plan(np.array([0, 2, 3, 1]))
 
     assert planner._plan == actual_plan
 
+    # Workflow IDs can be anything, and resources start when they become
+    # available.
+    campaign = [{'id': 'b', 'num_oper': 10}, {'id': 'a', 'num_oper': 20},
+                {'id': 7, 'num_oper': 30}]
+    planner._set_workflows(campaign)
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 2}]
+    planner._est_txs = planner._calc_est_tx([10, 20, 30], [1, 2])
+    planner._resource_free = [5.0, 0.0]
+    assert planner._to_assignment(['b', 7, -1, 'a']).tolist() == [0, 1, 0]
+    planner._get_plan(np.array([0, 1, 0]))
+    assert planner._plan == [(campaign[0], planner._resources[0], 5.0, 15.0),
+                             (campaign[1], planner._resources[1], 0.0, 10.0),
+                             (campaign[2], planner._resources[0], 15.0, 45.0)]
+
 
 # ------------------------------------------------------------------------------
 #
@@ -299,6 +1023,7 @@ def test_get_makespan(mocked_init, mocked_raise_on):
 
     planner = GAPlanner(None, None, None)
     planner._logger = ru.Logger('dummy')
+    planner._planned_res = None
     planner._campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9', 'W10']
     planner._resources = [{'id': 1, 'performance': 1},
                           {'id': 2, 'performance': 1},
@@ -314,6 +1039,39 @@ def test_get_makespan(mocked_init, mocked_raise_on):
                         [10, 10, 10],
                         [10, 10, 10],
                         [10, 10, 10]]
-    makespan = planner._get_makespan([1, 3, 5, 6, -1, 2, 7, 0, -1, 4, 8, 9])
+    # [1, 3, 5, 6, -1, 2, 7, 10, -1, 4, 8, 9]
+    makespan = planner._get_makespan(np.array([0, 1, 0, 2, 0, 0, 1, 2, 2, 1]))
+
+    assert makespan.tolist() == [40]
+
+    makespan = planner._get_makespan(np.array([[0, 1, 0, 2, 0, 0, 1, 2, 2, 1],
+                                               [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]))
+
+    assert makespan.tolist() == [40, 100]
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(GAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_assignment_encoding(mocked_init, mocked_raise_on):
+
+    planner = GAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._planned_res = None
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 1},
+                          {'id': 3, 'performance': 1}]
+    planner._set_workflows([{'id': 'W%d' % i} for i in range(1, 10)])
+
+    encoding = planner._to_encoding(np.array([0, 1, 0, 2, 0, 0, 1, 2, 2]))
+    assert encoding == ['W1', 'W3', 'W5', 'W6', -1, 'W2', 'W7', -1, 'W4',
+                        'W8', 'W9']
+    assignment = planner._to_assignment(['W6', 'W1', 'W5', 'W3', -1, 'W7',
+                                         'W2', -1, 'W9', 'W4', 'W8'])
+    assert assignment.tolist() == [0, 1, 0, 2, 0, 0, 1, 2, 2]
 
-    assert makespan == 40
+    # Resources without workflows are empty between delimiters.
+    encoding = planner._to_encoding(np.array([2, 2, 2, 2, 2, 2, 2, 2, 2]))
+    assert encoding[:2] == [-1, -1]
+    assert planner._to_assignment(encoding).tolist() == [2] * 9
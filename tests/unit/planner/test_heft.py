@@ -6,7 +6,10 @@ Unit test for heft_planner scheduler
 """
 # pylint: disable=protected-access, unused-argument
 
+import pytest
+
 from radical.cm.planner import HeftPlanner
+from radical.cm.planner.timeline import Timeline
 import radical.utils as ru
 
 try:
@@ -48,6 +51,7 @@ def test_plan(mocked_init, mocked_calc_est_tx, mocked_raise_on):
                           {'id': 3, 'performance': 3}]
     planner._num_oper = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
     est_plan = planner.plan()
 
     assert est_plan == actual_plan
@@ -78,6 +82,7 @@ def test_plan2(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
     est_plan = planner.plan()
     assert est_plan == actual_plan
 
@@ -106,6 +111,7 @@ def test_plan3(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
     est_plan = planner.plan()
     assert est_plan == actual_plan
 
@@ -124,6 +130,7 @@ def test_plan4(mocked_init, mocked_raise_on):
                           {'id': 3, 'performance': 96}]
     planner._num_oper = [53649]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
     est_plan = planner.plan()
     assert est_plan == actual_plan
 
@@ -152,6 +159,7 @@ def test_plan_start_time(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy')    
+    planner._est_tx_cache = None
     est_plan = planner.plan(start_time=5)
     assert est_plan == actual_plan
 
@@ -181,5 +189,181 @@ def test_plan_start_list(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy') 
+    planner._est_tx_cache = None
     est_plan = planner.plan(start_time=[5,3,4])
     assert est_plan == actual_plan
+
+    # A start time is needed for every resource.
+    with pytest.raises(ValueError):
+        planner.plan(start_time=[5, 3, 4, 5, 3, 4])
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(HeftPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_ties(mocked_init, mocked_raise_on):
+
+    actual_plan = [('W1', {'id': 1, 'performance': 1}, 1, 11),
+                   ('W2', {'id': 3, 'performance': 1}, 1, 11),
+                   ('W3', {'id': 2, 'performance': 1}, 2, 12)]
+    planner = HeftPlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3']
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 1},
+                          {'id': 3, 'performance': 1}]
+    planner._num_oper = [10, 10, 10]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    start_time = [1, 2, 1]
+    est_plan = planner.plan(start_time=start_time)
+
+    # Equal averages keep the campaign order, equal finish times go to the
+    # first resource, and the start times of the caller are not changed.
+    assert est_plan == actual_plan
+    assert start_time == [1, 2, 1]
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(HeftPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_uniform(mocked_init, mocked_raise_on):
+
+    planner = HeftPlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9',
+                         'W10']
+    planner._resources = [{'id': 1, 'performance': 523},
+                          {'id': 2, 'performance': 487},
+                          {'id': 3, 'performance': 96},
+                          {'id': 4, 'performance': 487},
+                          {'id': 5, 'performance': 523}]
+    planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
+                         40000, 16000]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    for start_time in [None, 5, [5, 3, 4, 3, 5], [0, 0, 0, 1, 1]]:
+        est_plan = planner.plan(start_time=start_time)
+        assert planner.plan(start_time=start_time, uniform=True) == est_plan
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(HeftPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_dependencies(mocked_init, mocked_raise_on):
+
+    wf_a = {'id': 1, 'num_oper': 10}
+    wf_b = {'id': 2, 'num_oper': 2, 'dependencies': {1: 3}}
+    wf_c = {'id': 3, 'num_oper': 5}
+    wf_d = {'id': 4, 'num_oper': 1, 'dependencies': [2, 3, 10]}
+    actual_plan = [(wf_a, {'id': 1, 'performance': 1}, 0, 10),
+                   (wf_c, {'id': 2, 'performance': 1}, 0, 5),
+                   (wf_b, {'id': 1, 'performance': 1}, 10, 12),
+                   (wf_d, {'id': 1, 'performance': 1}, 12, 13)]
+    planner = HeftPlanner(None, None, None)
+    planner._campaign = [wf_a, wf_b, wf_c, wf_d]
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 1}]
+    planner._num_oper = [10, 2, 5, 1]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    # W2 would start at time 0 on the second resource without its dependency,
+    # and its data reach the second resource only at time 13.
+    est_plan = planner.plan()
+    assert est_plan == actual_plan
+
+    # Moving a workflow would delay its successors.
+    assert planner.rebalance() == actual_plan
+
+    wf_a['dependencies'] = [4]
+    with pytest.raises(ValueError):
+        planner.plan()
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(HeftPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_insertion(mocked_init, mocked_raise_on):
+
+    wf_1 = {'id': 1, 'num_oper': 10}
+    wf_2 = {'id': 2, 'num_oper': 9}
+    wf_3 = {'id': 3, 'num_oper': 2, 'dependencies': {1: 0, 2: 3}}
+    wf_4 = {'id': 4, 'num_oper': 1}
+    res_1 = {'id': 1, 'performance': 1}
+    res_2 = {'id': 2, 'performance': 1}
+    planner = HeftPlanner(None, None, None)
+    planner._campaign = [wf_1, wf_2, wf_3, wf_4]
+    planner._resources = [res_1, res_2]
+    planner._num_oper = [10, 9, 2, 1]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    # W3 waits for W1 on the first resource, which leaves it idle from 9 to
+    # 10. W4 fits in that gap.
+    est_plan = planner.plan()
+    assert est_plan == [(wf_2, res_1, 0, 9), (wf_1, res_2, 0, 10),
+                        (wf_3, res_1, 10, 12), (wf_4, res_2, 10, 11)]
+
+    est_plan = planner.plan(insertion=True)
+    assert est_plan == [(wf_2, res_1, 0, 9), (wf_1, res_2, 0, 10),
+                        (wf_3, res_1, 10, 12), (wf_4, res_1, 9, 10)]
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(HeftPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_gap(mocked_init, mocked_raise_on):
+
+    planner = HeftPlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3']
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 1}]
+    planner._num_oper = [4, 3, 3]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    # W2 and W3 share a resource, so the makespan is 6 instead of 5.
+    planner.plan()
+    assert planner.gap() == pytest.approx(0.2)
+    assert planner.gap(start_time=[0, 1]) == pytest.approx(0.5 / 5.5)
+    assert planner.gap(plan=[]) == 0.0
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(HeftPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_build_plan(mocked_init, mocked_raise_on):
+
+    planner = HeftPlanner(None, None, None)
+    resources = [{'id': 1, 'performance': 2},
+                 {'id': 2, 'performance': 1}]
+
+    # The workflows of a resource execute in the given order, from the time
+    # the resource becomes available.
+    est_plan = planner._build_plan(['W1', 'W2', 'W3'], resources, [1, 0, 1],
+                                   [3, 1],
+                                   [[2, 4], [1, 2], [3, 6]])
+    assert est_plan == [('W1', resources[1], 1.0, 5.0),
+                        ('W2', resources[0], 3.0, 4.0),
+                        ('W3', resources[1], 5.0, 11.0)]
+
+
+# ------------------------------------------------------------------------------
+#
+def test_timeline():
+
+    timeline = Timeline(free_time=2)
+    timeline.reserve(5, 8)
+    timeline.reserve(2, 3)
+    assert timeline.gaps == [(3, 5), (8, float('inf'))]
+
+    assert timeline.earliest_start(ready=0, duration=2) == 3
+    assert timeline.earliest_start(ready=4, duration=1) == 4
+    assert timeline.earliest_start(ready=4, duration=2) == 8
+    assert timeline.earliest_start(ready=10, duration=2) == 10
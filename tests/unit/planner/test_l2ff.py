@@ -8,6 +8,7 @@ Unit test for heft_planner scheduler
 
 from radical.cm.planner import L2FFPlanner
 import radical.utils as ru
+import pytest
 
 try:
     import mock
@@ -40,6 +41,7 @@ def test_plan1(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
 
     est_plan = planner.plan()
     assert est_plan == actual_plan
@@ -68,6 +70,7 @@ def test_plan2(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
 
     est_plan = planner.plan()
     assert est_plan == actual_plan
@@ -87,7 +90,101 @@ def test_plan3(mocked_init, mocked_raise_on):
                           {'id': 3, 'performance': 96}]
     planner._num_oper = [53649]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
 
     est_plan = planner.plan()
     assert est_plan == actual_plan
 
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(L2FFPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_earliest_finish(mocked_init, mocked_raise_on):
+
+    campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9', 'W10']
+    resources = [{'id': 1, 'performance': 523},
+                 {'id': 2, 'performance': 487},
+                 {'id': 3, 'performance': 96}]
+    num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025, 40000,
+                16000]
+    planner = L2FFPlanner(None, None, None)
+    planner._campaign = campaign
+    planner._resources = resources
+    planner._num_oper = num_oper
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    est_plan = planner.plan(earliest_finish=True)
+
+    # Workflows are placed from the largest to the smallest.
+    assert [entry[0] for entry in est_plan] == ['W1', 'W9', 'W3', 'W5', 'W10',
+                                                'W4', 'W2', 'W7', 'W8', 'W6']
+
+    # Each workflow finishes first on its resource, given the workflows placed
+    # before it.
+    resource_free = [0.0, 0.0, 0.0]
+    for workflow, resource, start, end in est_plan:
+        wf_oper = num_oper[campaign.index(workflow)]
+        end_times = [free + wf_oper / res['performance']
+                     for free, res in zip(resource_free, resources)]
+        res_idx = end_times.index(min(end_times))
+        assert resource == resources[res_idx]
+        assert start == resource_free[res_idx]
+        assert end == end_times[res_idx]
+        resource_free[res_idx] = end
+
+    # The round robin overloads the slow resource.
+    assert max(entry[3] for entry in est_plan) < \
+        max(entry[3] for entry in planner.plan())
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(L2FFPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_rebalance(mocked_init, mocked_raise_on):
+
+    campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9', 'W10']
+    resources = [{'id': 1, 'performance': 523},
+                 {'id': 2, 'performance': 487},
+                 {'id': 3, 'performance': 96}]
+    num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025, 40000,
+                16000]
+    planner = L2FFPlanner(None, None, None)
+    planner._campaign = campaign
+    planner._resources = resources
+    planner._num_oper = num_oper
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    est_plan = planner.plan()
+    balanced = planner.rebalance()
+    assert planner._plan == balanced
+
+    # W3 and W8 move away from the slow resource, in their plan order.
+    assert [entry[0] for entry in balanced] == [entry[0] for entry in est_plan]
+    assert [entry[1]['id'] for entry in balanced] == [1, 2, 2, 1, 2, 3, 1, 1,
+                                                      3, 1]
+    resource_free = {1: 0.0, 2: 0.0, 3: 0.0}
+    for workflow, resource, start, end in balanced:
+        assert start == resource_free[resource['id']]
+        assert end - start == pytest.approx(
+                num_oper[campaign.index(workflow)] / resource['performance'])
+        resource_free[resource['id']] = end
+    assert max(resource_free.values()) == pytest.approx(189.52083333333331)
+
+    # Swaps balance the plan further, and a limit on the moves is kept.
+    assert max(entry[3] for entry in planner.rebalance(est_plan, swaps=True)) \
+        < max(resource_free.values())
+    one_move = planner.rebalance(est_plan, max_steps=1)
+    assert sum(old[1] != new[1] for old, new in zip(est_plan, one_move)) == 1
+
+    # Resources start when their first workflow of the plan starts, unless the
+    # start time is given.
+    est_plan = planner.plan(start_time=[5, 3, 4])
+    balanced = planner.rebalance()
+    assert min(entry[2] for entry in balanced if entry[1]['id'] == 2) == 3
+    balanced = planner.rebalance(est_plan, start_time=10)
+    assert min(entry[2] for entry in balanced) == 10
@@ -0,0 +1,139 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the resource load tracker
+"""
+# pylint: disable=protected-access
+
+import numpy as np
+import pytest
+
+from radical.cm.planner.load_tracker import LoadTracker
+
+
+def _makespan(est_tx, assignment, resource_free=None):
+
+    loads = np.bincount(assignment,
+                        weights=est_tx[np.arange(len(assignment)), assignment],
+                        minlength=est_tx.shape[1])
+    if resource_free is not None:
+        loads = loads + resource_free
+    # Resources without workflows do not count.
+    return loads[np.unique(assignment)].max()
+
+
+# ------------------------------------------------------------------------------
+#
+def test_loads():
+
+    est_tx = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]])
+    tracker = LoadTracker(est_tx, [0, 1, 0], resource_free=[1.0, 0.5])
+
+    assert tracker.loads.tolist() == [7.0, 4.5]
+    assert tracker.makespan == 7.0
+    assert tracker.move_makespan(2, 1) == 10.5
+    assert tracker.move_makespan(0, 1) == 6.5
+    assert tracker.swap_makespan(1, 2) == 6.5
+    assert tracker.swap_makespan(0, 2) == 7.0
+
+    tracker.move(0, 1)
+    assert tracker.assignment.tolist() == [1, 1, 0]
+    assert tracker.loads.tolist() == [6.0, 6.5]
+    assert tracker.makespan == 6.5
+
+    tracker.swap(0, 2)
+    assert tracker.assignment.tolist() == [0, 1, 1]
+    assert tracker.loads.tolist() == [2.0, 10.5]
+
+
+# ------------------------------------------------------------------------------
+#
+def test_deltas():
+
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        num_wfs = int(rng.integers(2, 20))
+        num_res = int(rng.integers(1, 6))
+        est_tx = rng.uniform(1, 10, size=(num_wfs, num_res))
+        assignment = rng.integers(0, num_res, size=num_wfs)
+        # Some resources become available after the others end.
+        resource_free = rng.uniform(0, 30, size=num_res)
+        tracker = LoadTracker(est_tx, assignment, resource_free=resource_free)
+
+        # Moves and swaps are evaluated as if the loads were summed again.
+        for wf_idx in range(num_wfs):
+            for res_idx in range(num_res):
+                moved = assignment.copy()
+                moved[wf_idx] = res_idx
+                assert tracker.move_makespan(wf_idx, res_idx) == \
+                    pytest.approx(_makespan(est_tx, moved, resource_free))
+            other = int(rng.integers(0, num_wfs))
+            swapped = assignment.copy()
+            swapped[[wf_idx, other]] = assignment[[other, wf_idx]]
+            assert tracker.swap_makespan(wf_idx, other) == \
+                pytest.approx(_makespan(est_tx, swapped, resource_free))
+
+        # The tables of the most loaded resource agree with the single moves
+        # and swaps, and the loads stay the ones of the applied assignment.
+        src = tracker.most_loaded
+        assert tracker.loads[src] == tracker.makespan
+        on_src, _, makespans = tracker.move_table(src)
+        for row, wf_idx in enumerate(on_src):
+            for res_idx in range(num_res):
+                if res_idx != src:
+                    assert makespans[row, res_idx] == \
+                        pytest.approx(tracker.move_makespan(wf_idx, res_idx))
+        on_src, others, _, makespans = tracker.swap_table(src)
+        for row, wf_idx in enumerate(on_src):
+            for col, other in enumerate(others):
+                assert makespans[row, col] == \
+                    pytest.approx(tracker.swap_makespan(wf_idx, other))
+        for _ in range(20):
+            tracker.move(int(rng.integers(0, num_wfs)),
+                         int(rng.integers(0, num_res)))
+            tracker.swap(int(rng.integers(0, num_wfs)),
+                         int(rng.integers(0, num_wfs)))
+            assert tracker.makespan == \
+                pytest.approx(_makespan(est_tx, tracker.assignment,
+                                        resource_free))
+
+
+# ------------------------------------------------------------------------------
+#
+def test_hill_climb():
+
+    # All workflows start on the first resource. Moving the largest and the
+    # smallest workflow to the second resource balances the loads.
+    est_tx = np.array([[4.0, 4.0], [3.0, 3.0], [3.0, 3.0], [2.0, 2.0]])
+    tracker = LoadTracker(est_tx, [0, 0, 0, 0])
+
+    assert tracker.hill_climb(max_steps=1) == 1
+    assert tracker.assignment.tolist() == [1, 0, 0, 0]
+    assert tracker.hill_climb() > 0
+    assert tracker.makespan == 6.0
+    assert tracker.hill_climb() == 0
+
+    rng = np.random.default_rng(1)
+    est_tx = rng.uniform(1, 10, size=(40, 4))
+    assignment = rng.integers(0, 4, size=40)
+    tracker = LoadTracker(est_tx, assignment)
+    tracker.hill_climb()
+    assert tracker.makespan < _makespan(est_tx, assignment)
+    assert tracker.makespan == pytest.approx(_makespan(est_tx,
+                                                       tracker.assignment))
+
+    # A resource that becomes available late does not count while it has no
+    # workflows, and is not the most loaded one.
+    late_est_tx = np.array([[4.0, 4.0, 4.0], [2.0, 2.0, 2.0]])
+    tracker = LoadTracker(late_est_tx, [0, 0],
+                          resource_free=[0.0, 1.0, 20.0])
+    assert tracker.makespan == 6.0
+    assert tracker.move_makespan(1, 2) == 22.0
+    assert tracker.hill_climb() == 1
+    assert tracker.assignment.tolist() == [0, 1]
+    assert tracker.makespan == 4.0
+
+    # A single resource can not be improved.
+    tracker = LoadTracker(est_tx[:, :1], np.zeros(40, dtype=np.int64))
+    assert tracker.hill_climb() == 0
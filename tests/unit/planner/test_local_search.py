@@ -0,0 +1,140 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the local search planner
+"""
+# pylint: disable=protected-access, unused-argument
+import itertools
+
+import numpy as np
+import pytest
+
+from radical.cm.planner import LocalSearchPlanner, HeftPlanner, bounds
+import radical.utils as ru
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+def _optimal(num_oper, performance):
+
+    est_tx = np.divide.outer(np.array(num_oper, dtype=np.float64),
+                             np.array(performance, dtype=np.float64))
+    return min(max(est_tx[np.array(assignment) == res_idx, res_idx].sum()
+                   for res_idx in range(len(performance)))
+               for assignment in itertools.product(range(len(performance)),
+                                                   repeat=len(num_oper)))
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(LocalSearchPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan(mocked_init, mocked_raise_on):
+
+    campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7']
+    resources = [{'id': 1, 'performance': 3},
+                 {'id': 2, 'performance': 2},
+                 {'id': 3, 'performance': 1}]
+    num_oper = [13, 11, 9, 8, 7, 5, 3]
+    optimal = _optimal(num_oper, [3, 2, 1])
+
+    for method in ['annealing', 'tabu']:
+        planner = LocalSearchPlanner(None, None, None)
+        planner._campaign = campaign
+        planner._resources = resources
+        planner._num_oper = num_oper
+        planner._logger = ru.Logger('dummy')
+        planner._est_tx_cache = None
+        planner._seed = None
+        planner._rng = None
+        planner._method = method
+        planner._temperature = None
+        planner._cooling = 0.95
+        planner._swap_rate = 0.5
+        planner._tabu_tenure = None
+
+        est_plan = planner.plan(max_iter=200)
+        assert [entry[0] for entry in est_plan] == campaign
+        assert max(entry[3] for entry in est_plan) == pytest.approx(optimal)
+
+        # The workflows of a resource execute one after the other.
+        for resource in resources:
+            entries = [entry for entry in est_plan if entry[1] == resource]
+            for prev, entry in zip(entries, entries[1:]):
+                assert entry[2] == prev[3]
+
+        # The search stops as soon as the deadline is met.
+        with mock.patch.object(planner, '_stop',
+                               wraps=planner._stop) as mocked_stop:
+            planner.plan(max_iter=200, deadline=1000)
+            assert mocked_stop.call_count == 1
+
+        # The lower bound is only computed to stop at an optimality gap.
+        with mock.patch('radical.cm.planner.bounds.lower_bound',
+                        wraps=bounds.lower_bound) as mocked_bound:
+            planner.plan(max_iter=10)
+            assert not mocked_bound.called
+            planner.plan(max_iter=10, gap_epsilon=0.5)
+            assert mocked_bound.call_count == 1
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(LocalSearchPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_initial_plan(mocked_init, mocked_raise_on):
+
+    campaign = [{'id': 'W%d' % idx, 'num_oper': oper}
+                for idx, oper in enumerate([40, 30, 20, 10, 10])]
+    resources = [{'id': 1, 'performance': 1},
+                 {'id': 2, 'performance': 1},
+                 {'id': 3, 'performance': 2}]
+    planner = LocalSearchPlanner(None, None, None)
+    planner._campaign = campaign
+    planner._resources = resources
+    planner._num_oper = [wf['num_oper'] for wf in campaign]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._seed = None
+    planner._rng = None
+    planner._method = 'annealing'
+    planner._temperature = None
+    planner._cooling = 0.95
+    planner._swap_rate = 0.5
+    planner._est_tx = planner._get_est_tx(planner._num_oper, resources)
+
+    # W3 and W4 are not in the initial plan, and W2 is on a resource that is
+    # not available anymore.
+    initial_plan = [(campaign[0], resources[0], 0, 40),
+                    (campaign[1], resources[2], 0, 15),
+                    (campaign[2], {'id': 4, 'performance': 1}, 0, 20)]
+    assignment = planner._initial_assignment(initial_plan, campaign,
+                                             resources, np.zeros(3))
+    assert assignment.tolist() == [0, 2, 1, 2, 2]
+
+    # The plan of HEFT is improved, and the search goes on from the last plan
+    # when replanning.
+    with mock.patch.object(HeftPlanner, '__init__', return_value=None):
+        heft = HeftPlanner(None, None, None)
+    heft._campaign = campaign
+    heft._resources = resources
+    heft._num_oper = planner._num_oper
+    heft._logger = ru.Logger('dummy')
+    heft._est_tx_cache = None
+    heft_plan = heft.plan()
+
+    est_plan = planner.plan(initial_plan=heft_plan, time_budget=0.1)
+    assert max(entry[3] for entry in est_plan) <= \
+        max(entry[3] for entry in heft_plan)
+    assert max(entry[3] for entry in est_plan) == 30.0
+    assert planner.gap() == pytest.approx(2.5 / 27.5)
+
+    with mock.patch.object(planner, 'plan',
+                           return_value=est_plan) as mocked_plan:
+        planner.replan(campaign=campaign, resources=resources,
+                       num_oper=planner._num_oper, start_time=0)
+        assert mocked_plan.call_args[1]['initial_plan'] == est_plan
@@ -0,0 +1,48 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the Max-Min planner
+"""
+# pylint: disable=protected-access, unused-argument
+
+from radical.cm.planner import MaxMinPlanner
+import radical.utils as ru
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(MaxMinPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan(mocked_init, mocked_raise_on):
+
+    actual_plan = [('W1', {'id': 1, 'performance': 523}, 0.0, 102.5793499043977),
+                   ('W9', {'id': 2, 'performance': 487}, 0.0, 82.13552361396304),
+                   ('W3', {'id': 2, 'performance': 487}, 82.13552361396304, 147.22792607802876),
+                   ('W5', {'id': 1, 'performance': 523}, 102.5793499043977, 140.82026768642447),
+                   ('W10', {'id': 3, 'performance': 96}, 0.0, 166.66666666666666),
+                   ('W4', {'id': 1, 'performance': 523}, 140.82026768642447, 166.0),
+                   ('W2', {'id': 2, 'performance': 487}, 147.22792607802876, 170.22792607802876),
+                   ('W7', {'id': 1, 'performance': 523}, 166.0, 185.11854684512429),
+                   ('W8', {'id': 2, 'performance': 487}, 170.22792607802876, 180.54620123203287),
+                   ('W6', {'id': 3, 'performance': 96}, 166.66666666666666, 179.16666666666666)]
+    planner = MaxMinPlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9',
+                         'W10']
+    planner._resources = [{'id': 1, 'performance': 523},
+                          {'id': 2, 'performance': 487},
+                          {'id': 3, 'performance': 96}]
+    planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
+                         40000, 16000]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    # The largest workflows are placed first, and the slow resource gets
+    # workflows only when it completes them first.
+    est_plan = planner.plan()
+    assert est_plan == actual_plan
@@ -0,0 +1,71 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the Min-Min planner
+"""
+# pylint: disable=protected-access, unused-argument
+
+from radical.cm.planner import MinMinPlanner
+import radical.utils as ru
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(MinMinPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan(mocked_init, mocked_raise_on):
+
+    actual_plan = [('W6', {'id': 1, 'performance': 523}, 0.0, 2.294455066921606),
+                   ('W8', {'id': 2, 'performance': 487}, 0.0, 10.318275154004107),
+                   ('W7', {'id': 1, 'performance': 523}, 2.294455066921606, 21.41300191204589),
+                   ('W2', {'id': 2, 'performance': 487}, 10.318275154004107, 33.318275154004105),
+                   ('W4', {'id': 1, 'performance': 523}, 21.41300191204589, 46.59273422562141),
+                   ('W10', {'id': 2, 'performance': 487}, 33.318275154004105, 66.17248459958932),
+                   ('W5', {'id': 1, 'performance': 523}, 46.59273422562141, 84.83365200764818),
+                   ('W3', {'id': 2, 'performance': 487}, 66.17248459958932, 131.26488706365504),
+                   ('W9', {'id': 1, 'performance': 523}, 84.83365200764818, 161.31548757170174),
+                   ('W1', {'id': 2, 'performance': 487}, 131.26488706365504, 241.42710472279262)]
+    planner = MinMinPlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9',
+                         'W10']
+    planner._resources = [{'id': 1, 'performance': 523},
+                          {'id': 2, 'performance': 487},
+                          {'id': 3, 'performance': 96}]
+    planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
+                         40000, 16000]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    est_plan = planner.plan()
+    assert est_plan == actual_plan
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(MinMinPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_start_list(mocked_init, mocked_raise_on):
+
+    planner = MinMinPlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3']
+    planner._resources = [{'id': 1, 'performance': 1},
+                          {'id': 2, 'performance': 1}]
+    planner._num_oper = [4, 2, 2]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    # The smallest workflows go first, W2 to the resource that is free first,
+    # and ties go to the workflow and resource with the smallest index.
+    est_plan = planner.plan(start_time=[3, 1])
+    assert est_plan == [('W2', {'id': 2, 'performance': 1}, 1.0, 3.0),
+                        ('W3', {'id': 1, 'performance': 1}, 3.0, 5.0),
+                        ('W1', {'id': 2, 'performance': 1}, 3.0, 7.0)]
+
+    est_plan = planner.plan(campaign=['W1'], num_oper=[4], start_time=0)
+    assert est_plan == [('W1', {'id': 1, 'performance': 1}, 0.0, 4.0)]
@@ -0,0 +1,165 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the NSGA-II planner
+"""
+# pylint: disable=protected-access, unused-argument
+import os
+import threading as mt
+
+import numpy as np
+import pytest
+
+from radical.cm.planner import NSGAPlanner
+from radical.cm.planner.nsga_planner import _non_dominated_sort, \
+    _crowding_distance
+import radical.utils as ru
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+os.environ['PLANNER_TEST'] = 'TRUE'
+
+
+def _planner(num_wfs=40):
+
+    rng = np.random.default_rng(0)
+    planner = NSGAPlanner(None, None, None)
+    planner._logger = ru.Logger('dummy')
+    planner._seed = None
+    planner._rng = None
+    planner._est_tx_cache = None
+    planner._crossover_method = 'uniform'
+    planner._tournament_size = 2
+    planner._fronts = None
+    planner._gap_epsilon = None
+    planner._campaign = [{'id': 'W%d' % i, 'num_oper': int(oper)}
+                         for i, oper in enumerate(rng.integers(10, 100,
+                                                               size=num_wfs))]
+    # The fast resources use more cores per operation.
+    planner._resources = [{'id': 1, 'performance': 1, 'cores': 1},
+                          {'id': 2, 'performance': 2, 'cores': 4},
+                          {'id': 3, 'performance': 4, 'cores': 16}]
+    planner._population = []
+    planner._population_size = 20
+    planner._random_init = 0.5
+    planner._est_txs = planner._calc_est_tx(
+                            [wf['num_oper'] for wf in planner._campaign],
+                            [1, 2, 4])
+    planner._deadline = None
+    planner._max_gen = 50
+    planner._best_lock = mt.Lock()
+
+    return planner
+
+
+# ------------------------------------------------------------------------------
+#
+def test_non_dominated_sort():
+
+    objectives = np.array([[1, 5], [2, 3], [3, 3], [4, 1], [3, 4], [5, 5],
+                           [1, 5]], dtype=np.float64)
+    assert _non_dominated_sort(objectives).tolist() == [0, 0, 1, 0, 2, 3, 0]
+
+    rng = np.random.default_rng(0)
+    objectives = rng.integers(0, 5, size=(30, 3)).astype(np.float64)
+    fronts = _non_dominated_sort(objectives)
+    for idx, front in enumerate(fronts.tolist()):
+        dominated_by = [fronts[other] for other in range(30)
+                        if (objectives[other] <= objectives[idx]).all() and
+                        (objectives[other] < objectives[idx]).any()]
+        # Only earlier fronts dominate an individual, and the one before it
+        # does.
+        assert all(other < front for other in dominated_by)
+        if front:
+            assert front - 1 in dominated_by
+
+
+# ------------------------------------------------------------------------------
+#
+def test_crowding_distance():
+
+    objectives = np.array([[1, 5], [2, 3], [3, 2], [5, 1], [4, 4], [3, 3]],
+                          dtype=np.float64)
+    fronts = np.array([0, 0, 0, 0, 1, 1])
+    distance = _crowding_distance(objectives, fronts)
+
+    assert distance.tolist() == [np.inf, 1.25, 1.25, np.inf, np.inf, np.inf]
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(NSGAPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan(mocked_init, mocked_raise_on):
+
+    planner = _planner()
+    assert planner.pareto_front() == []
+
+    est_plan = planner.plan()
+    assert [entry[0] for entry in est_plan] == planner._campaign
+
+    # No plan of the front dominates another, and the front trades makespan
+    # for resource-seconds.
+    front = planner.pareto_front()
+    assert len(front) > 1
+    objectives = np.array([[entry[name] for name in planner.objective_names]
+                           for entry in front])
+    assert (_non_dominated_sort(objectives) == 0).all()
+    assert objectives[:, 0].tolist() == sorted(objectives[:, 0].tolist())
+    assert objectives[-1, 1] < objectives[0, 1]
+    for entry in front:
+        resource_seconds = sum((end - start) * resource['cores']
+                               for _, resource, start, end in entry['plan'])
+        assert entry['resource_seconds'] == pytest.approx(resource_seconds)
+        assert entry['makespan'] == pytest.approx(max(plan_entry[3]
+                                                 for plan_entry in
+                                                 entry['plan']))
+
+    # By default, the plan has the smallest makespan of the front. With a
+    # slack, it uses fewer resource-seconds for a slightly larger makespan.
+    assert est_plan == front[0]['plan']
+    planner._rng = None
+    est_plan = planner.plan(makespan_slack=0.3)
+    front = planner.pareto_front()
+    makespan = max(entry[3] for entry in est_plan)
+    assert front[0]['makespan'] <= makespan <= 1.3 * front[0]['makespan']
+    assert min(entry['resource_seconds'] for entry in front
+               if entry['makespan'] <= 1.3 * front[0]['makespan']) == \
+        pytest.approx(sum((end - start) * resource['cores']
+                          for _, resource, start, end in est_plan))
+
+    # Weights select the plan with the smallest scaled objectives.
+    planner._rng = None
+    est_plan = planner.plan(weights=[0, 1, 0])
+    front = planner.pareto_front()
+    assert est_plan == min(front,
+                           key=lambda entry: entry['resource_seconds'])['plan']
+
+    # Individuals index the resources passed to the call, here a reordered
+    # subset of the resources of the constructor.
+    planned = [planner._resources[2], planner._resources[0]]
+    planner._rng = None
+    est_plan = planner.plan(resources=planned)
+    assert [entry[0] for entry in est_plan] == planner._campaign
+    for entry in planner.pareto_front():
+        assert entry['resource_seconds'] == pytest.approx(
+            sum((end - start) * resource['cores']
+                for _, resource, start, end in entry['plan']))
+        for workflow, resource, start, end in entry['plan']:
+            assert resource in planned
+            assert end - start == pytest.approx(workflow['num_oper'] /
+                                                resource['performance'])
+
+    # After a replan of some workflows, a plan of the whole campaign uses the
+    # table of the whole campaign.
+    planner._rng = None
+    planner.replan(campaign=planner._campaign[:5],
+                   resources=planner._resources,
+                   num_oper=[wf['num_oper'] for wf in planner._campaign[:5]],
+                   start_time=0)
+    est_plan = planner.plan()
+    assert [entry[0] for entry in est_plan] == planner._campaign
@@ -10,6 +10,9 @@ from radical.cm.planner import RandomPlanner
 import radical.utils as ru
 import os
 
+import numpy as np
+import pytest
+
 try:
     import mock
 except ImportError:
@@ -24,16 +27,16 @@ os.environ['PLANNER_TEST'] = 'TRUE'
 @mock.patch('radical.utils.raise_on')
 def test_plan1(mocked_init, mocked_raise_on):
 
-    actual_plan = [('W1', {'id': 2, 'performance': 487}, 0, 110.16221765913758),
-                   ('W2', {'id': 2, 'performance': 487}, 110.16221765913758, 133.16221765913758),
-                   ('W3', {'id': 1, 'performance': 523}, 0, 60.61185468451243),
-                   ('W4', {'id': 2, 'performance': 487}, 133.16221765913758, 160.20328542094455),
-                   ('W5', {'id': 3, 'performance': 96}, 0, 208.33333333333334),
-                   ('W6', {'id': 2, 'performance': 487}, 160.20328542094455, 162.66735112936345),
-                   ('W7', {'id': 2, 'performance': 487}, 162.66735112936345, 183.19917864476386),
-                   ('W8', {'id': 2, 'performance': 487}, 183.19917864476386, 193.51745379876797),
-                   ('W9', {'id': 2, 'performance': 487}, 193.51745379876797, 275.65297741273105),
-                   ('W10', {'id': 2, 'performance': 487}, 275.65297741273105, 308.50718685831623)]
+    actual_plan = [('W1', {'id': 3, 'performance': 96}, 0.0, 558.84375),
+                   ('W2', {'id': 2, 'performance': 487}, 0.0, 23.0),
+                   ('W3', {'id': 2, 'performance': 487}, 23.0, 88.09240246406571),
+                   ('W4', {'id': 1, 'performance': 523}, 0.0, 25.179732313575524),
+                   ('W5', {'id': 1, 'performance': 523}, 25.179732313575524, 63.4206500956023),
+                   ('W6', {'id': 1, 'performance': 523}, 63.4206500956023, 65.7151051625239),
+                   ('W7', {'id': 1, 'performance': 523}, 65.7151051625239, 84.83365200764818),
+                   ('W8', {'id': 1, 'performance': 523}, 84.83365200764818, 94.4416826003824),
+                   ('W9', {'id': 1, 'performance': 523}, 94.4416826003824, 170.92351816443596),
+                   ('W10', {'id': 3, 'performance': 96}, 558.84375, 725.5104166666666)]
     campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9', 'W10']
     planner = RandomPlanner(None, None, None)
     planner._campaign = campaign
@@ -43,6 +46,9 @@ def test_plan1(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._seed = None
+    planner._rng = None
 
     est_plan = planner.plan()
     assert est_plan == actual_plan
@@ -71,6 +77,9 @@ def test_plan2(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._seed = None
+    planner._rng = None
 
     est_plan = planner.plan()
     assert est_plan == actual_plan
@@ -82,7 +91,7 @@ def test_plan2(mocked_init, mocked_raise_on):
 @mock.patch('radical.utils.raise_on')
 def test_plan3(mocked_init, mocked_raise_on):
 
-    actual_plan = [('W1', {'id': 2, 'performance': 487}, 0, 110.16221765913758)]
+    actual_plan = [('W1', {'id': 3, 'performance': 96}, 0.0, 558.84375)]
     planner = RandomPlanner(None, None, None)
     planner._campaign = ['W1']
     planner._resources = [{'id': 1, 'performance': 523},
@@ -90,6 +99,9 @@ def test_plan3(mocked_init, mocked_raise_on):
                           {'id': 3, 'performance': 96}]
     planner._num_oper = [53649]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._seed = None
+    planner._rng = None
 
     est_plan = planner.plan()
     assert est_plan == actual_plan
@@ -101,16 +113,16 @@ def test_plan3(mocked_init, mocked_raise_on):
 @mock.patch('radical.utils.raise_on')
 def test_plan_start_time(mocked_init, mocked_raise_on):
 
-    actual_plan = [('W1', {'id': 2, 'performance': 487}, 5, 115.16221765913758),
-                   ('W2', {'id': 2, 'performance': 487}, 115.16221765913758, 138.16221765913758),
-                   ('W3', {'id': 1, 'performance': 523}, 5, 65.61185468451242),
-                   ('W4', {'id': 2, 'performance': 487}, 138.16221765913758, 165.20328542094455),
-                   ('W5', {'id': 3, 'performance': 96}, 5, 213.33333333333334),
-                   ('W6', {'id': 2, 'performance': 487}, 165.20328542094455, 167.66735112936345),
-                   ('W7', {'id': 2, 'performance': 487}, 167.66735112936345, 188.19917864476386),
-                   ('W8', {'id': 2, 'performance': 487}, 188.19917864476386, 198.51745379876797),
-                   ('W9', {'id': 2, 'performance': 487}, 198.51745379876797, 280.65297741273105),
-                   ('W10', {'id': 2, 'performance': 487}, 280.65297741273105, 313.50718685831623)]
+    actual_plan = [('W1', {'id': 3, 'performance': 96}, 5.0, 563.84375),
+                   ('W2', {'id': 2, 'performance': 487}, 5.0, 28.0),
+                   ('W3', {'id': 2, 'performance': 487}, 28.0, 93.09240246406571),
+                   ('W4', {'id': 1, 'performance': 523}, 5.0, 30.179732313575524),
+                   ('W5', {'id': 1, 'performance': 523}, 30.179732313575524, 68.4206500956023),
+                   ('W6', {'id': 1, 'performance': 523}, 68.4206500956023, 70.7151051625239),
+                   ('W7', {'id': 1, 'performance': 523}, 70.7151051625239, 89.83365200764818),
+                   ('W8', {'id': 1, 'performance': 523}, 89.83365200764818, 99.4416826003824),
+                   ('W9', {'id': 1, 'performance': 523}, 99.4416826003824, 175.92351816443596),
+                   ('W10', {'id': 3, 'performance': 96}, 563.84375, 730.5104166666666)]
     campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9', 'W10']
     planner = RandomPlanner(None, None, None)
     planner._campaign = campaign
@@ -120,6 +132,9 @@ def test_plan_start_time(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._seed = None
+    planner._rng = None
 
     est_plan = planner.plan(start_time=5)
     assert est_plan == actual_plan
@@ -131,16 +146,16 @@ def test_plan_start_time(mocked_init, mocked_raise_on):
 @mock.patch('radical.utils.raise_on')
 def test_plan_start_list(mocked_init, mocked_raise_on):
 
-    actual_plan = [('W1', {'id': 2, 'performance': 487}, 3, 113.16221765913758),
-                   ('W2', {'id': 2, 'performance': 487}, 113.16221765913758, 136.16221765913758),
-                   ('W3', {'id': 1, 'performance': 523}, 5, 65.61185468451242),
-                   ('W4', {'id': 2, 'performance': 487}, 136.16221765913758, 163.20328542094455),
-                   ('W5', {'id': 3, 'performance': 96}, 4, 212.33333333333334),
-                   ('W6', {'id': 2, 'performance': 487}, 163.20328542094455, 165.66735112936345),
-                   ('W7', {'id': 2, 'performance': 487}, 165.66735112936345, 186.19917864476386),
-                   ('W8', {'id': 2, 'performance': 487}, 186.19917864476386, 196.51745379876797),
-                   ('W9', {'id': 2, 'performance': 487}, 196.51745379876797, 278.65297741273105),
-                   ('W10', {'id': 2, 'performance': 487}, 278.65297741273105, 311.50718685831623)]
+    actual_plan = [('W1', {'id': 3, 'performance': 96}, 4.0, 562.84375),
+                   ('W2', {'id': 2, 'performance': 487}, 3.0, 26.0),
+                   ('W3', {'id': 2, 'performance': 487}, 26.0, 91.09240246406571),
+                   ('W4', {'id': 1, 'performance': 523}, 5.0, 30.179732313575524),
+                   ('W5', {'id': 1, 'performance': 523}, 30.179732313575524, 68.4206500956023),
+                   ('W6', {'id': 1, 'performance': 523}, 68.4206500956023, 70.7151051625239),
+                   ('W7', {'id': 1, 'performance': 523}, 70.7151051625239, 89.83365200764818),
+                   ('W8', {'id': 1, 'performance': 523}, 89.83365200764818, 99.4416826003824),
+                   ('W9', {'id': 1, 'performance': 523}, 99.4416826003824, 175.92351816443596),
+                   ('W10', {'id': 3, 'performance': 96}, 562.84375, 729.5104166666666)]
     planner = RandomPlanner(None, None, None)
     planner._campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9',
                          'W10']
@@ -150,5 +165,87 @@ def test_plan_start_list(mocked_init, mocked_raise_on):
     planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
                          40000, 16000]
     planner._logger = ru.Logger('dummy') 
+    planner._est_tx_cache = None
+    planner._seed = None
+    planner._rng = None
     est_plan = planner.plan(start_time=[5,3,4])
     assert est_plan == actual_plan
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(RandomPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_samples(mocked_init, mocked_raise_on):
+
+    campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9', 'W10']
+    resources = [{'id': 1, 'performance': 523},
+                 {'id': 2, 'performance': 487},
+                 {'id': 3, 'performance': 96}]
+    planner = RandomPlanner(None, None, None)
+    planner._campaign = campaign
+    planner._resources = resources
+    planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
+                         40000, 16000]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._seed = None
+    planner._rng = None
+    planner._est_tx = planner._get_est_tx(num_oper=planner._num_oper,
+                                          resources=resources)
+
+    # The vectorized makespan is the one of the plan of each sample.
+    planner._rng = None
+    assignments, makespans = planner._sample_uniform(np.zeros(3), 50)
+    for assignment, makespan in zip(assignments.tolist(), makespans.tolist()):
+        loads = [0.0, 0.0, 0.0]
+        for wf_idx, res_idx in enumerate(assignment):
+            loads[res_idx] += planner._est_tx[wf_idx, res_idx]
+        assert makespan == pytest.approx(max(loads))
+
+    planner._rng = None
+    est_plan = planner.plan(samples=50)
+    assert len(est_plan) == len(campaign)
+    assert max(entry[3] for entry in est_plan) == pytest.approx(min(makespans))
+
+    # Every planner has its own generator.
+    planner._rng = None
+    other = RandomPlanner(None, None, None)
+    other._campaign = campaign
+    other._resources = resources
+    other._num_oper = planner._num_oper
+    other._logger = ru.Logger('dummy')
+    other._est_tx_cache = None
+    other._seed = None
+    other._rng = None
+    assert other.plan(samples=50) == est_plan
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(RandomPlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_choices(mocked_init, mocked_raise_on):
+
+    campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9', 'W10']
+    resources = [{'id': 1, 'performance': 523},
+                 {'id': 2, 'performance': 487},
+                 {'id': 3, 'performance': 96}]
+    planner = RandomPlanner(None, None, None)
+    planner._campaign = campaign
+    planner._resources = resources
+    planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
+                         40000, 16000]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+    planner._seed = None
+    planner._rng = None
+
+    # With as many choices as resources, most workflows see all resources,
+    # and start when their resource becomes free.
+    est_plan = planner.plan(choices=3, samples=4, start_time=[5, 3, 4])
+    resource_free = {1: 5.0, 2: 3.0, 3: 4.0}
+    for _, resource, start, end in est_plan:
+        assert start == resource_free[resource['id']]
+        resource_free[resource['id']] = end
+    assert max(resource_free.values()) < 558.84375
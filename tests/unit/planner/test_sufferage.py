@@ -0,0 +1,66 @@
+"""
+Author: Ioannis Paraskevakos
+License: MIT
+Copyright: 2018-2019
+Unit test for the Sufferage planner
+"""
+# pylint: disable=protected-access, unused-argument
+
+from radical.cm.planner import SufferagePlanner
+import radical.utils as ru
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(SufferagePlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan(mocked_init, mocked_raise_on):
+
+    actual_plan = [('W1', {'id': 1, 'performance': 523}, 0.0, 102.5793499043977),
+                   ('W4', {'id': 2, 'performance': 487}, 0.0, 27.041067761806982),
+                   ('W10', {'id': 2, 'performance': 487}, 27.041067761806982, 59.8952772073922),
+                   ('W6', {'id': 3, 'performance': 96}, 0.0, 12.5),
+                   ('W2', {'id': 2, 'performance': 487}, 59.8952772073922, 82.8952772073922),
+                   ('W8', {'id': 3, 'performance': 96}, 12.5, 64.84375),
+                   ('W7', {'id': 2, 'performance': 487}, 82.8952772073922, 103.4271047227926),
+                   ('W9', {'id': 1, 'performance': 523}, 102.5793499043977, 179.06118546845124),
+                   ('W5', {'id': 2, 'performance': 487}, 103.4271047227926, 144.49486652977413),
+                   ('W3', {'id': 2, 'performance': 487}, 144.49486652977413, 209.58726899383984)]
+    planner = SufferagePlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3', 'W4', 'W5', 'W6', 'W7', 'W8', 'W9',
+                         'W10']
+    planner._resources = [{'id': 1, 'performance': 523},
+                          {'id': 2, 'performance': 487},
+                          {'id': 3, 'performance': 96}]
+    planner._num_oper = [53649, 11201, 31700, 13169, 20000, 1200, 9999, 5025,
+                         40000, 16000]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    est_plan = planner.plan()
+    assert est_plan == actual_plan
+
+
+# ------------------------------------------------------------------------------
+#
+@mock.patch.object(SufferagePlanner, '__init__', return_value=None)
+@mock.patch('radical.utils.raise_on')
+def test_plan_single_resource(mocked_init, mocked_raise_on):
+
+    planner = SufferagePlanner(None, None, None)
+    planner._campaign = ['W1', 'W2', 'W3']
+    planner._resources = [{'id': 1, 'performance': 2}]
+    planner._num_oper = [4, 2, 6]
+    planner._logger = ru.Logger('dummy')
+    planner._est_tx_cache = None
+
+    # No workflow suffers, so they are placed in campaign order.
+    est_plan = planner.plan(start_time=1)
+    assert est_plan == [('W1', {'id': 1, 'performance': 2}, 1.0, 3.0),
+                        ('W2', {'id': 1, 'performance': 2}, 3.0, 4.0),
+                        ('W3', {'id': 1, 'performance': 2}, 4.0, 7.0)]